@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+压缩已有的 WAV 音频
+
+把旧版本保存的 audio.wav 转换为 AUDIO_STORAGE_FORMAT (默认 FLAC，无损) 并更新视频记录，
+多个视频并行转换。有排队或执行中任务的视频会被跳过，可以重复执行。
+
+用法:
+    python compact_audio.py --workers 4
+    python compact_audio.py --dry-run
+"""
+
+import argparse
+import json
+import sys
+from config import settings
+from utils.logger import init_logging, app_logger
+from models.database import init_db
+from services.audio_compaction import compact_all
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Auto AI Subtitle 压缩已有的 WAV 音频")
+    parser.add_argument("--workers", type=int, default=0, help="并行转换数 (默认 CPU 核心数)")
+    parser.add_argument("--dry-run", action="store_true", help="只统计待压缩的文件，不做修改")
+    parser.add_argument("--report", help="把汇总报告写入 JSON 文件")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    init_logging()
+    init_db()
+
+    try:
+        report = compact_all(workers=args.workers, dry_run=args.dry_run)
+    except ValueError as e:
+        app_logger.error(str(e))
+        return False
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(text)
+    app_logger.info(f"音频压缩完成 ({settings.AUDIO_STORAGE_FORMAT}): {report['compacted']} 个，"
+                    f"跳过 {report['skipped']} 个，失败 {report['failed']} 个")
+    return report["failed"] == 0
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
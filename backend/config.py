@@ -1,9 +1,95 @@
 import os
+from typing import Dict, List
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "postgresql://auto_ai_subtitle:@localhost:5432/auto_ai_subtitle"
     BASE_DATA_PATH: str = "../data"
+    # 内容寻址存储: 相同内容的媒体文件只保存一份，视频目录中的文件为硬链接
+    # BLOB_STORE_DIR 位于 BASE_DATA_PATH 下，需要与视频目录在同一文件系统
+    BLOB_STORE_ENABLED: bool = True
+    BLOB_STORE_DIR: str = "blobs"
+    # 后台任务队列
+    WORKER_CONCURRENCY: int = 8
+    JOB_POLL_INTERVAL: float = 1.0
+    # 各类资源的并发上限，由流水线阶段共享
+    DOWNLOAD_CONCURRENCY: int = 8
+    TRANSCRIBE_CONCURRENCY: int = 2
+    TRANSLATE_CONCURRENCY: int = 4
+    RENDER_CONCURRENCY: int = 1
+    # 下载调度: 每个站点的并发下载数、分片并发数、重试次数
+    DOWNLOAD_SITE_LIMITS: Dict[str, int] = {"youtube.com": 4, "x.com": 2}
+    DOWNLOAD_SITE_DEFAULT_LIMIT: int = 4
+    DOWNLOAD_FRAGMENT_CONCURRENCY: int = 4
+    DOWNLOAD_RETRIES: int = 10
+    # 所有下载共享的总带宽 (字节/秒)，0 表示不限制
+    DOWNLOAD_TOTAL_RATE: int = 0
+    # URL 元数据探测缓存的有效期 (秒)
+    URL_PROBE_TTL: float = 7 * 24 * 3600
+    # 任务心跳间隔、超时回收时间 (秒) 和最大尝试次数
+    JOB_HEARTBEAT_INTERVAL: float = 10.0
+    JOB_HEARTBEAT_TIMEOUT: float = 60.0
+    JOB_MAX_ATTEMPTS: int = 3
+    # 任务取消后等待处理线程退出的时间 (秒)，超时后 worker 在处理线程退出前不认领新任务
+    JOB_CANCEL_JOIN_TIMEOUT: float = 30.0
+    # 转写分块时长 (秒)，块之间响应任务取消
+    TRANSCRIBE_CHUNK_SECONDS: int = 300
+    # 细粒度进度写入数据库的最小间隔 (秒)
+    PROGRESS_FLUSH_INTERVAL: float = 0.5
+    # 估算剩余时间时使用的每个阶段最近执行次数
+    ETA_HISTORY_SIZE: int = 50
+    # 进度推送 (SSE) 的检查间隔和保活间隔 (秒)
+    SSE_POLL_INTERVAL: float = 1.0
+    SSE_KEEPALIVE_SECONDS: float = 15.0
+    # API 阻塞操作线程池大小
+    IO_EXECUTOR_WORKERS: int = 16
+    RENDER_EXECUTOR_WORKERS: int = 2
+    # 事件循环延迟监控: 采样间隔和告警阈值 (秒)
+    LOOP_LAG_INTERVAL: float = 0.5
+    LOOP_LAG_THRESHOLD: float = 0.2
+    # 缩略图截取位置 (秒)，短视频取时长的 10%；生成的缩略图宽度 (16:9)
+    THUMBNAIL_OFFSET: float = 5.0
+    THUMBNAIL_WIDTHS: List[int] = [160, 320, 480]
+    # 按需缩放的缩略图缓存: 目录 (位于 BASE_DATA_PATH 下)、总大小上限 (字节)、编码质量和允许的最大边长
+    THUMBNAIL_CACHE_DIR: str = "cache/thumbnails"
+    THUMBNAIL_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    THUMBNAIL_CACHE_QUALITY: int = 82
+    THUMBNAIL_MAX_SIZE: int = 1920
+    # 语音识别用音频的存储格式: flac (无损，默认)、opus (有损，体积最小) 或 wav (不压缩)
+    AUDIO_STORAGE_FORMAT: str = "flac"
+    # 拖动预览雪碧图: 截帧间隔 (秒)、每个视频最多帧数、帧宽度 (16:9) 和每张雪碧图的列数、行数
+    SPRITE_INTERVAL: float = 10.0
+    SPRITE_MAX_FRAMES: int = 600
+    SPRITE_WIDTH: int = 160
+    SPRITE_COLUMNS: int = 10
+    SPRITE_ROWS: int = 10
+    # 字幕烧录: 按关键帧切分的片段时长 (秒)、并行编码的片段数 (0 表示按 CPU 核心数)、x264 预设和质量
+    RENDER_SEGMENT_SECONDS: float = 60.0
+    RENDER_WORKERS: int = 0
+    RENDER_PRESET: str = "veryfast"
+    RENDER_CRF: int = 18
+    # 字幕预览片段: 最大时长 (秒)、输出高度上限、x264 预设和质量、缓存目录 (位于 BASE_DATA_PATH 下) 和总大小上限 (字节)
+    PREVIEW_MAX_SECONDS: float = 30.0
+    PREVIEW_HEIGHT: int = 720
+    PREVIEW_PRESET: str = "ultrafast"
+    PREVIEW_CRF: int = 23
+    PREVIEW_CACHE_DIR: str = "cache/previews"
+    PREVIEW_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    # HLS 打包: 是否在处理流程中打包、分片时长 (秒)、分片的浏览器缓存时间 (秒)
+    # 和重新打包后旧版本分片的保留时间 (秒，正在播放旧播放列表的客户端仍可读取)
+    HLS_ENABLED: bool = False
+    HLS_SEGMENT_SECONDS: float = 6.0
+    HLS_CACHE_MAX_AGE: int = 365 * 24 * 3600
+    HLS_RETAIN_SECONDS: int = 6 * 3600
+    # 批量导入: 每次入队的 URL 数、批次中排队任务数上限、等待排队任务减少的检查间隔 (秒)
+    IMPORT_CHUNK_SIZE: int = 500
+    IMPORT_MAX_QUEUED: int = 1000
+    IMPORT_POLL_INTERVAL: float = 5.0
+    # 同时执行的导入任务数上限 (所有节点合计)，导入任务等待排队任务减少时占用 worker，需小于 worker 总数
+    IMPORT_MAX_RUNNING: int = 2
+    # 调度准入限制
+    BULK_MAX_RUNNING: int = 4
+    MAX_RUNNING_PER_SUBMITTER: int = 4
 
     class Config:
         env_file = ".env"
@@ -1,23 +1,37 @@
-import re
 import subprocess
 import os
-import shutil
 import logging
+import threading
 import yt_dlp
 from pathlib import Path
+from typing import Optional
+from utils.cancellation import current_token
+from utils.progress import current_progress_callback
+from utils.url_utils import canonical_key
+from services.download_scheduler import download_slot, download_options, bandwidth, download_metrics
 
 def get_video_source(url):
-    if re.match(r"https?://(?:www\.)?youtu(?:be\.com/watch\?v=|\.be/)([\w\-_]*)(&(amp;)?‌​[\w?‌​=]*)?", url):
-        return "youtube"
-    elif re.match(r"https?://(?:www\.)?twitter\.com/\w+/status/\d+", url):
-        return "twitter"
-    elif re.match(r"https?://x\.com/i/status/\d+", url):
-        return "twitter"
-    elif re.match(r"https?://(?:www\.)?xiaoyuzhoufm\.com/episode/[\w\-]+", url):
-        return "xiaoyuzhou"
-    return None
+    key = canonical_key(url)
+    return key[0] if key else None
+
+def _downloaded_path(info: dict) -> str:
+    """yt-dlp 下载 (及合并、音频提取等后处理) 完成后的文件路径"""
+    downloads = info.get('requested_downloads') or []
+    if downloads and downloads[-1].get('filepath'):
+        return downloads[-1]['filepath']
+    raise FileNotFoundError("Could not determine downloaded file path")
+
+def _download_file(url: str, ydl_opts: dict, output_dir: str) -> str:
+    """下载到 output_dir，文件名为 <视频 ID>.<扩展名>，返回最终文件路径"""
+    os.makedirs(output_dir, exist_ok=True)
+    info = _run_download(url, {
+        'outtmpl': os.path.join(output_dir, '%(id)s.%(ext)s'),
+        'no_warnings': True,
+        **ydl_opts
+    })
+    return _downloaded_path(info)
 
-def download_video_yt(url, quality=None, batch_mode=False):
+def download_video_yt(url, quality=None, batch_mode=False, output_dir="."):
     if quality is None and not batch_mode:
         print("请选择视频质量:")
         print("1. 最佳质量")
@@ -31,89 +45,34 @@ def download_video_yt(url, quality=None, batch_mode=False):
         quality = "720p"
 
     if quality == "best":
-        cmd = f'yt-dlp -f "bestvideo+bestaudio" --merge-output-format mp4 "{url}"'
+        video_format = "bestvideo+bestaudio"
     elif quality == "720p":
-        cmd = f'yt-dlp -f "bv*[height<=720]+ba" --merge-output-format mp4 "{url}"'
+        video_format = "bv*[height<=720]+ba"
     else:
         raise ValueError(f"Unsupported quality: {quality}")
-    
-    process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
-    output, _ = process.communicate()
-    
-    if process.returncode != 0:
-        raise RuntimeError(f"Failed to download video: {output}")
-    
-    video_path = None
-    for line in output.split("\n"):
-        if line.startswith("[Merger] Merging formats into "):
-            video_path = line.split("into ")[1].strip('"')
-            break
-    
-    if video_path is None:
-        raise FileNotFoundError("Could not determine downloaded video file path")
-    
-    return video_path
 
-def download_video_twitter(url):
-    # 在 yt-dlp 命令中添加 -o "%(id).30s.%(ext)s" 参数,指定输出文件名格式为视频ID和扩展名。这样可以避免默认的长文件名。
-    # yt-dlp -o '%(title).50s.%(ext)s' "https://x.com/i/status/1869319333954089218"
-    cmd = f'yt-dlp -f "bv[height=720][ext=mp4]+ba[ext=m4a]/b" -o "%(title).30s.%(ext)s" "{url}"'
-    
-    process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
-    output, _ = process.communicate()
-    
-    if process.returncode != 0:
-        raise RuntimeError(f"Failed to download video: {output}")
-    
-    video_path = None
-    for line in output.split("\n"):
-        if line.startswith("[download] Destination: "):
-            video_path = line.split("Destination: ")[1].strip()
-            break
-    
-    if video_path is None:
-        raise FileNotFoundError("Could not determine downloaded video file path")
-    
-    return video_path
+    return _download_file(url, {'format': video_format, 'merge_output_format': 'mp4'}, output_dir)
 
-def download_video_xiaoyuzhou(url):
-    cmd = f'yt-dlp --extract-audio "{url}"'
-    
-    process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
-    output, _ = process.communicate()
-    
-    if process.returncode != 0:
-        raise RuntimeError(f"Failed to download audio: {output}")
-    
-    audio_path = None
-    for line in output.split("\n"):
-        if line.startswith("[download] Destination: "):
-            audio_path = line.split("Destination: ")[1].strip()
-            break
-    
-    if audio_path is None:
-        raise FileNotFoundError("Could not determine downloaded audio file path")
-    
-    return audio_path
+def download_video_twitter(url, output_dir="."):
+    # 文件名使用推文 ID，避免标题过长或包含特殊字符
+    return _download_file(url, {'format': 'bv[height=720][ext=mp4]+ba[ext=m4a]/b'}, output_dir)
+
+def download_video_xiaoyuzhou(url, output_dir="."):
+    return _download_file(url, {
+        'format': 'bestaudio/best',
+        'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'best'}]
+    }, output_dir)
 
 def save_video(url, quality="720p", path="downloads/videos"):
     source = get_video_source(url)
     if source == "youtube":
-        video_file = download_video_yt(url, quality)
+        return download_video_yt(url, quality, output_dir=path)
     elif source == "twitter":
-        video_file = download_video_twitter(url)
+        return download_video_twitter(url, output_dir=path)
     elif source == "xiaoyuzhou":
-        video_file = download_video_xiaoyuzhou(url)
+        return download_video_xiaoyuzhou(url, output_dir=path)
     else:
         raise ValueError(f"Unsupported video source: {source}")
-    
-    # Create target directory if it doesn't exist
-    os.makedirs(path, exist_ok=True)
-    
-    # Move video file to target directory
-    final_path = os.path.join(path, os.path.basename(video_file))
-    shutil.move(video_file, final_path)
-    return final_path
 
 def generate_thumbnail(video_path: str, output_dir: str) -> str:
     """生成视频缩略图
@@ -143,17 +102,86 @@ def generate_thumbnail(video_path: str, output_dir: str) -> str:
         logging.error(f"缩略图生成失败: {e.stderr.decode()}")
         return None
 
-def download_video(url: str, output_dir: str) -> dict:
+class _ProgressHook:
+    """
+    yt-dlp 进度回调
+
+    每次回调时检查任务是否已取消，取消时中断下载；视频流和音频流分别下载时累加各文件的字节数，
+    上报已下载字节数和下载速度到任务进度和下载统计。
+
+    分片并发下载 (HLS/DASH) 时回调在 yt-dlp 的分片线程中执行，这些线程没有任务的取消标记和进度回调，
+    因此在创建时 (任务线程中) 记录两者，回调时直接使用。
+    """
+
+    def __init__(self, download_id: int):
+        self.download_id = download_id
+        self._finished_bytes = 0
+        self._lock = threading.Lock()
+        self._token = current_token()
+        self._progress = current_progress_callback()
+
+    def __call__(self, d: dict) -> None:
+        if self._token is not None:
+            self._token.check()
+        status = d.get('status')
+        if status == 'downloading':
+            with self._lock:
+                done = self._finished_bytes + (d.get('downloaded_bytes') or 0)
+                total = d.get('total_bytes') or d.get('total_bytes_estimate')
+                total = self._finished_bytes + total if total else None
+            speed = d.get('speed')
+            self._report(done, total, speed)
+            download_metrics.update(self.download_id, done, speed)
+        elif status == 'finished':
+            with self._lock:
+                self._finished_bytes += d.get('total_bytes') or d.get('downloaded_bytes') or 0
+                finished = self._finished_bytes
+            download_metrics.update(self.download_id, finished)
+
+    def _report(self, done: float, total: Optional[float], speed: Optional[float]) -> None:
+        if self._progress is None:
+            return
+        try:
+            self._progress(done, total, 'bytes', speed)
+        except Exception:
+            # 进度上报失败不应中断下载
+            pass
+
+def _run_download(url: str, ydl_opts: dict, priority: int = 0) -> dict:
+    """占用站点下载槽位并在进程内执行 yt-dlp 下载，返回视频信息"""
+    with download_slot(url, priority):
+        download_id = download_metrics.start(url)
+        options = download_options({**ydl_opts, 'progress_hooks': [_ProgressHook(download_id)]})
+        success = False
+        try:
+            with yt_dlp.YoutubeDL(options) as ydl:
+                # 与其他下载平分总带宽
+                bandwidth.join(ydl.params)
+                try:
+                    info = ydl.extract_info(url, download=True)
+                finally:
+                    bandwidth.leave(ydl.params)
+            success = True
+            return info
+        finally:
+            download_metrics.finish(download_id, success)
+
+def download_video(url: str, output_dir: str, priority: int = 0) -> dict:
     """
     下载YouTube视频和缩略图
     返回包含视频路径和缩略图路径的字典
+
+    下载受站点并发限制，DASH/HLS 分片并发下载，中断后再次调用时从 .part 文件继续；
+    priority 为任务优先级，站点槽位紧张时优先级高的先下载。
     """
     # 确保输出目录存在
     os.makedirs(output_dir, exist_ok=True)
     
     # 配置yt-dlp选项
     ydl_opts = {
-        'format': 'best[height<=720]',  # 720p或更低
+        # 720p或更低，优先分离的音视频流 (DASH 分片可并发下载)，合并为 mp4
+        'format': 'bv*[height<=720]+ba/b[height<=720]',
+        'merge_output_format': 'mp4',
         'outtmpl': {
             'default': os.path.join(output_dir, 'video.mp4'),
             'thumbnail': os.path.join(output_dir, 'thumbnail.webp')
@@ -166,37 +194,84 @@ def download_video(url: str, output_dir: str) -> dict:
     }
     
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            # 下载视频
-            info = ydl.extract_info(url, download=True)
-            
-            # 返回文件路径
-            return {
-                'video_path': os.path.join(output_dir, 'video.mp4'),
-                'thumbnail_path': os.path.join(output_dir, 'thumbnail.webp'),
-                'title': info.get('title', '')
-            }
+        info = _run_download(url, ydl_opts, priority)
+        
+        # 返回文件路径
+        return {
+            'video_path': os.path.join(output_dir, 'video.mp4'),
+            'thumbnail_path': os.path.join(output_dir, 'thumbnail.webp'),
+            'title': info.get('title', ''),
+            'duration': info.get('duration')
+        }
             
     except Exception as e:
         print(f"下载失败: {str(e)}")
         return None
 
-def download_videos_from_file(links_file):
-    """Download videos from URLs listed in a file"""
-    video_dir = "downloads/videos"
-    os.makedirs(video_dir, exist_ok=True)
+def find_audio_source(output_dir: str) -> Optional[str]:
+    """查找 download_audio 下载的音频文件 (扩展名取决于来源的音频格式)"""
+    for path in sorted(Path(output_dir).glob('audio_source.*')):
+        if path.suffix not in ('.part', '.ytdl'):
+            return str(path)
+    return None
+
+def download_audio(url: str, output_dir: str, priority: int = 0) -> dict:
+    """
+    只下载最佳音频流和缩略图，用于先转写后补充视频的处理模式
+    返回包含音频路径和缩略图路径的字典
+    """
+    os.makedirs(output_dir, exist_ok=True)
     
-    with open(links_file, 'r') as f:
-        urls = [line.strip() for line in f if line.strip()]
-        
+    ydl_opts = {
+        'format': 'bestaudio/best',
+        'outtmpl': {
+            'default': os.path.join(output_dir, 'audio_source.%(ext)s'),
+            'thumbnail': os.path.join(output_dir, 'thumbnail.webp')
+        },
+        'writethumbnail': True,
+        'quiet': False,
+        'no_warnings': True
+    }
+    
+    try:
+        info = _run_download(url, ydl_opts, priority)
+        return {
+            'audio_path': find_audio_source(output_dir),
+            'thumbnail_path': os.path.join(output_dir, 'thumbnail.webp'),
+            'title': info.get('title', ''),
+            'duration': info.get('duration')
+        }
+    except Exception as e:
+        print(f"音频下载失败: {str(e)}")
+        return None
+
+def download_videos_from_file(links_file, video_dir="downloads/videos"):
+    """
+    只下载文件中列出的视频 (每行一个 URL)，不生成字幕
+
+    逐行读取，同一视频的不同链接只下载一次，每个视频保存在 video_dir/<hash_name>/ 下。
+    需要完整处理流程时使用 import_urls.py 或 POST /imports 批量导入。
+    """
+    from utils.hash_utils import generate_hash_name
+
     video_files = []
-    for url in urls:
-        try:
-            video_file = download_video(url, batch_mode=True)
-            video_files.append(video_file)
-        except Exception as e:
-            logging.error(f"Failed to download {url}: {str(e)}")
-            
+    seen = set()
+    with open(links_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            url = line.strip()
+            if not url or url.startswith('#'):
+                continue
+            hash_name = generate_hash_name(url)
+            if hash_name in seen:
+                continue
+            seen.add(hash_name)
+            try:
+                result = download_video(url, output_dir=os.path.join(video_dir, hash_name))
+                if result:
+                    video_files.append(result['video_path'])
+            except Exception as e:
+                logging.error(f"Failed to download {url}: {str(e)}")
+
     return video_files
 
 if __name__ == "__main__":
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量导入 URL 列表
+
+流式读取每行一个 URL 的文本文件，去重后分批提交 process 任务，由 API 服务或
+独立 worker (worker.py) 执行完整的处理流程。批次中排队的任务达到 IMPORT_MAX_QUEUED
+时暂停读取；每批入队后记录检查点，中断后使用 --resume 从检查点继续。
+
+用法:
+    python import_urls.py links.txt --mode audio_first
+    python import_urls.py --resume <batch_id>
+"""
+
+import argparse
+import json
+import os
+import sys
+from utils.logger import init_logging, app_logger
+from models.database import init_db
+from services.bulk_import import BulkImporter, create_run, summary
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Auto AI Subtitle 批量导入 URL 列表")
+    parser.add_argument("file", nargs="?", help="URL 列表文件，每行一个 URL，# 开头为注释")
+    parser.add_argument("--resume", metavar="BATCH_ID", help="从检查点继续之前中断的导入")
+    parser.add_argument("--quality", default="720p", help="视频质量 (默认 720p)")
+    parser.add_argument("--mode", choices=["full", "audio_first"], default="full",
+                        help="处理模式 (默认 full)")
+    parser.add_argument("--submitter", default="import", help="提交者，用于公平调度 (默认 import)")
+    parser.add_argument("--report", help="把汇总报告写入 JSON 文件")
+    args = parser.parse_args()
+    if not args.file and not args.resume:
+        parser.error("需要指定 URL 列表文件或 --resume")
+    return args
+
+
+def main():
+    args = parse_args()
+    init_logging()
+    init_db()
+
+    if args.resume:
+        batch_id = args.resume
+    else:
+        if not os.path.exists(args.file):
+            app_logger.error(f"文件不存在: {args.file}")
+            return False
+        run = create_run(os.path.abspath(args.file), {"quality": args.quality, "mode": args.mode},
+                         args.submitter)
+        batch_id = run.batch_id
+        app_logger.info(f"批量导入批次: {batch_id} (中断后使用 --resume {batch_id} 继续)")
+
+    try:
+        report = BulkImporter(batch_id).run()
+    except KeyboardInterrupt:
+        app_logger.warning(f"导入已中断，使用 --resume {batch_id} 从检查点继续")
+        report = summary(batch_id)
+    except Exception as e:
+        app_logger.error(f"导入失败: {str(e)}")
+        report = summary(batch_id)
+
+    if report is None:
+        return False
+    text = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    print(text)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(text)
+    return report["status"] == "completed"
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
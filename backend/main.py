@@ -1,8 +1,23 @@
 from fastapi import FastAPI, HTTPException, Query, Path, UploadFile, File, Form, Request, Body
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from services.video_processor import VideoProcessor
-from models.database import init_db, Video
+from services.job_queue import (
+    JobQueue, JobReaper, start_workers, PRIORITY_UPLOAD, PRIORITY_SINGLE, PRIORITY_BULK,
+    JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED, JOB_KIND_IMPORT
+)
+from services.eta import job_eta
+from services.download_scheduler import download_metrics
+from services import blob_store
+from services import bulk_import
+from services.thumbnail_cache import thumbnail_cache, pick_source, media_type, thumbnail_version
+from services.render_cache import preview_cache
+from services import hls_packager
+from services.media_prep import wav_stream_command
+from config import settings
+from services.job_handlers import JOB_HANDLERS
+from models.database import init_db, Video, Job
 from pydantic import BaseModel, HttpUrl
 from typing import Optional, List, Literal, Dict, Any
 from datetime import datetime
@@ -10,8 +25,14 @@ import os
 from fastapi.staticfiles import StaticFiles
 from PIL import Image, ImageDraw, ImageFont
 import json
+import hashlib
+import shutil
 from utils.logger import app_logger, api_logger, init_logging
+from utils.executors import run_blocking, shutdown_executors, POOL_RENDER
+from utils.loop_monitor import LoopLagMonitor
 import time
+import uuid
+import asyncio
 
 # 初始化日志系统
 init_logging()
@@ -60,19 +81,45 @@ app.add_middleware(
 # 添加数据目录的静态文件挂载
 app.mount("/data", StaticFiles(directory="../data"), name="data")
 
-# 初始化视频处理器
-processor = VideoProcessor()
+def load_video(hash_name: str) -> Optional[Video]:
+    """
+    在独立的数据库会话中读取视频记录
+
+    请求在线程池中并发执行，而 Session 不是线程安全的，不能共用一个 VideoProcessor；
+    每次调用创建并关闭自己的会话，返回的记录已与会话分离。
+    """
+    with VideoProcessor() as processor:
+        return processor.get_video_by_hash(hash_name)
+
+# 初始化任务队列，工作线程在启动时创建
+job_queue = JobQueue()
+job_workers = []
+# 回收心跳超时的任务 (包括上次运行时未完成的任务)
+job_reaper = JobReaper(job_queue)
+
+# 事件循环延迟监控，结果通过 /health 返回
+loop_monitor = LoopLagMonitor(settings.LOOP_LAG_INTERVAL, settings.LOOP_LAG_THRESHOLD)
+
+def get_submitter(request: Request) -> str:
+    """识别提交者，用于公平调度: 优先使用 X-Submitter 请求头，否则使用客户端地址"""
+    submitter = request.headers.get("X-Submitter")
+    if submitter:
+        return submitter
+    return request.client.host if request.client else "anonymous"
 
 # 请求模型
 class VideoRequest(BaseModel):
     url: HttpUrl
     quality: Optional[str] = "720p"
+    # full: 下载视频后提取音频; audio_first: 只下载音频先生成字幕，视频之后补充下载
+    mode: Literal["full", "audio_first"] = "full"
     
     class Config:
         json_schema_extra = {
             "example": {
                 "url": "https://www.youtube.com/watch?v=kYfNvmF0Bqw",
-                "quality": "720p"
+                "quality": "720p",
+                "mode": "full"
             }
         }
 
@@ -80,6 +127,7 @@ class VideoRequest(BaseModel):
 class BatchVideoRequest(BaseModel):
     urls: List[HttpUrl]
     quality: Optional[str] = "720p"
+    mode: Literal["full", "audio_first"] = "full"
     
     class Config:
         json_schema_extra = {
@@ -88,7 +136,8 @@ class BatchVideoRequest(BaseModel):
                     "https://www.youtube.com/watch?v=kYfNvmF0Bqw",
                     "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
                 ],
-                "quality": "720p"
+                "quality": "720p",
+                "mode": "audio_first"
             }
         }
 
@@ -101,10 +150,24 @@ class VideoResponse(BaseModel):
     folder_hash_name_path: str
     created_at: datetime
     status: str
+    # status 为 failed 时最近一次处理任务的错误信息，可通过 /video/{hash}/retry 重试
+    error: Optional[str] = None
+    duration: Optional[float] = None  # 媒体时长 (秒)
+    media_info: Optional[Dict[str, Any]] = None  # 容器格式、编码、分辨率等
+    # 各尺寸缩略图 [{width, height, format, url}]，列表页可按显示宽度选择较小的图片
+    thumbnails: List[Dict[str, Any]] = []
+    # 带版本的缩略图接口地址，可追加 w/h/fmt 参数；缩略图重新生成后地址改变，浏览器可长期缓存
+    thumbnail_url: Optional[str] = None
+    # 拖动预览雪碧图的索引 {index: JSON 索引, vtt: WebVTT 缩略图轨道}，没有视频流时为 None
+    sprites: Optional[Dict[str, str]] = None
+    # HLS 主播放列表 (含 WebVTT 字幕轨道)，未打包时为 None
+    hls: Optional[str] = None
     files: dict = {
         "video": None,
         "thumbnail": None,
         "wav": None,
+        "soft_subtitle": None,
+        "rendered": None,
         "subtitles": {
             "en_json": None,
             "zh_json": None,
@@ -118,7 +181,11 @@ class VideoResponse(BaseModel):
         from_attributes = True
     
     @classmethod
-    def from_db_model(cls, video: Video):
+    def from_db_model(cls, video: Video, processor: Optional[VideoProcessor] = None):
+        """processor 用于查询处理状态，批量转换时传入以复用同一个数据库会话"""
+        if processor is None:
+            with VideoProcessor() as processor:
+                return cls.from_db_model(video, processor)
         # 处理文件路径，确保它们可以通过web访问
         file_path = f"/file/{video.file_path}" if video.file_path else None
         
@@ -152,12 +219,19 @@ class VideoResponse(BaseModel):
         print(f"处理后的缩略图路径: {pic_thumb_path}")
         
         wav_path = f"/file/{video.wav_path}" if video.wav_path else None
+        soft_subtitle_path = f"/file/{video.soft_subtitle_path}" if video.soft_subtitle_path else None
+        rendered_path = f"/file/{video.rendered_path}" if video.rendered_path else None
         subtitle_en_json_path = f"/file/{video.subtitle_en_json_path}" if video.subtitle_en_json_path else None
         subtitle_zh_cn_json_path = f"/file/{video.subtitle_zh_cn_json_path}" if video.subtitle_zh_cn_json_path else None
         subtitle_en_ass_path = f"/file/{video.subtitle_en_ass_path}" if video.subtitle_en_ass_path else None
         subtitle_zh_cn_ass_path = f"/file/{video.subtitle_zh_cn_ass_path}" if video.subtitle_zh_cn_ass_path else None
         subtitle_en_md_path = f"/file/{video.subtitle_en_md_path}" if video.subtitle_en_md_path else None
         subtitle_zh_cn_md_path = f"/file/{video.subtitle_zh_cn_md_path}" if video.subtitle_zh_cn_md_path else None
+
+        status = processor.get_video_status(video)
+        error = processor.get_processing_error(video.hash_name) if status == "failed" else None
+        variants = json.loads(video.thumbnail_variants or "[]")
+        version = thumbnail_version(variants, video.pic_thumb_path)
         
         return cls(
             id=video.id,
@@ -166,11 +240,28 @@ class VideoResponse(BaseModel):
             hash_name=video.hash_name,
             folder_hash_name_path=video.folder_hash_name_path,
             created_at=video.created_at,
-            status=VideoProcessor().get_video_status(video),
+            status=status,
+            error=error,
+            duration=video.duration,
+            media_info=json.loads(video.media_info) if video.media_info else None,
+            thumbnails=[
+                {"width": v["width"], "height": v["height"], "format": v["format"], "url": f"/file/{v['path']}"}
+                for v in variants
+            ],
+            thumbnail_url=f"/video/{video.hash_name}/thumbnail?v={version}" if version else None,
+            sprites={
+                "index": f"/file/{video.sprite_index_path}",
+                "vtt": f"/file/{os.path.join(os.path.dirname(video.sprite_index_path), 'sprites.vtt')}",
+            } if video.sprite_index_path else None,
+            hls=f"/video/{video.hash_name}/hls/master.m3u8" if video.hls_playlist_path else None,
             files={
                 "video": file_path,
                 "thumbnail": pic_thumb_path,
                 "wav": wav_path,
+                # 封装了中英文软字幕轨道的视频
+                "soft_subtitle": soft_subtitle_path,
+                # 烧录了硬字幕的视频
+                "rendered": rendered_path,
                 "subtitles": {
                     "en_json": subtitle_en_json_path,
                     "zh_json": subtitle_zh_cn_json_path,
@@ -182,6 +273,97 @@ class VideoResponse(BaseModel):
             }
         )
 
+# 任务响应模型
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    url: Optional[str] = None
+    hash_name: Optional[str] = None
+    status: str
+    priority: int = 0
+    submitter: Optional[str] = None
+    stage: Optional[str] = None
+    progress: float = 0.0
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    critical_path: Optional[Dict[str, Any]] = None
+    stages: Optional[Dict[str, Any]] = None  # 执行中阶段的细粒度进度
+    eta_seconds: Optional[float] = None  # 按历史吞吐量估算的剩余时间
+
+    class Config:
+        from_attributes = True
+
+    @classmethod
+    def from_db_model(cls, job: Job):
+        detail = json.loads(job.detail) if job.detail else {}
+        return cls(
+            id=job.id,
+            kind=job.kind,
+            url=job.url,
+            hash_name=job.hash_name,
+            status=job.status,
+            priority=job.priority or 0,
+            submitter=job.submitter,
+            stage=job.stage,
+            progress=job.progress or 0.0,
+            error=job.error,
+            attempts=job.attempts or 0,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+            critical_path=json.loads(job.critical_path) if job.critical_path else None,
+            stages=detail.get("stages") if job.status == "running" else None,
+            eta_seconds=job_eta(job)
+        )
+
+# 字幕渲染响应模型
+class RenderResponse(BaseModel):
+    status: Literal["cached", "queued"]  # cached: 已有相同参数的渲染结果; queued: 已提交渲染任务
+    mode: str
+    url: Optional[str] = None  # 渲染结果的访问路径，status 为 cached 时提供
+    size: Optional[int] = None
+    created_at: Optional[datetime] = None
+    job: Optional[JobResponse] = None  # 渲染任务，status 为 queued 时提供
+
+# 批量任务响应模型
+class BatchResponse(BaseModel):
+    batch_id: str
+    total: int
+    counts: Dict[str, int]
+    jobs: List[JobResponse]
+
+    @classmethod
+    def from_jobs(cls, batch_id: str, jobs: List[Job]):
+        counts: Dict[str, int] = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return cls(
+            batch_id=batch_id,
+            total=len(jobs),
+            counts=counts,
+            jobs=[JobResponse.from_db_model(job) for job in jobs]
+        )
+
+# 批量导入响应模型
+class ImportResponse(BaseModel):
+    batch_id: str
+    job_id: Optional[int] = None  # 执行导入的任务
+    status: str
+    progress: float  # 已读取的文件比例
+    lines: int
+    invalid: int
+    duplicates: int
+    existing: int
+    reused: int
+    enqueued: int
+    jobs: Dict[str, int]  # 批次中各状态的任务数
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
 # 添加通用文件访问路由
 @app.get("/file/{file_path:path}")
 async def read_file(file_path: str):
@@ -232,75 +414,225 @@ async def startup():
         app_logger.error(f"数据库初始化失败: {str(e)}")
         raise
 
+    # 启动后台任务工作线程
+    job_workers.extend(start_workers(job_queue, JOB_HANDLERS))
+    app_logger.info(f"已启动 {len(job_workers)} 个任务工作线程")
+    job_reaper.start()
+    loop_monitor.start()
+
 @app.on_event("shutdown")
 async def shutdown():
     """应用关闭时的清理工作"""
     app_logger.info("应用关闭中...")
-    # 在这里添加任何需要的清理代码
+    for worker in job_workers:
+        worker.stop()
+    job_reaper.stop()
+    await loop_monitor.stop()
+    shutdown_executors()
     app_logger.info("应用已关闭")
 
 @app.post("/process", 
-    response_model=VideoResponse,
+    response_model=JobResponse,
+    status_code=202,
     summary="处理新视频",
-    description="提交视频 URL，生成字幕和翻译"
+    description="提交视频 URL，立即返回任务 ID，后台生成字幕和翻译"
 )
-async def process_video(video_req: VideoRequest):
+async def process_video(video_req: VideoRequest, request: Request):
     """
-    处理视频并生成字幕:
+    提交视频处理任务，后台执行:
     - 下载视频
     - 生成缩略图
     - 提取音频
     - 生成字幕
     - 翻译字幕
     - 生成双语字幕文件
+    
+    通过 GET /jobs/{job_id} 查询处理进度
     """
     try:
-        app_logger.info(f"开始处理视频: {video_req.url}")
-        video = processor.process_video(str(video_req.url))
-        app_logger.info(f"视频处理成功: {video.hash_name}")
-        return VideoResponse.from_db_model(video)
+        app_logger.info(f"提交视频处理任务: {video_req.url}")
+        job = await run_blocking(
+            job_queue.submit,
+            "process",
+            url=str(video_req.url),
+            payload={"quality": video_req.quality, "mode": video_req.mode},
+            priority=PRIORITY_SINGLE,
+            submitter=get_submitter(request),
+            dedupe=True
+        )
+        return JobResponse.from_db_model(job)
     except Exception as e:
-        app_logger.error(f"视频处理失败: {str(e)}", exc_info=True)
+        app_logger.error(f"提交任务失败: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/batch-process", 
-    response_model=List[VideoResponse],
+    response_model=BatchResponse,
+    status_code=202,
     summary="批量处理视频",
-    description="提交多个视频 URL，批量生成字幕和翻译"
+    description="提交多个视频 URL，每个 URL 生成一个后台任务，并发处理"
 )
-async def batch_process_videos(batch_req: BatchVideoRequest):
+async def batch_process_videos(batch_req: BatchVideoRequest, request: Request):
     """
-    批量处理视频并生成字幕:
+    批量提交视频处理任务:
     - 接收多个YouTube URL
-    - 依次处理每个视频
-    - 返回所有成功处理的视频信息
+    - 每个 URL 入队一个任务，由工作线程并发处理
+    - 下载、转写、翻译分别受 DOWNLOAD/TRANSCRIBE/TRANSLATE_CONCURRENCY 限制
+    - 批量任务优先级最低，同时执行数受 BULK_MAX_RUNNING 限制
+    - 立即返回批次 ID 和每个 URL 的任务状态
     """
-    results = []
-    errors = []
-    
-    for url in batch_req.urls:
-        try:
-            video = processor.process_video(str(url))
-            results.append(VideoResponse.from_db_model(video))
-        except Exception as e:
-            errors.append({"url": str(url), "error": str(e)})
-    
-    if not results and errors:
-        raise HTTPException(
-            status_code=500, 
-            detail={"message": "所有视频处理失败", "errors": errors}
-        )
-    
-    # 如果有部分成功，部分失败，在响应头中添加警告
-    if errors:
-        return JSONResponse(
-            content=[result.dict() for result in results],
-            headers={"X-Processing-Errors": str(errors)}
+    try:
+        batch_id = uuid.uuid4().hex
+        jobs = await run_blocking(
+            job_queue.submit_many,
+            "process",
+            [str(url) for url in batch_req.urls],
+            payload={"quality": batch_req.quality, "mode": batch_req.mode},
+            batch_id=batch_id,
+            priority=PRIORITY_BULK,
+            submitter=get_submitter(request)
         )
-    
-    return results
+        return await run_blocking(BatchResponse.from_jobs, batch_id, jobs)
+    except Exception as e:
+        app_logger.error(f"批量提交任务失败: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/video/{hash_name}", 
+@app.get("/batches/{batch_id}",
+    response_model=BatchResponse,
+    summary="获取批次状态",
+    description="查询批量提交中每个 URL 的任务状态"
+)
+async def get_batch(
+    batch_id: str = Path(..., description="批次 ID")
+):
+    """获取批次中每个任务的状态"""
+    jobs = await run_blocking(job_queue.list_batch, batch_id)
+    if not jobs:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return await run_blocking(BatchResponse.from_jobs, batch_id, jobs)
+
+@app.post("/imports",
+    response_model=ImportResponse,
+    status_code=202,
+    summary="批量导入 URL 列表",
+    description="上传每行一个 URL 的文本文件，后台流式读取、去重并分批入队，中断后从检查点继续"
+)
+async def import_urls(
+    request: Request,
+    urls_file: UploadFile = File(..., description="URL 列表文件，每行一个 URL，# 开头为注释"),
+    quality: str = Form("720p"),
+    mode: Literal["full", "audio_first"] = Form("full")
+):
+    """
+    批量导入 URL 列表:
+    - 文件保存到数据目录，由 import 任务流式读取，适合数万个 URL
+    - 同一视频只入队一次，已有记录的视频跳过
+    - 批次中排队的任务超过 IMPORT_MAX_QUEUED 时暂停读取
+    - 通过 /imports/{batch_id} 查看导入进度和汇总，通过 /batches/{batch_id} 查看任务状态
+    """
+    submitter = get_submitter(request)
+    batch_id = uuid.uuid4().hex
+
+    def start_import():
+        imports_dir = os.path.join(settings.BASE_DATA_PATH, "imports")
+        os.makedirs(imports_dir, exist_ok=True)
+        source = os.path.join(imports_dir, f"{batch_id}.txt")
+        with open(source, "wb") as buffer:
+            shutil.copyfileobj(urls_file.file, buffer)
+        bulk_import.create_run(source, {"quality": quality, "mode": mode}, submitter, batch_id)
+        job = job_queue.submit(JOB_KIND_IMPORT, payload={"batch_id": batch_id}, submitter=submitter)
+        bulk_import.attach_job(batch_id, job.id)
+        return ImportResponse(**bulk_import.summary(batch_id, job_queue))
+
+    try:
+        return await run_blocking(start_import)
+    except Exception as e:
+        app_logger.error(f"提交批量导入失败: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/imports/{batch_id}",
+    response_model=ImportResponse,
+    summary="获取批量导入进度",
+    description="导入的读取进度、去重统计和批次中各状态的任务数"
+)
+async def get_import(
+    batch_id: str = Path(..., description="批次 ID")
+):
+    """获取批量导入的汇总报告"""
+    report = await run_blocking(bulk_import.summary, batch_id, job_queue)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return ImportResponse(**report)
+
+@app.get("/jobs/{job_id}",
+    response_model=JobResponse,
+    summary="获取任务状态",
+    description="查询后台任务的阶段、进度和错误信息"
+)
+async def get_job(
+    job_id: int = Path(..., description="任务 ID")
+):
+    """获取任务状态"""
+    job = await run_blocking(job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return await run_blocking(JobResponse.from_db_model, job)
+
+@app.get("/jobs/{job_id}/events",
+    summary="订阅任务进度",
+    description="通过 Server-Sent Events 推送任务的阶段变化、细粒度进度和剩余时间估算，任务结束后发送 end 事件并关闭连接"
+)
+async def stream_job_events(
+    request: Request,
+    job_id: int = Path(..., description="任务 ID")
+):
+    """订阅任务进度"""
+    if not await run_blocking(job_queue.get, job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    def snapshot():
+        job = job_queue.get(job_id)
+        if job is None:
+            return None, None
+        return job, json.dumps(jsonable_encoder(JobResponse.from_db_model(job)), ensure_ascii=False)
+
+    async def events():
+        last_payload, last_stage, last_sent = None, None, time.time()
+        while not await request.is_disconnected():
+            job, payload = await run_blocking(snapshot)
+            if job is None:
+                break
+            if job.status in (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED):
+                yield f"event: end\ndata: {payload}\n\n"
+                break
+            if payload != last_payload:
+                event = "stage" if job.stage != last_stage else "progress"
+                yield f"event: {event}\ndata: {payload}\n\n"
+                last_payload, last_stage, last_sent = payload, job.stage, time.time()
+            elif time.time() - last_sent >= settings.SSE_KEEPALIVE_SECONDS:
+                yield ": keepalive\n\n"
+                last_sent = time.time()
+            await asyncio.sleep(settings.SSE_POLL_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@app.post("/jobs/{job_id}/cancel",
+    response_model=JobResponse,
+    summary="取消任务",
+    description="取消排队或执行中的任务，终止正在运行的下载、转码、转写和翻译，并释放 worker"
+)
+async def cancel_job(
+    job_id: int = Path(..., description="任务 ID")
+):
+    """取消任务"""
+    job = await run_blocking(job_queue.cancel, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return await run_blocking(JobResponse.from_db_model, job)
+
+@app.get("/video/{hash_name}",
     response_model=VideoResponse,
     summary="获取视频信息",
     description="通过 hash_name 获取视频处理信息"
@@ -309,10 +641,10 @@ async def get_video(
     hash_name: str = Path(..., description="视频的唯一 hash 标识")
 ):
     """获取已处理视频的信息"""
-    video = processor.get_video_by_hash(hash_name)
+    video = await run_blocking(load_video, hash_name)
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
-    return VideoResponse.from_db_model(video)
+    return await run_blocking(VideoResponse.from_db_model, video)
 
 @app.get("/videos", 
     response_model=List[VideoResponse],
@@ -324,8 +656,11 @@ async def list_videos(
     limit: int = Query(10, description="返回的记录数")
 ):
     """获取视频列表，支持分页"""
-    videos = processor.get_videos(skip=skip, limit=limit)
-    return [VideoResponse.from_db_model(v) for v in videos]
+    def load():
+        with VideoProcessor() as processor:
+            videos = processor.get_videos(skip=skip, limit=limit)
+            return [VideoResponse.from_db_model(v, processor) for v in videos]
+    return await run_blocking(load)
 
 @app.get("/videos/count",
     response_model=int,
@@ -334,8 +669,11 @@ async def list_videos(
 )
 async def get_videos_count():
     """获取视频总数"""
-    count = processor.get_videos_count()
-    return count
+    def count_videos():
+        with VideoProcessor() as processor:
+            return processor.get_videos_count()
+
+    return await run_blocking(count_videos)
 
 @app.delete("/video/{hash_name}",
     response_model=dict,
@@ -346,20 +684,109 @@ async def delete_video(
     hash_name: str = Path(..., description="视频的唯一 hash 标识")
 ):
     """删除视频及其相关文件"""
-    success = processor.delete_video(hash_name)
+    def remove_video():
+        with VideoProcessor() as processor:
+            return processor.delete_video(hash_name)
+
+    success = await run_blocking(remove_video)
     if not success:
         raise HTTPException(status_code=404, detail="Video not found")
     return {"status": "success", "message": "Video deleted successfully"}
 
+@app.post("/video/{hash_name}/retry",
+    response_model=JobResponse,
+    status_code=202,
+    summary="重试处理视频",
+    description="跳过已完成的阶段，从失败的阶段继续处理视频"
+)
+async def retry_video(
+    request: Request,
+    hash_name: str = Path(..., description="视频的唯一 hash 标识")
+):
+    """提交重试任务，已有进行中的任务时直接返回该任务"""
+    submitter = get_submitter(request)
+
+    def submit_retry():
+        video = load_video(hash_name)
+        if not video:
+            return None
+        job = job_queue.find_active(hash_name)
+        if job is None:
+            job = job_queue.submit(
+                "resume",
+                url=video.url,
+                hash_name=hash_name,
+                priority=PRIORITY_SINGLE,
+                submitter=submitter
+            )
+        return JobResponse.from_db_model(job)
+
+    response = await run_blocking(submit_retry)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+    return response
+
+@app.post("/video/{hash_name}/fetch-video",
+    response_model=JobResponse,
+    status_code=202,
+    summary="补充下载视频",
+    description="为先转写后补充视频模式的视频下载视频文件，播放时调用；后台的低优先级补充下载任务会被提升为单个任务优先级"
+)
+async def fetch_video(
+    request: Request,
+    hash_name: str = Path(..., description="视频的唯一 hash 标识")
+):
+    """提交补充下载视频的任务，视频文件已存在时返回 409"""
+    submitter = get_submitter(request)
+
+    def submit_fetch():
+        video = load_video(hash_name)
+        if not video:
+            raise HTTPException(status_code=404, detail="Video not found")
+        if video.url == "local_upload" or (video.file_path and os.path.exists(video.file_path)):
+            raise HTTPException(status_code=409, detail="视频文件已存在")
+        job = job_queue.find_active(hash_name, kind="fetch_video")
+        if job is not None and job.status == "queued" and (job.priority or 0) < PRIORITY_SINGLE:
+            # 首次播放，提升后台补充下载任务的优先级
+            job_queue.update(job.id, priority=PRIORITY_SINGLE)
+            job = job_queue.get(job.id)
+        elif job is None:
+            job = job_queue.submit(
+                "fetch_video",
+                url=video.url,
+                hash_name=hash_name,
+                priority=PRIORITY_SINGLE,
+                submitter=submitter
+            )
+        return JobResponse.from_db_model(job)
+
+    return await run_blocking(submit_fetch)
+
 @app.get("/health",
     response_model=dict,
     summary="健康检查",
     description="检查API服务是否正常运行"
 )
 async def health_check():
-    """返回API服务的健康状态"""
+    """返回API服务的健康状态、事件循环延迟及本进程的下载统计"""
     api_logger.info("健康检查")
-    return {"status": "ok", "message": "API service is running"}
+    return {
+        "status": "ok",
+        "message": "API service is running",
+        "event_loop": loop_monitor.stats(),
+        "downloads": download_metrics.stats(),
+        "thumbnail_cache": thumbnail_cache.stats(),
+        "preview_cache": preview_cache.stats()
+    }
+
+@app.get("/storage",
+    response_model=dict,
+    summary="媒体存储统计",
+    description="内容寻址存储中的文件数、实际占用空间和去重节省的空间"
+)
+async def storage_stats():
+    """返回内容寻址存储的统计信息"""
+    return await run_blocking(blob_store.stats)
 
 @app.get("/video/{hash_name}/files/{file_type}",
     summary="下载视频相关文件",
@@ -370,7 +797,7 @@ async def download_file(
     file_type: Literal["subtitle_en", "subtitle_zh", "wav"] = Path(..., description="文件类型")
 ):
     """下载视频相关文件"""
-    video = processor.get_video_by_hash(hash_name)
+    video = await run_blocking(load_video, hash_name)
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
 
@@ -382,15 +809,40 @@ async def download_file(
     elif file_type == "wav":
         file_path = video.wav_path
 
-    if not file_path or not os.path.exists(file_path):
+    if not file_path or not await run_blocking(os.path.exists, file_path):
         raise HTTPException(status_code=404, detail="File not found")
 
+    if file_type == "wav" and not file_path.lower().endswith(".wav"):
+        # 音频以 FLAC / Opus 存储，下载时即时转码为 WAV
+        return StreamingResponse(
+            _transcode_stream(wav_stream_command(file_path)),
+            media_type="audio/wav",
+            headers={"Content-Disposition": 'attachment; filename="audio.wav"'}
+        )
+
     return FileResponse(
         file_path,
         filename=os.path.basename(file_path),
         media_type="application/octet-stream"
     )
 
+async def _transcode_stream(cmd: List[str]):
+    """逐块返回 ffmpeg 的标准输出；客户端断开时终止 ffmpeg"""
+    process = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+    )
+    try:
+        while True:
+            chunk = await process.stdout.read(256 * 1024)
+            if not chunk:
+                break
+            yield chunk
+        await process.wait()
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+
 # 添加静态文件直接访问路由
 @app.get("/app.js")
 async def read_app_js():
@@ -403,34 +855,172 @@ async def read_video_js():
     return FileResponse("frontend/video.js")
 
 @app.post("/video/{hash_name}/render-subtitle", 
-    response_model=VideoResponse,
+    response_model=RenderResponse,
+    status_code=202,
     summary="渲染字幕到视频",
-    description="将字幕渲染到视频中，生成带有硬编码字幕的新视频文件"
+    description="将字幕烧录到视频 (burn，重新编码) 或封装为可切换的软字幕轨道 (mux，不重新编码)。"
+                "原视频、字幕和参数都没有变化时直接返回已有结果 (200)，否则提交后台任务 (202)，通过任务接口查询进度"
 )
 async def render_subtitle_to_video(
-    hash_name: str = Path(..., description="视频的唯一 hash 标识")
+    request: Request,
+    response: Response,
+    hash_name: str = Path(..., description="视频的唯一 hash 标识"),
+    mode: Literal["burn", "mux"] = Query("burn", description="burn: 烧录硬字幕; mux: 封装软字幕轨道"),
+    container: Literal["mp4", "mkv"] = Query("mp4", description="软字幕封装的容器格式: mp4 (mov_text) 或 mkv (保留 ASS 样式)")
 ):
-    """将字幕渲染到视频中"""
+    """返回已缓存的渲染结果，或提交渲染任务 (已有参数相同的进行中任务时直接返回该任务)"""
+    submitter = get_submitter(request)
+    payload = {"mode": mode, "container": container} if mode == "mux" else {"mode": mode}
+
+    def submit_render():
+        with VideoProcessor() as processor:
+            video = processor.get_video_by_hash(hash_name)
+            if not video:
+                raise HTTPException(status_code=404, detail="视频不存在")
+            if not processor.check_file_exists(video.file_path):
+                raise HTTPException(status_code=409, detail="视频文件不存在")
+            cached = processor.find_cached_render(hash_name, mode=mode, container=container)
+        if cached is not None:
+            response.status_code = 200
+            return RenderResponse(status="cached", mode=mode, url=f"/file/{cached.path}",
+                                  size=cached.size, created_at=cached.created_at)
+        job = job_queue.find_active(hash_name, kind="render")
+        if job is None or json.loads(job.payload or "{}") != payload:
+            job = job_queue.submit(
+                "render",
+                url=video.url,
+                payload=payload,
+                hash_name=hash_name,
+                priority=PRIORITY_SINGLE,
+                submitter=submitter
+            )
+        return RenderResponse(status="queued", mode=mode, job=JobResponse.from_db_model(job))
+
+    return await run_blocking(submit_render)
+
+def _preview_plan(hash_name: str, start: float, end: float) -> Optional[dict]:
+    with VideoProcessor() as processor:
+        return processor.preview_plan(hash_name, start, end)
+
+def _render_preview(plan: dict) -> str:
+    with VideoProcessor() as processor:
+        return processor.render_preview(plan)
+
+@app.get("/video/{hash_name}/preview",
+    summary="字幕预览片段",
+    description="渲染指定时间段的烧录字幕短片段 (MP4)，用于检查字幕样式，几秒内返回；"
+                "结果按原视频、字幕内容和时间段缓存"
+)
+async def get_subtitle_preview(
+    request: Request,
+    hash_name: str = Path(..., description="视频的唯一 hash 标识"),
+    start: float = Query(..., ge=0, description="开始时间 (秒)"),
+    end: float = Query(..., gt=0, description="结束时间 (秒)")
+):
+    """
+    返回烧录字幕的预览片段
+
+    先在 IO 线程池中确定输入和缓存文件名，缓存未命中时在渲染线程池中同步渲染。
+    缓存文件名由字幕内容计算，用作 ETag；字幕修改后浏览器重新验证时得到新的片段。
+    """
+    if end <= start:
+        raise HTTPException(status_code=400, detail="结束时间必须大于开始时间")
+    if end - start > settings.PREVIEW_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"预览片段不能超过 {settings.PREVIEW_MAX_SECONDS:g} 秒")
+
     try:
-        # 获取视频信息
-        video = processor.get_video_by_hash(hash_name)
-        if not video:
-            raise HTTPException(status_code=404, detail="视频不存在")
-            
-        # 渲染字幕到视频
-        rendered_video_path = processor.render_subtitle_to_video(hash_name)
-        if not rendered_video_path:
-            raise HTTPException(status_code=500, detail="字幕渲染失败")
-            
-        # 更新视频信息
-        video.file_path = rendered_video_path
-        processor.get_db_session().commit()
-        
-        # 返回更新后的视频信息
-        return VideoResponse.from_db_model(video)
-        
+        plan = await run_blocking(_preview_plan, hash_name, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"处理失败: {str(e)}")
+        raise HTTPException(status_code=409, detail=str(e))
+    if plan is None:
+        raise HTTPException(status_code=404, detail="视频不存在")
+
+    headers = {"ETag": f'"{plan["key"]}"', "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    try:
+        path = await run_blocking(_render_preview, plan, pool=POOL_RENDER)
+    except Exception as e:
+        api_logger.error(f"渲染预览片段失败: {hash_name}, {str(e)}")
+        raise HTTPException(status_code=500, detail=f"渲染预览片段失败: {str(e)}")
+    return FileResponse(path, media_type="video/mp4", headers=headers)
+
+def _hls_package_dir(hash_name: str) -> tuple:
+    """返回 (视频, HLS 打包目录)，视频不存在或未打包时抛出 404"""
+    video = load_video(hash_name)
+    if not video:
+        raise HTTPException(status_code=404, detail="视频不存在")
+    if not video.hls_playlist_path or not os.path.exists(video.hls_playlist_path):
+        raise HTTPException(status_code=404, detail="视频未打包为 HLS")
+    return video, os.path.dirname(video.hls_playlist_path)
+
+@app.get("/video/{hash_name}/hls/{name}",
+    summary="HLS 播放列表和字幕",
+    description="master.m3u8 为主播放列表；subs_<语言>.m3u8 / subs_<语言>.vtt 为由当前字幕生成的 WebVTT 字幕轨道"
+)
+async def get_hls_playlist(
+    request: Request,
+    hash_name: str = Path(..., description="视频的唯一 hash 标识"),
+    name: str = Path(..., description="master.m3u8、subs_<eng|chi>.m3u8 或 subs_<eng|chi>.vtt")
+):
+    """
+    主播放列表和字幕轨道按请求生成，字幕修改后立即生效。
+    响应带内容的 ETag 和 Cache-Control: no-cache，未修改时返回 304。
+    """
+    def build():
+        video, package_dir = _hls_package_dir(hash_name)
+        subtitle_json = next((path for path in (video.subtitle_zh_cn_json_path, video.subtitle_en_json_path)
+                              if path and os.path.exists(path)), None)
+        segments = hls_packager.load_subtitle_segments(subtitle_json)
+        tracks = hls_packager.subtitle_tracks(segments)
+        if name == "master.m3u8":
+            return hls_packager.master_playlist(package_dir, tracks), hls_packager.PLAYLIST_MEDIA_TYPE
+        for field, language, _ in tracks:
+            if name == f"subs_{language}.m3u8":
+                duration = video.duration or segments[-1]["end"]
+                return hls_packager.subtitle_playlist(language, duration), hls_packager.PLAYLIST_MEDIA_TYPE
+            if name == f"subs_{language}.vtt":
+                start_time = hls_packager.stream_info(package_dir).get("start_time", 0.0)
+                return hls_packager.webvtt(segments, field, start_time), "text/vtt"
+        raise HTTPException(status_code=404, detail=f"文件不存在: {name}")
+
+    content, content_type = await run_blocking(build)
+    headers = {"ETag": f'"{hashlib.md5(content.encode()).hexdigest()}"', "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content, media_type=content_type, headers=headers)
+
+@app.get("/video/{hash_name}/hls/{version}/{name}",
+    summary="HLS 分片",
+    description="HLS 媒体播放列表、初始化分片和媒体分片。目录名随视频内容变化，文件内容不变，可长期缓存"
+)
+async def get_hls_segment(
+    hash_name: str = Path(..., description="视频的唯一 hash 标识"),
+    version: str = Path(..., description="打包版本 (12 位，由原视频内容和打包参数计算)"),
+    name: str = Path(..., description="index.m3u8、init.mp4 或 seg_NNNNN.m4s")
+):
+    """
+    当前版本和尚未清理的旧版本都可读取，重新打包后正在播放旧播放列表的客户端不会中断；
+    旧版本保留 HLS_RETAIN_SECONDS 后删除，之后返回 404
+    """
+    if not hls_packager.VERSION_PATTERN.match(version) or not hls_packager.FILE_PATTERN.match(name):
+        raise HTTPException(status_code=404, detail="文件不存在")
+
+    def find_segment():
+        _, package_dir = _hls_package_dir(hash_name)
+        path = os.path.join(os.path.dirname(package_dir), version, name)
+        if not os.path.exists(path):
+            raise HTTPException(status_code=404, detail="文件不存在")
+        return path
+
+    path = await run_blocking(find_segment)
+    return FileResponse(
+        path,
+        media_type=hls_packager.MEDIA_TYPES[os.path.splitext(name)[1]],
+        headers={"Cache-Control": f"public, max-age={settings.HLS_CACHE_MAX_AGE}, immutable"}
+    )
 
 @app.post("/upload", 
     response_model=VideoResponse,
@@ -438,6 +1028,7 @@ async def render_subtitle_to_video(
     description="上传本地视频文件，生成字幕和翻译"
 )
 async def upload_video(
+    request: Request,
     video_file: UploadFile = File(..., description="视频文件"),
     title: str = Form(..., description="视频标题")
 ):
@@ -450,26 +1041,43 @@ async def upload_video(
     - 翻译字幕
     - 生成双语字幕文件
     """
-    try:
-        # 保存上传的视频文件到临时位置
-        temp_file_path = f"temp/{video_file.filename}"
+    submitter = get_submitter(request)
+    # 保存上传的视频文件到临时位置；上传并发执行，文件名使用随机值，不使用客户端提供的文件名
+    temp_file_path = os.path.join("temp", f"upload_{uuid.uuid4().hex}")
+
+    def save_upload():
         os.makedirs(os.path.dirname(temp_file_path), exist_ok=True)
         
-        with open(temp_file_path, "wb") as buffer:
-            content = await video_file.read()
-            buffer.write(content)
+        # 分块复制，避免将整个文件读入内存；写入的同时计算 SHA-256，用于去重存储
+        digest = blob_store.copy_stream(video_file.file, temp_file_path)
         
-        # 处理本地视频文件
-        video = processor.process_local_video(temp_file_path, title)
+        # 保存本地视频文件并创建记录
+        with VideoProcessor() as processor:
+            video = processor.process_local_video(temp_file_path, title, digest)
         
         # 处理完成后删除临时文件
         if os.path.exists(temp_file_path):
             os.remove(temp_file_path)
         
-        return VideoResponse.from_db_model(video)
+        # 上传任务优先级最高
+        job = job_queue.submit(
+            "upload",
+            url=video.url,
+            hash_name=video.hash_name,
+            priority=PRIORITY_UPLOAD,
+            submitter=submitter
+        )
+        return job, VideoResponse.from_db_model(video)
+
+    try:
+        job, response = await run_blocking(save_upload)
+        return JSONResponse(
+            content=jsonable_encoder(response),
+            headers={"X-Job-Id": str(job.id)}
+        )
     except Exception as e:
         # 确保出错时也删除临时文件
-        if 'temp_file_path' in locals() and os.path.exists(temp_file_path):
+        if os.path.exists(temp_file_path):
             os.remove(temp_file_path)
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -481,9 +1089,9 @@ async def get_video_subtitles(
     hash_name: str = Path(..., description="视频的唯一 hash 标识")
 ):
     """获取视频字幕内容"""
-    try:
+    def load_subtitles():
         # 获取视频信息
-        video = processor.get_video_by_hash(hash_name)
+        video = load_video(hash_name)
         if not video:
             raise HTTPException(status_code=404, detail="视频不存在")
             
@@ -530,7 +1138,10 @@ async def get_video_subtitles(
             'language': language,
             'subtitles': subtitles
         }
-        
+
+    try:
+        # 读取和解析字幕 JSON 在线程池中执行
+        return await run_blocking(load_subtitles)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取字幕失败: {str(e)}")
 
@@ -567,9 +1178,15 @@ async def get_video_data(
     from sqlalchemy.orm import Session
     from models.database import SessionLocal, Video
     
-    db = SessionLocal()
+    def query_videos():
+        db = SessionLocal()
+        try:
+            return db.query(Video).offset(skip).limit(limit).all()
+        finally:
+            db.close()
+
     try:
-        videos = db.query(Video).offset(skip).limit(limit).all()
+        videos = await run_blocking(query_videos)
         api_logger.info(f"成功查询到{len(videos)}条视频记录")
         
         # 将 SQLAlchemy 模型转换为字典
@@ -599,80 +1216,65 @@ async def get_video_data(
     except Exception as e:
         api_logger.error(f"获取视频数据失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取视频数据失败: {str(e)}")
-    finally:
-        db.close()
 
 @app.get("/video/{hash_name}/thumbnail", 
     summary="获取视频缩略图",
-    description="获取视频的缩略图"
+    description="获取视频的缩略图，指定 w/h/fmt 时返回缩放后的图片 (结果缓存在磁盘)"
 )
 async def get_video_thumbnail(
-    hash_name: str = Path(..., description="视频的唯一 hash 标识")
+    request: Request,
+    hash_name: str = Path(..., description="视频的唯一 hash 标识"),
+    w: Optional[int] = Query(None, ge=16, le=settings.THUMBNAIL_MAX_SIZE, description="宽度"),
+    h: Optional[int] = Query(None, ge=16, le=settings.THUMBNAIL_MAX_SIZE, description="高度，同时指定宽高时居中裁剪"),
+    fmt: Optional[Literal["jpg", "webp", "png"]] = Query(None, description="输出格式"),
+    v: Optional[str] = Query(None, description="缩略图版本 (视频信息中的 thumbnail_url)")
 ):
-    """获取视频的缩略图"""
-    try:
-        print(f"请求获取视频缩略图: {hash_name}")
-        
-        # 获取视频信息
-        video = processor.get_video_by_hash(hash_name)
+    """
+    获取视频的缩略图
+
+    从已生成的各尺寸缩略图中选择不小于目标宽度的最小尺寸，用 Pillow 缩放一次后写入磁盘缓存，
+    之后的请求直接返回缓存文件。带当前版本 v 的 URL 内容不会改变，返回
+    Cache-Control: public, max-age=31536000, immutable；不带版本或版本已过期时返回 ETag 和
+    Cache-Control: no-cache，未修改时返回 304。
+    """
+    def find_thumbnail():
+        video = load_video(hash_name)
         if not video:
             raise HTTPException(status_code=404, detail="视频不存在")
-        
-        print(f"视频信息: {video.title}, 缩略图路径: {video.pic_thumb_path}, 文件夹路径: {video.folder_hash_name_path}")
-        
-        # 尝试获取缩略图
-        if video.pic_thumb_path and os.path.exists(video.pic_thumb_path):
-            print(f"使用数据库中的缩略图路径: {video.pic_thumb_path}")
-            return FileResponse(video.pic_thumb_path)
-        
-        # 尝试直接使用hash_name构建路径
-        direct_path = f"data/{hash_name}/original/thumbnail.jpg"
-        if os.path.exists(direct_path):
-            print(f"找到直接路径缩略图: {direct_path}")
-            return FileResponse(direct_path)
-            
-        # 尝试使用相对路径
-        relative_path = f"../data/{hash_name}/original/thumbnail.jpg"
-        if os.path.exists(relative_path):
-            print(f"找到相对路径缩略图: {relative_path}")
-            return FileResponse(relative_path)
-        
-        # 如果数据库中的缩略图不存在，尝试查找可能的缩略图文件
-        if video.folder_hash_name_path:
-            original_dir = os.path.join(video.folder_hash_name_path, "original")
-            print(f"尝试在目录中查找: {original_dir}")
-            
-            if os.path.exists(original_dir):
-                # 检查各种可能的缩略图文件名
-                possible_names = [
-                    "thumbnail.jpg",
-                    "thumbnail.webp",
-                    "thumbnail.webp.webp",
-                    "thumbnail.png"
-                ]
-                
-                for name in possible_names:
-                    path = os.path.join(original_dir, name)
-                    if os.path.exists(path):
-                        print(f"找到替代缩略图: {path}")
-                        return FileResponse(path)
-        
-        # 尝试在backend目录下查找
-        backend_path = f"data/{hash_name}/original/thumbnail.jpg"
-        if os.path.exists(backend_path):
-            print(f"找到backend目录下的缩略图: {backend_path}")
-            return FileResponse(backend_path)
-        
-        # 如果没有找到缩略图，返回默认图片
-        default_thumbnail = "../frontend/public/static/assets/default-thumbnail.svg"
-        if os.path.exists(default_thumbnail):
-            print(f"使用默认缩略图: {default_thumbnail}")
-            return FileResponse(default_thumbnail)
-        
-        # 如果默认缩略图也不存在，返回404
-        raise HTTPException(status_code=404, detail="缩略图不存在")
+
+        variants = json.loads(video.thumbnail_variants or "[]")
+        source = pick_source(variants, video.pic_thumb_path, w)
+        if source is None:
+            # 没有缩略图时返回默认图片，不缓存
+            default_thumbnail = "../frontend/public/static/assets/default-thumbnail.svg"
+            if os.path.exists(default_thumbnail):
+                return FileResponse(default_thumbnail, headers={"Cache-Control": "no-cache"})
+            raise HTTPException(status_code=404, detail="缩略图不存在")
+
+        # 不指定参数时直接返回源图片
+        out_fmt = (fmt or "jpg") if (w or h or fmt) else None
+        etag = thumbnail_cache.cache_key(hash_name, source, w, h, out_fmt or "src")
+        headers = {"ETag": f'"{etag}"'}
+        if v is not None and v == thumbnail_version(variants, video.pic_thumb_path):
+            # 缩略图重新生成后版本改变，带版本的 URL 内容固定，浏览器不再重新验证
+            headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            # 不带版本的 URL 在源图片重新生成后地址不变: 浏览器每次用 ETag 重新验证，未修改时返回 304
+            headers["Cache-Control"] = "no-cache"
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
+        if out_fmt is None:
+            return FileResponse(source, headers=headers)
+        path = thumbnail_cache.get(hash_name, source, w, h, out_fmt, key=etag)
+        return FileResponse(path, media_type=media_type(out_fmt), headers=headers)
+
+    try:
+        # 读取数据库和缩放图片在线程池中执行
+        return await run_blocking(find_thumbnail)
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"获取缩略图失败: {str(e)}")
+        api_logger.error(f"获取缩略图失败: {hash_name}, {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取缩略图失败: {str(e)}")
 
 @app.get("/direct-file/{path:path}", 
@@ -718,11 +1320,11 @@ async def get_original_transcript(
     - 检查原始转写JSON文件是否存在
     - 返回JSON文件内容
     """
-    try:
+    def load_transcript():
         api_logger.info(f"请求获取视频原始转写: {hash_name}")
         
         # 获取视频信息
-        video = processor.get_video_by_hash(hash_name)
+        video = load_video(hash_name)
         if not video:
             api_logger.warning(f"视频未找到: {hash_name}")
             raise HTTPException(status_code=404, detail=f"视频未找到: {hash_name}")
@@ -793,7 +1395,10 @@ async def get_original_transcript(
         except Exception as e:
             api_logger.error(f"读取JSON文件失败: {str(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail=f"读取JSON文件失败: {str(e)}")
-            
+
+    try:
+        # 读取和解析转写 JSON 在线程池中执行
+        return await run_blocking(load_transcript)
     except HTTPException:
         raise
     except Exception as e:
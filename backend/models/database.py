@@ -1,11 +1,20 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime
+import os
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, Column, Integer, BigInteger, String, DateTime, Float, Text, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import settings
 from datetime import datetime
+from utils.url_utils import source_key
 
 # 创建数据库引擎
-engine = create_engine(settings.DATABASE_URL)
+# SQLite 仅用于本地测试: 允许跨线程使用连接，并在多个 worker 进程写入时等待锁
+if settings.DATABASE_URL.startswith("sqlite"):
+    engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False, "timeout": 30})
+else:
+    # 多节点部署时连接可能被数据库或网络中断，使用前先检测
+    engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -13,6 +22,15 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # 创建基类
 Base = declarative_base()
 
+# 数据库迁移配置 (backend/alembic.ini，迁移脚本在 migrations/)
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+
+def _default_source_key(context):
+    """插入视频记录时按 url 生成 source_key"""
+    return source_key(context.get_current_parameters().get("url"))
+
+
 class Video(Base):
     __tablename__ = "video"
 
@@ -20,18 +38,157 @@ class Video(Base):
     title = Column(String)
     url = Column(String, unique=True, index=True)
     hash_name = Column(String, unique=True, index=True)
+    # 按 URL 格式识别的 "站点:视频 ID"，用于查找同一视频的已有记录，插入时由 url 生成
+    source_key = Column(String, index=True, default=_default_source_key)
     folder_hash_name_path = Column(String)
     pic_thumb_path = Column(String)
     file_path = Column(String)
-    wav_path = Column(String)
+    wav_path = Column(String)  # 语音识别用的音频 (audio.flac / audio.opus，旧版本为 audio.wav)
     subtitle_en_json_path = Column(String)
     subtitle_zh_cn_json_path = Column(String)
     subtitle_en_ass_path = Column(String)
     subtitle_zh_cn_ass_path = Column(String)
     subtitle_en_md_path = Column(String)
     subtitle_zh_cn_md_path = Column(String)
+    process_mode = Column(String, default="full")  # full / audio_first (先转写，视频之后补充下载)
+    duration = Column(Float)  # 媒体时长 (秒)
+    media_info = Column(Text)  # JSON: 容器格式、编码、分辨率等媒体信息
+    thumbnail_variants = Column(Text)  # JSON: 各尺寸缩略图 [{width, height, format, path}]
+    soft_subtitle_path = Column(String)  # 最近一次封装了软字幕轨道的视频 (MP4 / MKV)，不重新编码
+    rendered_path = Column(String)  # 最近一次烧录了硬字幕的视频，file_path 始终为原视频
+    sprite_index_path = Column(String)  # 拖动预览雪碧图索引 sprites.json (同目录下有 sprites.vtt)
+    hls_playlist_path = Column(String)  # HLS 媒体播放列表 original/hls/<版本>/index.m3u8，未打包时为空
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class Job(Base):
+    """后台处理任务，API 只负责入队，由 worker 认领执行"""
+    __tablename__ = "job"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, default="process", index=True)
+    url = Column(String)
+    hash_name = Column(String, index=True)
+    batch_id = Column(String, index=True)  # 批量提交时的批次 ID
+    payload = Column(Text)  # JSON 格式的任务参数
+    status = Column(String, default="queued", index=True)  # queued / running / cancelling / succeeded / failed / cancelled
+    priority = Column(Integer, default=20, index=True)  # 数值越大越优先
+    submitter = Column(String, index=True)  # 提交者，用于公平调度
+    stage = Column(String)
+    progress = Column(Float, default=0.0)
+    error = Column(Text)
+    critical_path = Column(Text)  # JSON: 各阶段耗时及关键路径
+    detail = Column(Text)  # JSON: 阶段计划及各阶段细粒度进度，用于推送进度和估算剩余时间
+    attempts = Column(Integer, default=0)
+    worker_id = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime, index=True)  # 执行中任务的最近心跳，超时后任务被回收重新排队
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class VideoStage(Base):
+    """视频处理阶段的完成记录，用于失败后从中断的阶段继续"""
+    __tablename__ = "video_stage"
+
+    id = Column(Integer, primary_key=True, index=True)
+    hash_name = Column(String, index=True)
+    stage = Column(String)
+    artifacts = Column(Text)  # JSON: 阶段产物路径列表
+    checksum = Column(String)  # 产物的 SHA-256
+    completed_at = Column(DateTime, default=datetime.utcnow)
+
+class StageStat(Base):
+    """阶段历史吞吐量，用于估算剩余时间"""
+    __tablename__ = "stage_stat"
+
+    id = Column(Integer, primary_key=True, index=True)
+    stage = Column(String, index=True)
+    unit = Column(String)  # 工作量单位: bytes / seconds / segments，未知时为空
+    work = Column(Float)  # 阶段完成的工作量
+    seconds = Column(Float)  # 阶段耗时
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class UrlProbe(Base):
+    """URL 元数据探测缓存，用于把不同形式的链接映射到同一个 (站点, 视频 ID)"""
+    __tablename__ = "url_probe"
+
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(String, unique=True, index=True)  # 提交时的原始 URL
+    extractor = Column(String, index=True)
+    video_id = Column(String, index=True)
+    canonical_url = Column(String, index=True)
+    title = Column(String)
+    duration = Column(Float)
+    probed_at = Column(DateTime, default=datetime.utcnow)
+
+class MediaBlob(Base):
+    """内容寻址存储中的媒体文件，按 SHA-256 去重"""
+    __tablename__ = "media_blob"
+
+    digest = Column(String, primary_key=True)  # 文件内容的 SHA-256
+    size = Column(BigInteger)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class MediaBlobRef(Base):
+    """视频目录中指向 MediaBlob 的文件 (硬链接)，引用数为 0 时删除 MediaBlob"""
+    __tablename__ = "media_blob_ref"
+
+    id = Column(Integer, primary_key=True, index=True)
+    digest = Column(String, index=True)
+    path = Column(String, unique=True, index=True)
+    hash_name = Column(String, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ImportRun(Base):
+    """URL 列表批量导入的进度，按文件偏移记录检查点，中断后从检查点继续"""
+    __tablename__ = "import_run"
+
+    id = Column(Integer, primary_key=True, index=True)
+    batch_id = Column(String, unique=True, index=True)  # 导入的任务共享的批次 ID
+    source = Column(String)  # URL 列表文件路径
+    job_id = Column(Integer)  # 执行导入的任务，命令行导入时为空
+    status = Column(String, index=True)  # running / completed / failed / cancelled
+    payload = Column(Text)  # JSON: 导入任务的参数 (quality、mode)
+    submitter = Column(String)
+    offset = Column(BigInteger, default=0)  # 已处理到的文件字节偏移
+    checkpoint_at = Column(DateTime)  # 最近一次记录检查点的时间
+    lines = Column(Integer, default=0)  # 已读取的 URL 行数
+    invalid = Column(Integer, default=0)  # 无效的 URL
+    duplicates = Column(Integer, default=0)  # 文件中重复的视频
+    existing = Column(Integer, default=0)  # 已有记录的视频
+    reused = Column(Integer, default=0)  # 已有进行中任务的视频
+    enqueued = Column(Integer, default=0)  # 新入队的任务
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+class RenderOutput(Base):
+    """字幕渲染结果，按 (原视频内容, 字幕内容, 渲染参数) 缓存，相同请求直接返回已有文件"""
+    __tablename__ = "render_output"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String, unique=True, index=True)  # 原视频、字幕和渲染参数的 SHA-256
+    hash_name = Column(String, index=True)
+    mode = Column(String)  # burn / mux
+    params = Column(Text)  # JSON: 渲染参数 (容器格式、编码预设、质量)
+    source_digest = Column(String)  # 原视频的 SHA-256
+    subtitle_digest = Column(String)  # 字幕文件的 SHA-256
+    path = Column(String)
+    size = Column(BigInteger)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+
 def init_db():
-    """初始化数据库"""
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    """
+    初始化数据库: 执行 migrations/ 中尚未应用的 alembic 迁移
+
+    使用 alembic 之前由 create_all 创建的数据库 (只有 video 表) 先标记为初始版本 001，再升级。
+    """
+    config = Config(ALEMBIC_INI)
+    # 应用内执行时沿用应用的日志配置
+    config.attributes["configure_logger"] = False
+    inspector = inspect(engine)
+    if inspector.has_table("video") and not inspector.has_table("alembic_version"):
+        command.stamp(config, "001")
+    command.upgrade(config, "head")
@@ -0,0 +1,129 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from config import settings
+from models.database import SessionLocal, Video
+from services import blob_store
+from services.job_queue import JobQueue
+from services.media_prep import audio_file_name, compress_audio
+from services.stage_store import StageStore
+from utils.file_lock import LockBusy, video_lock
+from utils.logger import get_logger
+
+logger = get_logger("audio_compaction")
+
+
+def pending_videos() -> List[str]:
+    """音频仍为 WAV 的视频"""
+    db = SessionLocal()
+    try:
+        rows = db.query(Video.hash_name).filter(Video.wav_path.like("%.wav")).order_by(Video.id).all()
+        return [row.hash_name for row in rows]
+    finally:
+        db.close()
+
+
+def compact_video(hash_name: str, queue: Optional[JobQueue] = None, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    把一个视频的 audio.wav 转换为存储格式 (AUDIO_STORAGE_FORMAT)
+
+    转换完成后依次: 新文件纳入内容寻址存储，更新 wav_path，media_prep 阶段已完成时改为记录新文件
+    (重试时不重新提取音频)，最后释放并删除 WAV。
+
+    全程持有视频目录的独占锁，处理流程持共享锁，两者不会同时执行；锁被占用时跳过。
+    其他节点的任务不受本机文件锁约束，因此转换前和切换 wav_path 前都检查有无排队或执行中的任务，
+    有则放弃本次转换，保留 WAV。
+
+    Returns:
+        {"hash_name", "status" (compacted / skipped / failed，dry_run 时待压缩的为 pending), "before", "after", "error"}
+    """
+    result: Dict[str, Any] = {"hash_name": hash_name, "status": "skipped", "before": 0, "after": 0, "error": None}
+    queue = queue or JobQueue()
+    db = SessionLocal()
+    try:
+        video = db.query(Video).filter(Video.hash_name == hash_name).first()
+        wav_path = video.wav_path if video else None
+        if not wav_path or not wav_path.endswith(".wav") or not os.path.exists(wav_path):
+            result["error"] = "WAV 文件不存在"
+            return result
+        with video_lock(video.folder_hash_name_path, exclusive=True, wait=False):
+            db.refresh(video)
+            if video.wav_path != wav_path:
+                result["error"] = "音频已被其他进程修改"
+                return result
+            if queue.find_active(hash_name) is not None:
+                result["error"] = "有进行中的任务"
+                return result
+            result["before"] = os.path.getsize(wav_path)
+            if dry_run:
+                result["status"] = "pending"
+                return result
+
+            audio_path = os.path.join(os.path.dirname(wav_path), audio_file_name())
+            blob_store.detach(audio_path)
+            compress_audio(wav_path, audio_path)
+
+            # 转换期间其他节点可能开始处理该视频，此时不切换，仍使用 WAV
+            if queue.find_active(hash_name) is not None:
+                blob_store.detach(audio_path)
+                if os.path.exists(audio_path):
+                    os.remove(audio_path)
+                result["error"] = "转换期间有新的任务"
+                return result
+            blob_store.store(audio_path, hash_name)
+
+            stages = StageStore(hash_name)
+            media_prep_done = stages.is_complete("media_prep", [wav_path])
+            video.wav_path = audio_path
+            db.commit()
+            if media_prep_done:
+                stages.mark_complete("media_prep", [audio_path])
+
+            blob_store.detach(wav_path)
+            if os.path.exists(wav_path):
+                os.remove(wav_path)
+        result.update(status="compacted", after=os.path.getsize(audio_path))
+        logger.info(f"音频已压缩: {hash_name}, {result['before']} -> {result['after']} 字节")
+    except LockBusy:
+        result["error"] = "视频正在处理"
+    except Exception as e:
+        db.rollback()
+        logger.error(f"音频压缩失败: {hash_name}, {str(e)}")
+        result.update(status="failed", error=str(e))
+    finally:
+        db.close()
+    return result
+
+
+def compact_all(workers: int = 0, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    并行压缩所有仍为 WAV 的音频，返回汇总
+
+    每个视频由一个 ffmpeg 进程转换，并行数为 workers (0 表示 CPU 核心数)。
+    """
+    if settings.AUDIO_STORAGE_FORMAT == "wav":
+        raise ValueError("AUDIO_STORAGE_FORMAT 为 wav，不需要压缩")
+    hash_names = pending_videos()
+    workers = workers or os.cpu_count() or 1
+    logger.info(f"待压缩音频: {len(hash_names)} 个，并行数 {workers}，格式 {settings.AUDIO_STORAGE_FORMAT}")
+
+    queue = JobQueue()
+    summary: Dict[str, Any] = {"total": len(hash_names), "compacted": 0, "pending": 0, "skipped": 0, "failed": 0,
+                               "before_bytes": 0, "after_bytes": 0, "errors": {}}
+    lock = threading.Lock()
+
+    def run(hash_name: str) -> None:
+        result = compact_video(hash_name, queue, dry_run=dry_run)
+        with lock:
+            summary[result["status"]] += 1
+            if result["status"] in ("compacted", "pending"):
+                summary["before_bytes"] += result["before"]
+                summary["after_bytes"] += result["after"]
+            if result["error"]:
+                summary["errors"][hash_name] = result["error"]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="compact") as executor:
+        list(executor.map(run, hash_names))
+    summary["saved_bytes"] = 0 if dry_run else summary["before_bytes"] - summary["after_bytes"]
+    return summary
@@ -0,0 +1,218 @@
+import hashlib
+import os
+import uuid
+from typing import BinaryIO, List, Optional
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from config import settings
+from models.database import SessionLocal, MediaBlob, MediaBlobRef
+from utils.logger import get_logger
+
+logger = get_logger("blob_store")
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def blob_path(digest: str) -> str:
+    """blob 在存储目录中的路径: <BASE_DATA_PATH>/<BLOB_STORE_DIR>/ab/cd/<digest>"""
+    return os.path.join(settings.BASE_DATA_PATH, settings.BLOB_STORE_DIR, digest[:2], digest[2:4], digest)
+
+
+def file_digest(path: str) -> str:
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def copy_stream(src: BinaryIO, dest_path: str) -> str:
+    """把数据流写入文件，写入的同时计算 SHA-256，避免之后再读一遍文件"""
+    digest = hashlib.sha256()
+    with open(dest_path, "wb") as dest:
+        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            dest.write(chunk)
+    return digest.hexdigest()
+
+
+def _link_replace(src: str, dest: str) -> None:
+    """用指向 src 的硬链接原子替换 dest"""
+    tmp = f"{dest}.{uuid.uuid4().hex[:8]}.link"
+    os.link(src, tmp)
+    try:
+        os.replace(tmp, dest)
+    except OSError:
+        os.remove(tmp)
+        raise
+
+
+def known_digest(path: str) -> Optional[str]:
+    """已纳入存储的文件的 SHA-256 (查询引用记录，不读取文件)；未登记或大小不一致时返回 None"""
+    if not path or not os.path.exists(path):
+        return None
+    db = SessionLocal()
+    try:
+        row = (
+            db.query(MediaBlob.digest, MediaBlob.size)
+            .join(MediaBlobRef, MediaBlobRef.digest == MediaBlob.digest)
+            .filter(MediaBlobRef.path == os.path.normpath(path))
+            .first()
+        )
+    finally:
+        db.close()
+    if row is None or row.size != os.path.getsize(path):
+        return None
+    return row.digest
+
+
+def store(path: str, hash_name: str, digest: Optional[str] = None) -> Optional[str]:
+    """
+    把视频目录中的媒体文件纳入内容寻址存储
+
+    已有相同内容的 blob 时，path 替换为指向 blob 的硬链接，重复的空间立即释放；
+    否则为 path 创建硬链接作为新的 blob。之后同一内容的文件只占用一份磁盘空间。
+
+    Args:
+        path: 视频目录中的文件
+        hash_name: 所属视频
+        digest: 已知的 SHA-256 (如上传时边写边算)，为 None 时读取文件计算
+
+    Returns:
+        文件的 SHA-256；未启用或文件系统不支持硬链接时返回 None，文件保持不变
+    """
+    if not settings.BLOB_STORE_ENABLED or not path or not os.path.exists(path):
+        return None
+    path = os.path.normpath(path)
+    digest = digest or file_digest(path)
+    target = blob_path(digest)
+    try:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(target):
+            if not os.path.samefile(path, target):
+                _link_replace(target, path)
+        else:
+            try:
+                os.link(path, target)
+            except FileExistsError:
+                # 其他任务同时写入了相同内容的 blob
+                _link_replace(target, path)
+    except OSError as e:
+        logger.warning(f"无法创建硬链接，文件不纳入内容寻址存储: {path}, {str(e)}")
+        return None
+
+    _record(digest, os.path.getsize(path), path, hash_name)
+    return digest
+
+
+def _record(digest: str, size: int, path: str, hash_name: str) -> None:
+    """登记 blob 及 path 对它的引用；path 之前引用其他 blob 时释放旧引用"""
+    db = SessionLocal()
+    try:
+        if db.get(MediaBlob, digest) is None:
+            try:
+                db.add(MediaBlob(digest=digest, size=size))
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+
+        previous = db.query(MediaBlobRef).filter(MediaBlobRef.path == path).first()
+        if previous is not None and previous.digest == digest:
+            return
+        stale = []
+        if previous is not None:
+            stale.append(previous.digest)
+            db.delete(previous)
+        db.add(MediaBlobRef(digest=digest, path=path, hash_name=hash_name))
+        db.commit()
+        _collect(db, stale)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _collect(db, digests: List[str]) -> int:
+    """删除不再被引用的 blob，返回删除的数量"""
+    removed = 0
+    for digest in set(digests):
+        refs = db.query(func.count(MediaBlobRef.id)).filter(MediaBlobRef.digest == digest).scalar()
+        if refs:
+            continue
+        db.query(MediaBlob).filter(MediaBlob.digest == digest).delete(synchronize_session=False)
+        db.commit()
+        try:
+            os.remove(blob_path(digest))
+        except FileNotFoundError:
+            pass
+        removed += 1
+    return removed
+
+
+def detach(path: str) -> None:
+    """
+    释放 path 的引用并删除文件
+
+    重新生成文件前调用: 硬链接共享同一份数据，原地覆盖写入会修改其他视频的同一文件。
+    """
+    if not path:
+        return
+    path = os.path.normpath(path)
+    db = SessionLocal()
+    try:
+        refs = db.query(MediaBlobRef).filter(MediaBlobRef.path == path).all()
+        if refs:
+            for ref in refs:
+                db.delete(ref)
+            db.commit()
+            _collect(db, [ref.digest for ref in refs])
+            if os.path.exists(path):
+                os.remove(path)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def release_video(hash_name: str) -> int:
+    """释放视频的所有引用，删除不再被其他视频引用的 blob，返回删除的 blob 数"""
+    db = SessionLocal()
+    try:
+        refs = db.query(MediaBlobRef).filter(MediaBlobRef.hash_name == hash_name).all()
+        digests = [ref.digest for ref in refs]
+        for ref in refs:
+            db.delete(ref)
+        db.commit()
+        removed = _collect(db, digests)
+        if refs:
+            logger.info(f"释放视频引用: {hash_name}, {len(refs)} 个文件, 删除 {removed} 个 blob")
+        return removed
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def stats() -> dict:
+    """存储统计: blob 数及实际占用字节数，引用数及去重前的字节数"""
+    db = SessionLocal()
+    try:
+        blobs, stored = db.query(func.count(MediaBlob.digest), func.coalesce(func.sum(MediaBlob.size), 0)).one()
+        refs, logical = (
+            db.query(func.count(MediaBlobRef.id), func.coalesce(func.sum(MediaBlob.size), 0))
+            .join(MediaBlob, MediaBlob.digest == MediaBlobRef.digest)
+            .one()
+        )
+        return {
+            "blobs": blobs,
+            "stored_bytes": int(stored),
+            "references": refs,
+            "referenced_bytes": int(logical),
+            "saved_bytes": int(logical) - int(stored),
+        }
+    finally:
+        db.close()
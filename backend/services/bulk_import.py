@@ -0,0 +1,252 @@
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+from config import settings
+from models.database import SessionLocal, ImportRun, Job, Video
+from services.job_queue import JobQueue, JobContext, JOB_QUEUED, PRIORITY_BULK
+from services.url_resolver import resolve
+from utils.cancellation import JobCancelled, check_cancelled, sleep_cancellable
+from utils.logger import get_logger
+
+logger = get_logger("bulk_import")
+
+# 导入状态
+IMPORT_RUNNING = "running"
+IMPORT_COMPLETED = "completed"
+IMPORT_FAILED = "failed"
+IMPORT_CANCELLED = "cancelled"
+
+# 导入计数字段
+COUNT_FIELDS = ["lines", "invalid", "duplicates", "existing", "reused", "enqueued"]
+
+
+def iter_urls(path: str, offset: int = 0) -> Iterator[Tuple[str, int]]:
+    """
+    从字节偏移 offset 开始逐行读取 URL 列表，不把整个文件读入内存
+
+    跳过空行和 # 开头的注释，返回 (URL, 该行之后的字节偏移)。
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            offset += len(raw)
+            line = raw.decode("utf-8", errors="replace").strip().lstrip("\ufeff")
+            if line and not line.startswith("#"):
+                yield line, offset
+
+
+def _is_valid_url(url: str) -> bool:
+    parsed = urlparse(url)
+    return parsed.scheme in ("http", "https") and bool(parsed.netloc)
+
+
+def create_run(source: str, payload: Optional[Dict[str, Any]] = None,
+               submitter: Optional[str] = None, batch_id: Optional[str] = None) -> ImportRun:
+    """登记一次导入，返回导入记录"""
+    db = SessionLocal()
+    try:
+        run = ImportRun(
+            batch_id=batch_id or uuid.uuid4().hex,
+            source=source,
+            status=IMPORT_RUNNING,
+            payload=json.dumps(payload or {}, ensure_ascii=False),
+            submitter=submitter,
+            offset=0,
+            **{field: 0 for field in COUNT_FIELDS}
+        )
+        db.add(run)
+        db.commit()
+        db.refresh(run)
+        db.expunge(run)
+        return run
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def get_run(batch_id: str) -> Optional[ImportRun]:
+    db = SessionLocal()
+    try:
+        run = db.query(ImportRun).filter(ImportRun.batch_id == batch_id).first()
+        if run:
+            db.expunge(run)
+        return run
+    finally:
+        db.close()
+
+
+def attach_job(batch_id: str, job_id: int) -> None:
+    """记录执行导入的任务"""
+    _update_run(batch_id, job_id=job_id)
+
+
+def _update_run(batch_id: str, **fields) -> None:
+    db = SessionLocal()
+    try:
+        fields["updated_at"] = datetime.utcnow()
+        db.query(ImportRun).filter(ImportRun.batch_id == batch_id).update(
+            {getattr(ImportRun, k): v for k, v in fields.items()},
+            synchronize_session=False
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def summary(batch_id: str, queue: Optional[JobQueue] = None) -> Optional[Dict[str, Any]]:
+    """导入的汇总报告: 读取进度、各类 URL 的数量和批次中各状态的任务数"""
+    run = get_run(batch_id)
+    if run is None:
+        return None
+    size = os.path.getsize(run.source) if os.path.exists(run.source) else None
+    return {
+        "batch_id": run.batch_id,
+        "source": run.source,
+        "job_id": run.job_id,
+        "status": run.status,
+        "progress": round(min(1.0, run.offset / size), 4) if size else (1.0 if run.status == IMPORT_COMPLETED else 0.0),
+        **{field: getattr(run, field) or 0 for field in COUNT_FIELDS},
+        "jobs": (queue or JobQueue()).batch_counts(batch_id),
+        "error": run.error,
+        "created_at": run.created_at,
+        "finished_at": run.finished_at,
+    }
+
+
+class BulkImporter:
+    """
+    流式导入 URL 列表
+
+    按 IMPORT_CHUNK_SIZE 分块读取文件，每块先规范化 URL 并去重，再一次性入队：
+    - 文件中重复的视频只入队一次
+    - 已有记录的视频跳过，已有进行中任务的视频复用该任务
+    - 批次中排队的任务达到 IMPORT_MAX_QUEUED 时暂停读取，等待 worker 消化
+
+    每块入队后把文件偏移和计数写入 import_run 作为检查点；中断后再次执行时从检查点继续。
+    """
+
+    def __init__(self, batch_id: str, queue: Optional[JobQueue] = None):
+        self.batch_id = batch_id
+        self.queue = queue or JobQueue()
+        self.run_record = get_run(batch_id)
+        if self.run_record is None:
+            raise ValueError(f"导入不存在: {batch_id}")
+        self.payload = json.loads(self.run_record.payload or "{}")
+        self.counts = {field: getattr(self.run_record, field) or 0 for field in COUNT_FIELDS}
+        self.seen, self.uncounted = self._load_seen()
+
+    def _load_seen(self) -> Tuple[set, set]:
+        """
+        从批次已有的任务恢复去重集合
+
+        检查点之后创建的任务属于中断前未记录检查点的块，重新读到时计入新入队的任务，其余计为重复。
+        """
+        db = SessionLocal()
+        try:
+            rows = db.query(Job.hash_name, Job.created_at).filter(Job.batch_id == self.batch_id).all()
+        finally:
+            db.close()
+        checkpoint = self.run_record.checkpoint_at or self.run_record.created_at
+        seen, uncounted = set(), set()
+        for hash_name, created_at in rows:
+            if checkpoint is not None and created_at is not None and created_at > checkpoint:
+                uncounted.add(hash_name)
+            else:
+                seen.add(hash_name)
+        return seen, uncounted
+
+    def run(self, context: Optional[JobContext] = None) -> Dict[str, Any]:
+        """执行导入直到文件末尾，返回汇总报告"""
+        source = self.run_record.source
+        if self.run_record.status != IMPORT_RUNNING:
+            _update_run(self.batch_id, status=IMPORT_RUNNING, error=None, finished_at=None)
+        logger.info(f"开始导入: {self.batch_id} {source} (从偏移 {self.run_record.offset} 继续)")
+        try:
+            size = os.path.getsize(source)
+            chunk, offset = [], self.run_record.offset or 0
+            for url, offset in iter_urls(source, offset):
+                chunk.append(url)
+                if len(chunk) >= settings.IMPORT_CHUNK_SIZE:
+                    self._import_chunk(chunk, offset, size, context)
+                    chunk = []
+            self._import_chunk(chunk, size, size, context)
+            _update_run(self.batch_id, status=IMPORT_COMPLETED, finished_at=datetime.utcnow())
+        except JobCancelled:
+            _update_run(self.batch_id, status=IMPORT_CANCELLED, finished_at=datetime.utcnow())
+            raise
+        except Exception as e:
+            _update_run(self.batch_id, status=IMPORT_FAILED, error=str(e), finished_at=datetime.utcnow())
+            raise
+        report = summary(self.batch_id, self.queue)
+        logger.info(f"导入完成: {self.batch_id}, 新入队 {report['enqueued']}, 重复 {report['duplicates']}, "
+                    f"已有记录 {report['existing']}, 复用任务 {report['reused']}, 无效 {report['invalid']}")
+        return report
+
+    def _wait_for_capacity(self) -> None:
+        """批次中排队的任务过多时等待，避免一次性向队列写入数万个任务"""
+        waited = False
+        while self.queue.batch_counts(self.batch_id).get(JOB_QUEUED, 0) >= settings.IMPORT_MAX_QUEUED:
+            if not waited:
+                logger.info(f"批次 {self.batch_id} 排队任务已达 {settings.IMPORT_MAX_QUEUED}，等待处理")
+                waited = True
+            sleep_cancellable(settings.IMPORT_POLL_INTERVAL)
+
+    def _import_chunk(self, urls, offset: int, size: int, context: Optional[JobContext]) -> None:
+        """规范化、去重并入队一块 URL，然后记录检查点"""
+        check_cancelled()
+        if urls:
+            self._wait_for_capacity()
+        counts = dict.fromkeys(COUNT_FIELDS, 0)
+        counts["lines"] = len(urls)
+
+        unique: Dict[str, str] = {}
+        for url in urls:
+            if not _is_valid_url(url):
+                counts["invalid"] += 1
+                continue
+            resolved = resolve(url, probe=False)
+            if resolved.hash_name in self.uncounted:
+                self.uncounted.discard(resolved.hash_name)
+                self.seen.add(resolved.hash_name)
+                counts["enqueued"] += 1
+            elif resolved.hash_name in self.seen or resolved.hash_name in unique:
+                counts["duplicates"] += 1
+            else:
+                unique[resolved.hash_name] = resolved.url
+
+        if unique:
+            db = SessionLocal()
+            try:
+                existing = {row[0] for row in db.query(Video.hash_name).filter(Video.hash_name.in_(list(unique)))}
+            finally:
+                db.close()
+            counts["existing"] = len(existing)
+            pending = {url: hash_name for hash_name, url in unique.items() if hash_name not in existing}
+            if pending:
+                jobs = self.queue.submit_many(
+                    "process",
+                    list(pending),
+                    payload=self.payload,
+                    batch_id=self.batch_id,
+                    priority=PRIORITY_BULK,
+                    submitter=self.run_record.submitter,
+                    hash_names=pending
+                )
+                created = sum(1 for job in jobs if job.batch_id == self.batch_id)
+                counts["enqueued"] += created
+                counts["reused"] += len(jobs) - created
+            self.seen.update(unique)
+
+        for field in COUNT_FIELDS:
+            self.counts[field] += counts[field]
+        _update_run(self.batch_id, offset=offset, checkpoint_at=datetime.utcnow(), **self.counts)
+        if context is not None:
+            context.report("import", offset / size if size else 1.0)
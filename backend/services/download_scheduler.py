@@ -0,0 +1,176 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+from config import settings
+from services.resource_limits import PrioritySemaphore
+from utils.logger import get_logger
+
+logger = get_logger("download_scheduler")
+
+# 同一站点的不同域名，共享并发限制
+SITE_ALIASES = {
+    "youtu.be": "youtube.com",
+    "youtube-nocookie.com": "youtube.com",
+    "twitter.com": "x.com",
+}
+
+
+def site_of(url: str) -> str:
+    """获取 URL 所属站点，用于按站点限制并发，如 https://www.youtube.com/watch?v=... -> youtube.com"""
+    host = (urlparse(url).hostname or "").lower()
+    labels = host.split(".")
+    site = ".".join(labels[-2:]) if len(labels) >= 2 else host
+    return SITE_ALIASES.get(site, site)
+
+
+_site_semaphores: Dict[str, PrioritySemaphore] = {}
+_lock = threading.Lock()
+
+
+def _site_semaphore(site: str) -> PrioritySemaphore:
+    with _lock:
+        if site not in _site_semaphores:
+            limit = settings.DOWNLOAD_SITE_LIMITS.get(site, settings.DOWNLOAD_SITE_DEFAULT_LIMIT)
+            _site_semaphores[site] = PrioritySemaphore(max(1, limit))
+        return _site_semaphores[site]
+
+
+class BandwidthShare:
+    """
+    在并发下载之间平分总带宽 DOWNLOAD_TOTAL_RATE
+
+    每个下载登记其 yt-dlp 参数字典，下载开始或结束时重新计算每个下载的 ratelimit。
+    yt-dlp 每读一个数据块都会读取 ratelimit，新的份额对执行中的下载立即生效；
+    分片并发下载时每个分片单独限速，因此份额再按分片并发数平分。
+    """
+
+    def __init__(self):
+        self._params: List[dict] = []
+        self._lock = threading.Lock()
+
+    def join(self, params: dict) -> None:
+        with self._lock:
+            self._params.append(params)
+            self._rebalance()
+
+    def leave(self, params: dict) -> None:
+        with self._lock:
+            if params in self._params:
+                self._params.remove(params)
+            self._rebalance()
+
+    def _rebalance(self) -> None:
+        total = settings.DOWNLOAD_TOTAL_RATE
+        if not total or not self._params:
+            return
+        share = total / len(self._params)
+        for params in self._params:
+            fragments = max(1, params.get("concurrent_fragment_downloads") or 1)
+            params["ratelimit"] = max(1, int(share / fragments))
+
+
+bandwidth = BandwidthShare()
+
+
+class DownloadMetrics:
+    """
+    本进程的下载统计，通过 /health 返回
+
+    记录执行中下载的已下载字节数和当前速度 (按站点汇总)，以及累计完成、失败的下载数和字节数。
+    """
+
+    def __init__(self):
+        self._active: Dict[int, dict] = {}
+        self._next_id = 0
+        self._completed = 0
+        self._failed = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def start(self, url: str) -> int:
+        """登记一个开始的下载，返回下载编号"""
+        with self._lock:
+            self._next_id += 1
+            self._active[self._next_id] = {"site": site_of(url), "bytes": 0, "speed": 0.0, "started_at": time.time()}
+            return self._next_id
+
+    def update(self, download_id: int, downloaded: int, speed: Optional[float] = None) -> None:
+        """更新下载的累计字节数和当前速度 (字节/秒)"""
+        with self._lock:
+            item = self._active.get(download_id)
+            if item is not None:
+                item["bytes"] = downloaded
+                item["speed"] = speed or 0.0
+
+    def finish(self, download_id: int, success: bool) -> None:
+        with self._lock:
+            item = self._active.pop(download_id, None)
+            if item is None:
+                return
+            self._bytes += item["bytes"]
+            if success:
+                self._completed += 1
+            else:
+                self._failed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            sites: Dict[str, dict] = {}
+            for item in self._active.values():
+                site = sites.setdefault(item["site"], {"active": 0, "bytes_per_second": 0.0})
+                site["active"] += 1
+                site["bytes_per_second"] += item["speed"]
+            return {
+                "active": len(self._active),
+                "bytes_per_second": round(sum(item["speed"] for item in self._active.values()), 1),
+                "sites": {name: {**site, "bytes_per_second": round(site["bytes_per_second"], 1)}
+                          for name, site in sites.items()},
+                "completed": self._completed,
+                "failed": self._failed,
+                "bytes_total": self._bytes + sum(item["bytes"] for item in self._active.values()),
+            }
+
+
+download_metrics = DownloadMetrics()
+
+
+def download_options(options: dict) -> dict:
+    """
+    补充下载调度相关的 yt-dlp 参数
+
+    - DASH/HLS 分片并发下载
+    - 断点续传: 保留 .part 文件和分片进度，重试或阶段重新执行时从中断处继续
+    - 下载和分片的重试次数
+    """
+    return {
+        **options,
+        "concurrent_fragment_downloads": settings.DOWNLOAD_FRAGMENT_CONCURRENCY,
+        "continuedl": True,
+        "nopart": False,
+        "retries": settings.DOWNLOAD_RETRIES,
+        "fragment_retries": settings.DOWNLOAD_RETRIES,
+        "skip_unavailable_fragments": False,
+    }
+
+
+@contextmanager
+def download_slot(url: str, priority: int = 0):
+    """
+    占用 URL 所属站点的下载槽位，返回等待时长 (秒)
+
+    每个站点的并发下载数受 DOWNLOAD_SITE_LIMITS 限制，避免批量导入触发站点限流；
+    槽位紧张时高优先级的任务先获得。
+    """
+    site = site_of(url)
+    semaphore = _site_semaphore(site)
+    started = time.time()
+    semaphore.acquire(priority)
+    waited = time.time() - started
+    if waited > 1:
+        logger.info(f"等待 {site} 下载槽位 {waited:.1f}s")
+    try:
+        yield waited
+    finally:
+        semaphore.release()
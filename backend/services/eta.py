@@ -0,0 +1,137 @@
+import json
+import threading
+import time
+from typing import Dict, Optional, Any
+from models.database import SessionLocal, StageStat, Job
+from config import settings
+from utils.logger import get_logger
+
+logger = get_logger("eta")
+
+# 阶段历史吞吐量的缓存时间 (秒)，避免每次推送进度都查询数据库
+_HISTORY_CACHE_SECONDS = 60
+# 阶段运行超过该时长 (秒) 后使用实测速率代替历史速率
+_MIN_OBSERVED_SECONDS = 5.0
+
+_history_cache: Dict[str, tuple] = {}
+_cache_lock = threading.Lock()
+
+
+def record_stage_stat(stage: str, seconds: float,
+                      work: Optional[float] = None, unit: Optional[str] = None) -> None:
+    """记录一次阶段执行的耗时和工作量"""
+    db = SessionLocal()
+    try:
+        db.add(StageStat(stage=stage, seconds=seconds, work=work, unit=unit))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"记录阶段吞吐量失败: {stage}, {str(e)}")
+    finally:
+        db.close()
+    with _cache_lock:
+        _history_cache.pop(stage, None)
+
+
+def stage_history(stage: str) -> Dict[str, Any]:
+    """
+    获取阶段最近 ETA_HISTORY_SIZE 次执行的统计
+
+    Returns:
+        {"seconds": 平均耗时, "rate": 平均吞吐量 (单位/秒), "unit": 吞吐量单位}，无记录时为 None
+    """
+    now = time.time()
+    with _cache_lock:
+        cached = _history_cache.get(stage)
+        if cached and now - cached[0] < _HISTORY_CACHE_SECONDS:
+            return cached[1]
+
+    db = SessionLocal()
+    try:
+        rows = db.query(StageStat).filter(
+            StageStat.stage == stage
+        ).order_by(StageStat.id.desc()).limit(settings.ETA_HISTORY_SIZE).all()
+    finally:
+        db.close()
+
+    history = {"seconds": None, "rate": None, "unit": None}
+    if rows:
+        history["seconds"] = sum(row.seconds for row in rows) / len(rows)
+        unit = rows[0].unit
+        measured = [row for row in rows if row.unit == unit and row.work and row.seconds > 0]
+        if unit and measured:
+            history["unit"] = unit
+            history["rate"] = sum(row.work for row in measured) / sum(row.seconds for row in measured)
+
+    with _cache_lock:
+        _history_cache[stage] = (now, history)
+    return history
+
+
+def _running_remaining(stage: str, progress: Dict[str, Any], now: float) -> Optional[float]:
+    """估算执行中阶段的剩余时间"""
+    elapsed = max(0.0, now - progress.get("started_at", now))
+    done, total, unit = progress.get("done"), progress.get("total"), progress.get("unit")
+    history = stage_history(stage)
+
+    if total and done is not None:
+        # 优先使用阶段上报的当前速率 (如下载速度)，其次是阶段开始以来的平均速率
+        rate = progress.get("rate")
+        if not rate and done > 0 and elapsed >= _MIN_OBSERVED_SECONDS:
+            rate = done / elapsed
+        elif not rate and history["rate"] and history["unit"] == unit:
+            rate = history["rate"]
+        if rate:
+            return max(0.0, total - done) / rate
+
+    if history["seconds"] is not None:
+        return max(0.0, history["seconds"] - elapsed)
+    return None
+
+
+def estimate_remaining(detail: Dict[str, Any], now: Optional[float] = None) -> Optional[float]:
+    """
+    根据阶段计划和各阶段进度估算任务剩余时间 (秒)
+
+    已完成阶段计 0，执行中阶段按工作量和吞吐量估算，未开始阶段取历史平均耗时，
+    取阶段依赖图上的最长路径。任一未完成阶段没有可用数据时返回 None。
+    """
+    plan: Dict[str, list] = detail.get("plan") or {}
+    if not plan:
+        return None
+    now = now or time.time()
+    done = set(detail.get("done") or [])
+    running = detail.get("stages") or {}
+
+    remaining: Dict[str, float] = {}
+    for name in plan:
+        if name in done:
+            value = 0.0
+        elif name in running:
+            value = _running_remaining(name, running[name], now)
+        else:
+            value = stage_history(name)["seconds"]
+        if value is None:
+            return None
+        remaining[name] = value
+
+    finish: Dict[str, float] = {}
+
+    def resolve(name: str) -> float:
+        if name not in finish:
+            finish[name] = remaining[name] + max((resolve(dep) for dep in plan[name] if dep in plan), default=0.0)
+        return finish[name]
+
+    return max(resolve(name) for name in plan)
+
+
+def job_eta(job: Job) -> Optional[float]:
+    """执行中任务的剩余时间估算，其他状态返回 None"""
+    if job.status != "running" or not job.detail:
+        return None
+    try:
+        eta = estimate_remaining(json.loads(job.detail))
+    except Exception as e:
+        logger.warning(f"估算剩余时间失败: {job.id}, {str(e)}")
+        return None
+    return round(eta, 1) if eta is not None else None
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from config import settings
+from services.media_prep import probe_media
+from services.render_cache import content_digest
+from services.render_engine import SUBTITLE_TRACKS
+from utils.process_utils import run_command, run_ffmpeg
+from utils.logger import get_logger
+
+logger = get_logger("hls_packager")
+
+# HLS (fMP4) 可以直接复制的音频编码，其他编码转为 AAC
+HLS_AUDIO_CODECS = {"aac", "mp3", "ac3", "eac3"}
+
+PLAYLIST_MEDIA_TYPE = "application/vnd.apple.mpegurl"
+MEDIA_TYPES = {
+    ".m3u8": PLAYLIST_MEDIA_TYPE,
+    ".m4s": "video/iso.segment",
+    ".mp4": "video/mp4",
+    ".vtt": "text/vtt",
+}
+
+# 字幕轨道的 ISO 639-2 语言代码对应的 BCP 47 标签 (EXT-X-MEDIA 的 LANGUAGE 属性)
+LANGUAGE_TAGS = {"eng": "en", "chi": "zh"}
+
+# 打包目录名 (由原视频内容和打包参数计算的 12 位版本) 和其中的文件名
+VERSION_PATTERN = re.compile(r"^[0-9a-f]{12}$")
+FILE_PATTERN = re.compile(r"^[\w-]+\.(m3u8|m4s|mp4)$")
+
+# 打包过程中的临时目录前缀，以及旧版本目录中记录被替换时间的标记文件
+WORK_PREFIX = ".package_"
+SUPERSEDED_MARKER = ".superseded"
+# 超过此时间 (秒) 的临时目录视为中断的打包留下的
+STALE_WORK_SECONDS = 24 * 3600
+
+
+def _vtt_time(seconds: float) -> str:
+    ms = int(round(max(0.0, seconds) * 1000))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}"
+
+
+def package_hls(source: str, output_dir: str, info: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    把视频打包为 HLS (fMP4 分片 + VOD 播放列表)，视频直接复制，不重新编码
+
+    分片在关键帧处切分，时长约 HLS_SEGMENT_SECONDS；音频编码不被 HLS 支持时转为 AAC。
+    输出到 output_dir/hls/<版本>/，版本由原视频内容和打包参数计算，目录中的文件内容不会改变，
+    可以长期缓存。相同版本已打包 (如并发执行的另一次打包) 时直接使用已有目录。
+
+    旧版本的目录不立即删除，正在播放旧播放列表的客户端仍可继续读取分片：第一次被替换时写入标记，
+    标记超过 HLS_RETAIN_SECONDS 后的打包中删除。其他打包进行中的临时目录不受影响。
+
+    - index.m3u8: 媒体播放列表
+    - init.mp4, seg_00000.m4s ...: 初始化分片和媒体分片
+    - stream.json: 码率、分辨率和第一个分片的开始时间，用于生成主播放列表和字幕的时间映射
+
+    Returns:
+        index.m3u8 的路径；没有视频流时返回 None
+    """
+    info = info or probe_media(source)
+    if info["video"] is None:
+        return None
+    duration = info["duration"] or 0.0
+    audio = info["audio"] or {}
+    transcode_audio = bool(audio) and audio.get("codec") not in HLS_AUDIO_CODECS
+    version = hashlib.sha256(
+        f"{content_digest(source)}:{settings.HLS_SEGMENT_SECONDS:g}:{transcode_audio}".encode()
+    ).hexdigest()[:12]
+    hls_dir = os.path.join(output_dir, "hls")
+    package_dir = os.path.join(hls_dir, version)
+    playlist = os.path.join(package_dir, "index.m3u8")
+    if os.path.exists(os.path.join(package_dir, "stream.json")):
+        logger.info(f"HLS 已打包: {playlist}")
+        _remove_old_versions(hls_dir, version)
+        return playlist
+
+    work_dir = os.path.join(hls_dir, f"{WORK_PREFIX}{uuid.uuid4().hex[:8]}")
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        cmd = ["ffmpeg", "-y", "-i", source, "-map", "0:v:0", "-map", "0:a:0?", "-c:v", "copy"]
+        cmd += ["-c:a", "aac", "-b:a", "192k"] if transcode_audio else ["-c:a", "copy"]
+        cmd += [
+            "-f", "hls", "-hls_time", f"{settings.HLS_SEGMENT_SECONDS:g}", "-hls_playlist_type", "vod",
+            "-hls_segment_type", "fmp4", "-hls_fmp4_init_filename", "init.mp4",
+            "-hls_segment_filename", os.path.join(work_dir, "seg_%05d.m4s"),
+            os.path.join(work_dir, "index.m3u8"),
+        ]
+        run_ffmpeg(cmd, duration)
+
+        stream = _stream_info(work_dir, info)
+        with open(os.path.join(work_dir, "stream.json"), "w", encoding="utf-8") as f:
+            json.dump(stream, f)
+        try:
+            os.rename(work_dir, package_dir)
+            logger.info(f"HLS 打包完成: {source}, 峰值码率 {stream['bandwidth']} bps")
+        except OSError:
+            if not os.path.exists(os.path.join(package_dir, "stream.json")):
+                raise
+            # 并发的另一次打包已生成相同版本，使用已有目录
+            logger.info(f"HLS 已由其他任务打包: {playlist}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    _remove_old_versions(hls_dir, version)
+    return playlist
+
+
+def _remove_old_versions(hls_dir: str, current: str) -> None:
+    """
+    清理旧版本和中断的打包留下的临时目录
+
+    旧版本第一次被发现时写入标记，标记超过 HLS_RETAIN_SECONDS 后删除；
+    临时目录只在超过 STALE_WORK_SECONDS 后删除，避免删除并发打包正在写入的目录。
+    """
+    now = time.time()
+    for name in os.listdir(hls_dir):
+        path = os.path.join(hls_dir, name)
+        if name == current or not os.path.isdir(path):
+            continue
+        if name.startswith(WORK_PREFIX):
+            if now - os.path.getmtime(path) > STALE_WORK_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+            continue
+        marker = os.path.join(path, SUPERSEDED_MARKER)
+        if not os.path.exists(marker):
+            open(marker, "w").close()
+        elif now - os.path.getmtime(marker) >= settings.HLS_RETAIN_SECONDS:
+            shutil.rmtree(path, ignore_errors=True)
+            logger.info(f"删除旧版本的 HLS 分片: {path}")
+
+
+def _start_time(playlist: str) -> float:
+    """HLS 输出第一个分片的开始时间 (秒)，用于 WebVTT 的 X-TIMESTAMP-MAP"""
+    result = run_command(["ffprobe", "-v", "error", "-show_entries", "format=start_time", "-of", "json", playlist])
+    value = (json.loads(result.stdout or b"{}").get("format") or {}).get("start_time")
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _stream_info(package_dir: str, info: Dict[str, Any]) -> Dict[str, Any]:
+    """按各分片的大小和时长计算峰值码率与平均码率 (EXT-X-STREAM-INF 的 BANDWIDTH / AVERAGE-BANDWIDTH)"""
+    peak, total_bytes, total_duration = 0, 0, 0.0
+    segment_duration = None
+    with open(os.path.join(package_dir, "index.m3u8"), encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#EXTINF:"):
+                segment_duration = float(line[len("#EXTINF:"):].split(",")[0])
+            elif line and not line.startswith("#") and segment_duration:
+                size = os.path.getsize(os.path.join(package_dir, line))
+                peak = max(peak, math.ceil(size * 8 / segment_duration))
+                total_bytes += size
+                total_duration += segment_duration
+                segment_duration = None
+    video = info.get("video") or {}
+    return {
+        "start_time": _start_time(os.path.join(package_dir, "index.m3u8")),
+        "bandwidth": peak,
+        "average_bandwidth": math.ceil(total_bytes * 8 / total_duration) if total_duration else peak,
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "duration": info.get("duration") or total_duration,
+    }
+
+
+def load_subtitle_segments(subtitle_json: Optional[str]) -> List[Dict[str, Any]]:
+    if not subtitle_json or not os.path.exists(subtitle_json):
+        return []
+    with open(subtitle_json, "r", encoding="utf-8") as f:
+        return json.load(f).get("segments", [])
+
+
+def subtitle_tracks(segments: List[Dict[str, Any]]) -> List[Tuple[str, str, str]]:
+    """字幕 JSON 中有文本的语言: [(字段, ISO 639-2 语言代码, 轨道标题)]"""
+    return [(field, language, title) for field, language, title in SUBTITLE_TRACKS
+            if any((segment.get(field) or "").strip() for segment in segments)]
+
+
+def stream_info(package_dir: str) -> Dict[str, Any]:
+    """读取打包时记录的 stream.json"""
+    with open(os.path.join(package_dir, "stream.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def master_playlist(package_dir: str, tracks: List[Tuple[str, str, str]]) -> str:
+    """
+    主播放列表: 一个视频码流 (打包目录下的 index.m3u8)，以及每种语言一个 WebVTT 字幕轨道 (subs_<语言>.m3u8)
+    """
+    stream = stream_info(package_dir)
+    lines = ["#EXTM3U", "#EXT-X-VERSION:7", "#EXT-X-INDEPENDENT-SEGMENTS"]
+    for index, (_, language, title) in enumerate(tracks):
+        default = "YES" if index == 0 else "NO"
+        lines.append(
+            f'#EXT-X-MEDIA:TYPE=SUBTITLES,GROUP-ID="subs",NAME="{title}",'
+            f'LANGUAGE="{LANGUAGE_TAGS.get(language, language)}",DEFAULT={default},AUTOSELECT={default},'
+            f'URI="subs_{language}.m3u8"'
+        )
+    attributes = [f"BANDWIDTH={stream['bandwidth']}", f"AVERAGE-BANDWIDTH={stream['average_bandwidth']}"]
+    if stream.get("width") and stream.get("height"):
+        attributes.append(f"RESOLUTION={stream['width']}x{stream['height']}")
+    if tracks:
+        attributes.append('SUBTITLES="subs"')
+    lines += [f"#EXT-X-STREAM-INF:{','.join(attributes)}", f"{os.path.basename(package_dir)}/index.m3u8", ""]
+    return "\n".join(lines)
+
+
+def subtitle_playlist(language: str, duration: float) -> str:
+    """字幕轨道的媒体播放列表: 整个 WebVTT 文件作为一个分片"""
+    return "\n".join([
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{max(1, math.ceil(duration))}",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+        f"#EXTINF:{duration:.3f},",
+        f"subs_{language}.vtt",
+        "#EXT-X-ENDLIST",
+        "",
+    ])
+
+
+def webvtt(segments: List[Dict[str, Any]], field: str, start_time: float = 0.0) -> str:
+    """
+    把字幕 JSON 的一个语言转换为 WebVTT
+
+    字幕时间从原视频开始计算；X-TIMESTAMP-MAP 把 0 秒映射到第一个分片的开始时间 (90 kHz 时间戳)，
+    分片时间戳不从 0 开始时字幕也不会偏移。
+    """
+    cues = ["WEBVTT", f"X-TIMESTAMP-MAP=MPEGTS:{round(start_time * 90000)},LOCAL:00:00:00.000", ""]
+    for segment in segments:
+        text = (segment.get(field) or "").strip()
+        if text:
+            cues += [f"{_vtt_time(segment['start'])} --> {_vtt_time(segment['end'])}", text, ""]
+    return "\n".join(cues)
@@ -0,0 +1,92 @@
+import json
+from typing import Optional
+from models.database import Job
+from services.job_queue import JobContext, PRIORITY_BULK, JOB_KIND_IMPORT
+from services.video_processor import VideoProcessor, PROCESS_FULL, PROCESS_AUDIO_FIRST
+from services.url_resolver import resolve
+from services.bulk_import import BulkImporter
+from services.render_engine import RENDER_BURN
+from utils.logger import get_logger
+
+logger = get_logger("job_handlers")
+
+
+def handle_process(job: Job, context: JobContext) -> Optional[str]:
+    """处理 URL 视频任务，下载前先探测元数据确定规范 URL，重复的视频不会再次下载"""
+    payload = json.loads(job.payload) if job.payload else {}
+    context.report("probe", 0.0)
+    resolved = resolve(job.url)
+    if resolved.hash_name != job.hash_name:
+        # 探测后发现与其他链接是同一视频，由已有的任务处理
+        duplicate = context.queue.find_active(resolved.hash_name, kind=job.kind)
+        if duplicate is not None and duplicate.id != job.id:
+            logger.info(f"任务 {job.id} 与任务 {duplicate.id} 是同一视频，跳过处理")
+            return resolved.hash_name
+        context.queue.update(job.id, url=resolved.url, hash_name=resolved.hash_name)
+    processor = VideoProcessor()
+    video = processor.process_video(resolved.url, context=context, mode=payload.get("mode") or PROCESS_FULL,
+                                    title=resolved.title, hash_name=resolved.hash_name)
+    if video is None:
+        return None
+    _schedule_fetch_video(video, job, context)
+    return video.hash_name
+
+
+def handle_resume(job: Job, context: JobContext) -> Optional[str]:
+    """重试处理已有视频，从失败的阶段继续"""
+    processor = VideoProcessor()
+    video = processor.resume_video(job.hash_name, context=context)
+    if video is None:
+        return None
+    _schedule_fetch_video(video, job, context)
+    return video.hash_name
+
+
+def handle_fetch_video(job: Job, context: JobContext) -> Optional[str]:
+    """为只下载了音频的视频补充下载视频文件"""
+    processor = VideoProcessor()
+    video = processor.fetch_video(job.hash_name, context=context)
+    return video.hash_name if video else None
+
+
+def handle_render(job: Job, context: JobContext) -> Optional[str]:
+    """把字幕烧录到视频 (burn) 或封装为软字幕轨道 (mux)"""
+    payload = json.loads(job.payload) if job.payload else {}
+    processor = VideoProcessor()
+    output = processor.render_subtitle_to_video(job.hash_name, context=context,
+                                                mode=payload.get("mode") or RENDER_BURN,
+                                                container=payload.get("container") or "mp4")
+    return output.hash_name
+
+
+def handle_import(job: Job, context: JobContext) -> Optional[str]:
+    """流式导入 URL 列表，任务被回收或重试时从检查点继续"""
+    payload = json.loads(job.payload) if job.payload else {}
+    BulkImporter(payload["batch_id"], queue=context.queue).run(context)
+    return None
+
+
+def _schedule_fetch_video(video, job: Job, context: JobContext) -> None:
+    """字幕生成后，以最低优先级在后台补充下载视频；首次播放时会以更高优先级提交"""
+    if video.process_mode != PROCESS_AUDIO_FIRST or video.file_path:
+        return
+    if context.queue.find_active(video.hash_name, kind="fetch_video") is None:
+        context.queue.submit(
+            "fetch_video",
+            url=video.url,
+            hash_name=video.hash_name,
+            priority=PRIORITY_BULK,
+            submitter=job.submitter
+        )
+
+
+# 任务类型 -> 处理函数
+JOB_HANDLERS = {
+    "process": handle_process,
+    "resume": handle_resume,
+    # 上传的视频记录已创建，从下载之后的阶段开始处理
+    "upload": handle_resume,
+    "fetch_video": handle_fetch_video,
+    JOB_KIND_IMPORT: handle_import,
+    "render": handle_render,
+}
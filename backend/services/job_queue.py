@@ -0,0 +1,701 @@
+import json
+import socket
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Callable, List
+from sqlalchemy import func, or_
+from models.database import SessionLocal, Job
+from services.url_resolver import resolve
+from config import settings
+from utils.logger import get_logger
+from utils.cancellation import CancellationToken, set_current_token
+from services.eta import record_stage_stat
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLING = "cancelling"  # 执行中的任务已请求取消
+JOB_CANCELLED = "cancelled"
+
+# 任务优先级，数值越大越优先
+PRIORITY_UPLOAD = 30  # 交互式上传
+PRIORITY_SINGLE = 20  # 单个 URL
+PRIORITY_BULK = 10    # 批量提交 / 批量导入
+
+# 只负责向队列提交其他任务的任务类型: 不计入提交者和批量任务的准入限制，
+# 否则等待所提交任务被处理的导入任务会占满提交者的执行名额，导致这些任务永远无法被认领
+JOB_KIND_IMPORT = "import"
+DRIVER_JOB_KINDS = (JOB_KIND_IMPORT,)
+
+logger = get_logger("job_queue")
+
+
+class JobContext:
+    """传递给处理流程的任务上下文，用于上报阶段和进度"""
+
+    def __init__(self, queue: "JobQueue", job_id: int, priority: int = PRIORITY_SINGLE):
+        self.queue = queue
+        self.job_id = job_id
+        self.priority = priority
+        self.cancellation = CancellationToken()
+        # 阶段计划 (阶段 -> 依赖)、已完成阶段和执行中阶段的细粒度进度
+        self._detail: Dict[str, Any] = {"plan": {}, "done": [], "stages": {}}
+        self._detail_lock = threading.Lock()
+        self._flushed_at = 0.0
+
+    def cancel(self) -> None:
+        """取消任务: 终止子进程，流程在下一个检查点抛出 JobCancelled"""
+        self.cancellation.cancel()
+
+    def is_cancelled(self) -> bool:
+        return self.cancellation.is_cancelled()
+
+    def report(self, stage: str, progress: Optional[float] = None) -> None:
+        """上报当前阶段和进度 (0.0 - 1.0)"""
+        fields = {"stage": stage}
+        if progress is not None:
+            fields["progress"] = max(0.0, min(1.0, progress))
+        try:
+            self.queue.update(self.job_id, **fields)
+        except Exception as e:
+            # 进度上报失败不应中断处理流程
+            logger.warning(f"上报任务进度失败: {self.job_id}, {str(e)}")
+
+    def plan(self, stages: Dict[str, List[str]]) -> None:
+        """记录任务的阶段依赖图，用于估算剩余时间"""
+        with self._detail_lock:
+            self._detail = {"plan": stages, "done": [], "stages": {}}
+        self._flush_detail(force=True)
+
+    def stage_started(self, stage: str) -> None:
+        with self._detail_lock:
+            self._detail["stages"][stage] = {"started_at": time.time(), "done": None, "total": None, "unit": None}
+        self._flush_detail(force=True)
+
+    def report_detail(self, stage: str, done: float,
+                      total: Optional[float] = None, unit: Optional[str] = None,
+                      rate: Optional[float] = None) -> None:
+        """上报阶段细粒度进度 (如已下载字节数和下载速度、已转写秒数)，按 PROGRESS_FLUSH_INTERVAL 节流写入"""
+        with self._detail_lock:
+            progress = self._detail["stages"].get(stage)
+            if progress is None:
+                return
+            progress.update(done=done, total=total, unit=unit)
+            if rate is not None:
+                progress["rate"] = rate
+        self._flush_detail()
+
+    def stage_finished(self, stage: str, seconds: Optional[float] = None) -> None:
+        """
+        标记阶段完成
+
+        Args:
+            seconds: 阶段耗时；为 None 时 (阶段被跳过) 不计入历史吞吐量
+        """
+        with self._detail_lock:
+            progress = self._detail["stages"].pop(stage, None) or {}
+            if stage not in self._detail["done"]:
+                self._detail["done"].append(stage)
+        if seconds is not None:
+            work = progress.get("total") or progress.get("done")
+            record_stage_stat(stage, seconds, work, progress.get("unit"))
+        self._flush_detail(force=True)
+
+    def _flush_detail(self, force: bool = False) -> None:
+        with self._detail_lock:
+            now = time.time()
+            if not force and now - self._flushed_at < settings.PROGRESS_FLUSH_INTERVAL:
+                return
+            self._flushed_at = now
+            detail = json.dumps(self._detail, ensure_ascii=False)
+        try:
+            self.queue.update(self.job_id, detail=detail)
+        except Exception as e:
+            logger.warning(f"上报阶段进度失败: {self.job_id}, {str(e)}")
+
+    def record_pipeline(self, summary: Dict[str, Any]) -> None:
+        """记录流水线各阶段耗时和关键路径"""
+        try:
+            self.queue.update(self.job_id, critical_path=json.dumps(summary, ensure_ascii=False))
+        except Exception as e:
+            logger.warning(f"记录关键路径失败: {self.job_id}, {str(e)}")
+
+
+class JobQueue:
+    """基于数据库的任务队列"""
+
+    def submit(self, kind: str, url: Optional[str] = None,
+               payload: Optional[Dict[str, Any]] = None,
+               hash_name: Optional[str] = None,
+               priority: int = PRIORITY_SINGLE,
+               submitter: Optional[str] = None,
+               dedupe: bool = False) -> Job:
+        """
+        提交任务，立即返回任务记录
+
+        未指定 hash_name 时 URL 会被规范化 (使用已缓存的探测结果或按格式识别，不访问网络)；
+        dedupe 为 True 且同一视频已有排队或执行中的同类任务时，直接返回该任务。
+        """
+        if hash_name is None and url:
+            resolved = resolve(url, probe=False)
+            url, hash_name = resolved.url, resolved.hash_name
+            if dedupe:
+                existing = self.find_active(hash_name, kind=kind)
+                if existing is not None:
+                    logger.info(f"视频已有进行中的任务，跳过重复提交: {url} -> {existing.id}")
+                    return existing
+        db = SessionLocal()
+        try:
+            job = Job(
+                kind=kind,
+                url=url,
+                hash_name=hash_name,
+                payload=json.dumps(payload or {}, ensure_ascii=False),
+                status=JOB_QUEUED,
+                priority=priority,
+                submitter=submitter,
+                progress=0.0,
+                created_at=datetime.utcnow(),
+                updated_at=datetime.utcnow()
+            )
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            db.expunge(job)
+            logger.info(f"任务已入队: {job.id} ({kind}) {url or ''}")
+            return job
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def submit_many(self, kind: str, urls: List[str],
+                    payload: Optional[Dict[str, Any]] = None,
+                    batch_id: Optional[str] = None,
+                    priority: int = PRIORITY_BULK,
+                    submitter: Optional[str] = None,
+                    hash_names: Optional[Dict[str, str]] = None) -> List[Job]:
+        """
+        在一个事务中批量提交任务，所有任务共享同一个批次 ID
+
+        URL 先规范化再去重: 同一视频在批次中只入队一次；已有排队或执行中的同类任务时
+        不再入队，返回结果中使用已有的任务。
+        调用方已解析过 URL 时，通过 hash_names 传入 规范 URL -> hash_name，不再重复解析。
+        """
+        # 规范 URL -> hash_name，保持提交顺序
+        resolved: Dict[str, str] = {}
+        for url in urls:
+            if hash_names is not None and url in hash_names:
+                resolved.setdefault(url, hash_names[url])
+                continue
+            item = resolve(url, probe=False)
+            resolved.setdefault(item.url, item.hash_name)
+
+        db = SessionLocal()
+        try:
+            existing = {}
+            if resolved:
+                active = db.query(Job).filter(
+                    Job.kind == kind,
+                    Job.hash_name.in_(list(resolved.values())),
+                    Job.status.in_([JOB_QUEUED, JOB_RUNNING, JOB_CANCELLING])
+                ).order_by(Job.id).all()
+                existing = {job.hash_name: job for job in active}
+
+            now = datetime.utcnow()
+            new_jobs = [
+                Job(
+                    kind=kind,
+                    url=url,
+                    hash_name=hash_name,
+                    batch_id=batch_id,
+                    payload=json.dumps(payload or {}, ensure_ascii=False),
+                    status=JOB_QUEUED,
+                    priority=priority,
+                    submitter=submitter,
+                    progress=0.0,
+                    created_at=now,
+                    updated_at=now
+                )
+                for url, hash_name in resolved.items()
+                if hash_name not in existing
+            ]
+            db.add_all(new_jobs)
+            db.commit()
+            by_hash = {**existing, **{job.hash_name: job for job in new_jobs}}
+            for job in by_hash.values():
+                db.refresh(job)
+                db.expunge(job)
+            jobs = [by_hash[hash_name] for hash_name in resolved.values()]
+            logger.info(f"批次 {batch_id} 已入队 {len(new_jobs)} 个任务，"
+                        f"{len(urls) - len(new_jobs)} 个重复的 URL 已跳过")
+            return jobs
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def list_batch(self, batch_id: str) -> List[Job]:
+        """获取批次中的所有任务"""
+        db = SessionLocal()
+        try:
+            jobs = db.query(Job).filter(Job.batch_id == batch_id).order_by(Job.id).all()
+            for job in jobs:
+                db.expunge(job)
+            return jobs
+        finally:
+            db.close()
+
+    def batch_counts(self, batch_id: str) -> Dict[str, int]:
+        """统计批次中各状态的任务数"""
+        db = SessionLocal()
+        try:
+            return dict(
+                db.query(Job.status, func.count(Job.id))
+                .filter(Job.batch_id == batch_id)
+                .group_by(Job.status)
+                .all()
+            )
+        finally:
+            db.close()
+
+    def find_active(self, hash_name: str, kind: Optional[str] = None) -> Optional[Job]:
+        """查找该视频排队中或执行中的任务，指定 kind 时只查找该类型的任务"""
+        db = SessionLocal()
+        try:
+            query = db.query(Job).filter(
+                Job.hash_name == hash_name,
+                Job.status.in_([JOB_QUEUED, JOB_RUNNING, JOB_CANCELLING])
+            )
+            if kind is not None:
+                query = query.filter(Job.kind == kind)
+            job = query.order_by(Job.id.desc()).first()
+            if job:
+                db.expunge(job)
+            return job
+        finally:
+            db.close()
+
+    def get(self, job_id: int) -> Optional[Job]:
+        """获取任务记录"""
+        db = SessionLocal()
+        try:
+            job = db.query(Job).filter(Job.id == job_id).first()
+            if job:
+                db.expunge(job)
+            return job
+        finally:
+            db.close()
+
+    def claim(self, worker_id: str) -> Optional[Job]:
+        """
+        按优先级和提交者公平调度认领一个排队中的任务
+
+        - 每个提交者只取其最优先的排队任务作为候选，避免一个提交者的大批量任务挡住其他人
+        - 候选按 (优先级降序, 提交者当前执行中的任务数升序, 提交时间升序) 排序
+        - 准入限制: 批量任务同时执行数不超过 BULK_MAX_RUNNING，
+          单个提交者同时执行数不超过 MAX_RUNNING_PER_SUBMITTER；导入任务不计入这两项，
+          其同时执行数不超过 IMPORT_MAX_RUNNING
+        - 取消中的任务仍占用 worker 和资源，与执行中的任务一起计入准入限制
+
+        认领时使用 SELECT ... FOR UPDATE SKIP LOCKED 锁定候选行，
+        再用带状态条件的 UPDATE 确认，不支持行锁的数据库也不会重复认领。
+        """
+        db = SessionLocal()
+        try:
+            running = dict(
+                db.query(Job.submitter, func.count(Job.id))
+                .filter(Job.status.in_((JOB_RUNNING, JOB_CANCELLING)), Job.kind.notin_(DRIVER_JOB_KINDS))
+                .group_by(Job.submitter)
+                .all()
+            )
+            running_bulk = (
+                db.query(func.count(Job.id))
+                .filter(Job.status.in_((JOB_RUNNING, JOB_CANCELLING)), Job.kind.notin_(DRIVER_JOB_KINDS),
+                        Job.priority <= PRIORITY_BULK)
+                .scalar()
+            )
+            running_imports = (
+                db.query(func.count(Job.id))
+                .filter(Job.status.in_((JOB_RUNNING, JOB_CANCELLING)), Job.kind == JOB_KIND_IMPORT)
+                .scalar()
+            )
+
+            candidates = []
+            submitters = [row[0] for row in db.query(Job.submitter).filter(Job.status == JOB_QUEUED).distinct().all()]
+            for submitter in submitters:
+                if running.get(submitter, 0) >= settings.MAX_RUNNING_PER_SUBMITTER:
+                    continue
+                query = db.query(Job.id, Job.priority, Job.created_at).filter(
+                    Job.status == JOB_QUEUED,
+                    Job.submitter.is_(None) if submitter is None else Job.submitter == submitter
+                )
+                if running_bulk >= settings.BULK_MAX_RUNNING:
+                    query = query.filter(or_(Job.priority > PRIORITY_BULK, Job.kind.in_(DRIVER_JOB_KINDS)))
+                if running_imports >= settings.IMPORT_MAX_RUNNING:
+                    query = query.filter(Job.kind != JOB_KIND_IMPORT)
+                head = query.order_by(Job.priority.desc(), Job.created_at, Job.id).first()
+                if head:
+                    candidates.append((-(head.priority or 0), running.get(submitter, 0), head.created_at, head.id))
+            db.rollback()
+
+            for _, _, _, job_id in sorted(candidates):
+                job = self._claim_one(db, job_id, worker_id)
+                if job is not None:
+                    return job
+            return None
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _claim_one(self, db, job_id: int, worker_id: str) -> Optional[Job]:
+        """锁定并认领指定任务，已被其他 worker 锁定或认领时返回 None"""
+        locked = (
+            db.query(Job)
+            .filter(Job.id == job_id, Job.status == JOB_QUEUED)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if not locked:
+            db.rollback()
+            return None
+
+        now = datetime.utcnow()
+        claimed = (
+            db.query(Job)
+            .filter(Job.id == job_id, Job.status == JOB_QUEUED)
+            .update({
+                Job.status: JOB_RUNNING,
+                Job.worker_id: worker_id,
+                Job.attempts: Job.attempts + 1,
+                Job.started_at: now,
+                Job.heartbeat_at: now,
+                Job.updated_at: now,
+                Job.error: None
+            }, synchronize_session=False)
+        )
+        db.commit()
+        if not claimed:
+            return None
+
+        job = db.query(Job).filter(Job.id == job_id).first()
+        db.expunge(job)
+        return job
+
+    def update(self, job_id: int, **fields) -> None:
+        """更新任务字段"""
+        db = SessionLocal()
+        try:
+            fields["updated_at"] = datetime.utcnow()
+            db.query(Job).filter(Job.id == job_id).update(
+                {getattr(Job, k): v for k, v in fields.items()},
+                synchronize_session=False
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def complete(self, job_id: int, hash_name: Optional[str] = None) -> None:
+        """标记任务成功"""
+        fields = {
+            "status": JOB_SUCCEEDED,
+            "stage": "completed",
+            "progress": 1.0,
+            "finished_at": datetime.utcnow()
+        }
+        if hash_name:
+            fields["hash_name"] = hash_name
+        self.update(job_id, **fields)
+
+    def cancel(self, job_id: int) -> Optional[Job]:
+        """
+        请求取消任务
+
+        排队中的任务直接标记为已取消；执行中的任务标记为 cancelling，
+        由执行它的 worker 终止处理流程后标记为已取消。
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            db.query(Job).filter(Job.id == job_id, Job.status == JOB_QUEUED).update({
+                Job.status: JOB_CANCELLED,
+                Job.finished_at: now,
+                Job.updated_at: now
+            }, synchronize_session=False)
+            db.query(Job).filter(Job.id == job_id, Job.status == JOB_RUNNING).update({
+                Job.status: JOB_CANCELLING,
+                Job.updated_at: now
+            }, synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        # 任务在本进程中执行时立即取消，不必等待 worker 轮询
+        context = _active_contexts.get(job_id)
+        if context is not None:
+            context.cancel()
+        return self.get(job_id)
+
+    def is_cancel_requested(self, job_id: int) -> bool:
+        db = SessionLocal()
+        try:
+            status = db.query(Job.status).filter(Job.id == job_id).scalar()
+            return status in (JOB_CANCELLING, JOB_CANCELLED)
+        finally:
+            db.close()
+
+    def mark_cancelled(self, job_id: int) -> None:
+        """标记任务已取消"""
+        self.update(
+            job_id,
+            status=JOB_CANCELLED,
+            error="任务已取消",
+            finished_at=datetime.utcnow()
+        )
+
+    def fail(self, job_id: int, error: str) -> None:
+        """标记任务失败"""
+        self.update(
+            job_id,
+            status=JOB_FAILED,
+            error=error,
+            finished_at=datetime.utcnow()
+        )
+
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        """
+        更新执行中任务的心跳时间
+
+        Returns:
+            任务仍由该 worker 持有时返回 True；任务已被回收重新排队或已结束时返回 False
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            updated = db.query(Job).filter(
+                Job.id == job_id,
+                Job.worker_id == worker_id,
+                Job.status.in_([JOB_RUNNING, JOB_CANCELLING])
+            ).update({Job.heartbeat_at: now, Job.updated_at: now}, synchronize_session=False)
+            db.commit()
+            return bool(updated)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def requeue_stale(self, timeout: Optional[float] = None) -> int:
+        """
+        回收心跳超时的任务 (执行它的 worker 已退出或失联)
+
+        - 执行中的任务重新排队，由其他 worker 从已完成的阶段继续；
+          已达到 JOB_MAX_ATTEMPTS 次的任务标记为失败
+        - 已请求取消的任务直接标记为已取消
+
+        Returns:
+            回收的任务数
+        """
+        timeout = timeout if timeout is not None else settings.JOB_HEARTBEAT_TIMEOUT
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            deadline = now - timedelta(seconds=timeout)
+            stale = (
+                db.query(Job)
+                .filter(
+                    Job.status.in_([JOB_RUNNING, JOB_CANCELLING]),
+                    func.coalesce(Job.heartbeat_at, Job.started_at) < deadline
+                )
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            recovered = 0
+            for job in stale:
+                if job.status == JOB_CANCELLING:
+                    fields = {Job.status: JOB_CANCELLED, Job.error: "任务已取消", Job.finished_at: now}
+                elif (job.attempts or 0) >= settings.JOB_MAX_ATTEMPTS:
+                    fields = {Job.status: JOB_FAILED, Job.error: f"worker 失联: {job.worker_id}", Job.finished_at: now}
+                else:
+                    fields = {Job.status: JOB_QUEUED, Job.stage: None, Job.started_at: None}
+                fields.update({Job.worker_id: None, Job.updated_at: now})
+                # 带状态和 worker 条件更新，避免与心跳或其他回收者冲突
+                recovered += db.query(Job).filter(
+                    Job.id == job.id,
+                    Job.status == job.status,
+                    Job.worker_id == job.worker_id if job.worker_id is not None else Job.worker_id.is_(None)
+                ).update(fields, synchronize_session=False)
+                logger.warning(f"回收心跳超时的任务: {job.id} (worker {job.worker_id})")
+            db.commit()
+            return recovered
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+# 任务处理函数: 接收任务记录和上下文，返回处理结果对应的 hash_name
+JobHandler = Callable[[Job, JobContext], Optional[str]]
+
+# 本进程中正在执行的任务上下文，用于立即响应取消请求
+_active_contexts: Dict[int, JobContext] = {}
+
+
+class JobWorker(threading.Thread):
+    """从队列中认领并执行任务的工作线程"""
+
+    def __init__(self, queue: JobQueue, handlers: Dict[str, JobHandler],
+                 name: Optional[str] = None, poll_interval: Optional[float] = None):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.handlers = handlers
+        self.worker_id = name or f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self.poll_interval = poll_interval or settings.JOB_POLL_INTERVAL
+        self._stop_event = threading.Event()
+        # 已取消但尚未退出的处理线程，仍占用这个 worker 和它持有的资源许可
+        self._lingering: Optional[threading.Thread] = None
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        logger.info(f"任务工作线程启动: {self.worker_id}")
+        while not self._stop_event.is_set():
+            if self._lingering is not None:
+                self._lingering.join(self.poll_interval)
+                if self._lingering.is_alive():
+                    continue
+                logger.info(f"已取消任务的处理线程已退出: {self._lingering.name}")
+                self._lingering = None
+            try:
+                job = self.queue.claim(self.worker_id)
+            except Exception as e:
+                logger.error(f"认领任务失败: {str(e)}")
+                job = None
+
+            if job is None:
+                self._stop_event.wait(self.poll_interval)
+                continue
+
+            self.execute(job)
+        logger.info(f"任务工作线程退出: {self.worker_id}")
+
+    def execute(self, job: Job) -> None:
+        """
+        执行单个任务并记录结果
+
+        处理函数在独立线程中运行，当前线程轮询取消请求。任务被取消时立即终止子进程，
+        处理线程在下一个检查点退出；最多等待 JOB_CANCEL_JOIN_TIMEOUT，仍未退出时
+        worker 在它退出前不认领新任务，避免超出并发数和资源上限。
+        处理函数已经完成时以实际结果为准，不记为取消。
+        """
+        handler = self.handlers.get(job.kind)
+        if handler is None:
+            self.queue.fail(job.id, f"未知的任务类型: {job.kind}")
+            return
+
+        started = time.time()
+        logger.info(f"开始执行任务: {job.id} ({job.kind})")
+        context = JobContext(self.queue, job.id, job.priority or PRIORITY_SINGLE)
+        outcome: Dict[str, Any] = {}
+        done = threading.Event()
+
+        def target():
+            set_current_token(context.cancellation)
+            try:
+                outcome["hash_name"] = handler(job, context)
+            except Exception as e:
+                outcome["error"] = e
+            finally:
+                done.set()
+
+        _active_contexts[job.id] = context
+        lost = False
+        last_heartbeat = time.time()
+        thread = threading.Thread(target=target, name=f"job-{job.id}", daemon=True)
+        try:
+            thread.start()
+            while not done.wait(self.poll_interval):
+                try:
+                    if self.queue.is_cancel_requested(job.id):
+                        context.cancel()
+                    if time.time() - last_heartbeat >= settings.JOB_HEARTBEAT_INTERVAL:
+                        last_heartbeat = time.time()
+                        if not self.queue.heartbeat(job.id, self.worker_id):
+                            # 心跳中断期间任务已被回收，停止执行，交给新认领的 worker
+                            lost = True
+                            context.cancel()
+                except Exception as e:
+                    logger.warning(f"检查任务状态失败: {job.id}, {str(e)}")
+                if context.is_cancelled():
+                    break
+        finally:
+            _active_contexts.pop(job.id, None)
+
+        if not done.is_set():
+            thread.join(settings.JOB_CANCEL_JOIN_TIMEOUT)
+            if thread.is_alive():
+                logger.warning(f"任务处理线程未在 {settings.JOB_CANCEL_JOIN_TIMEOUT:g}s 内退出: {job.id}")
+                self._lingering = thread
+        finished = done.is_set() and "error" not in outcome
+
+        if lost:
+            logger.warning(f"任务已被回收，放弃执行: {job.id}")
+        elif finished:
+            self.queue.complete(job.id, outcome.get("hash_name"))
+            logger.info(f"任务完成: {job.id} - 耗时 {time.time() - started:.1f}s")
+        elif context.is_cancelled():
+            logger.info(f"任务已取消: {job.id} - 耗时 {time.time() - started:.1f}s")
+            self.queue.mark_cancelled(job.id)
+        elif "error" in outcome:
+            error = outcome["error"]
+            logger.error(f"任务失败: {job.id} - {str(error)}", exc_info=error)
+            self.queue.fail(job.id, str(error))
+
+
+class JobReaper(threading.Thread):
+    """定期回收心跳超时任务的线程，多个节点同时运行也不会重复回收"""
+
+    def __init__(self, queue: JobQueue, interval: Optional[float] = None):
+        super().__init__(daemon=True, name="job-reaper")
+        self.queue = queue
+        self.interval = interval or settings.JOB_HEARTBEAT_TIMEOUT / 2
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                recovered = self.queue.requeue_stale()
+                if recovered:
+                    logger.info(f"已回收 {recovered} 个心跳超时的任务")
+            except Exception as e:
+                logger.error(f"回收任务失败: {str(e)}")
+
+
+def start_workers(queue: JobQueue, handlers: Dict[str, JobHandler],
+                  count: Optional[int] = None) -> List[JobWorker]:
+    """启动指定数量的工作线程"""
+    workers = []
+    for _ in range(count if count is not None else settings.WORKER_CONCURRENCY):
+        worker = JobWorker(queue, handlers)
+        worker.start()
+        workers.append(worker)
+    return workers
@@ -0,0 +1,348 @@
+import json
+import math
+import os
+import shutil
+import wave
+from typing import Any, Dict, List, Optional, Tuple
+from PIL import Image, ImageOps
+from config import settings
+from utils.logger import get_logger
+from utils.process_utils import run_command, run_ffmpeg
+
+logger = get_logger("media_prep")
+
+# 语音识别使用的采样率 (16 kHz 单声道)
+ASR_SAMPLE_RATE = 16000
+# 缩略图格式，每个尺寸 (THUMBNAIL_WIDTHS) 各生成一份
+THUMBNAIL_FORMATS = ("jpg", "webp")
+# 音频的存储格式 (AUDIO_STORAGE_FORMAT): 文件名、ffmpeg 封装格式和编码参数
+AUDIO_FORMATS = {
+    "flac": ("audio.flac", "flac", ["-c:a", "flac", "-compression_level", "8"]),
+    "opus": ("audio.opus", "opus", ["-c:a", "libopus", "-b:a", "32k", "-application", "voip"]),
+    "wav": ("audio.wav", "wav", ["-c:a", "pcm_s16le"]),
+}
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _frame_rate(value: Optional[str]) -> Optional[float]:
+    """解析 ffprobe 的帧率，如 30000/1001"""
+    if not value:
+        return None
+    num, _, den = value.partition("/")
+    num, den = _float(num), _float(den or 1)
+    return round(num / den, 3) if num and den else None
+
+
+def probe_media(path: str) -> Dict[str, Any]:
+    """
+    读取媒体文件的容器和流信息 (只读取文件头，不解码)
+
+    Returns:
+        {"duration", "format", "bit_rate", "size",
+         "video": {"codec", "width", "height", "fps", "pix_fmt", "bit_rate"} 或 None,
+         "audio": {"codec", "sample_rate", "channels", "bit_rate"} 或 None}
+    """
+    result = run_command(["ffprobe", "-v", "error", "-show_format", "-show_streams", "-of", "json", path])
+    data = json.loads(result.stdout or b"{}")
+    fmt = data.get("format") or {}
+    streams = data.get("streams") or []
+    # 音频文件中的封面图也是视频流，不作为视频处理
+    video = next((s for s in streams if s.get("codec_type") == "video"
+                  and not (s.get("disposition") or {}).get("attached_pic")), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+
+    duration = _float(fmt.get("duration"))
+    if duration is None:
+        duration = _float((video or {}).get("duration")) or _float((audio or {}).get("duration"))
+    return {
+        "duration": duration,
+        "format": fmt.get("format_name"),
+        "bit_rate": _int(fmt.get("bit_rate")),
+        "size": _int(fmt.get("size")),
+        "video": {
+            "codec": video.get("codec_name"),
+            "width": _int(video.get("width")),
+            "height": _int(video.get("height")),
+            "fps": _frame_rate(video.get("avg_frame_rate") or video.get("r_frame_rate")),
+            "pix_fmt": video.get("pix_fmt"),
+            "bit_rate": _int(video.get("bit_rate")),
+        } if video else None,
+        "audio": {
+            "codec": audio.get("codec_name"),
+            "sample_rate": _int(audio.get("sample_rate")),
+            "channels": _int(audio.get("channels")),
+            "bit_rate": _int(audio.get("bit_rate")),
+        } if audio else None,
+    }
+
+
+def thumbnail_offset(duration: Optional[float]) -> float:
+    """缩略图的截取位置: THUMBNAIL_OFFSET 秒，短视频取时长的 10%"""
+    if not duration:
+        return 0.0
+    return min(settings.THUMBNAIL_OFFSET, duration * 0.1)
+
+
+def thumbnail_sizes() -> List[Tuple[int, int]]:
+    """缩略图尺寸列表 (宽, 高)，统一裁剪为 16:9，如 160x90 / 320x180 / 480x270"""
+    return [(width, width * 9 // 16 // 2 * 2) for width in sorted(settings.THUMBNAIL_WIDTHS)]
+
+
+def thumbnail_variant_path(output_dir: str, width: int, fmt: str) -> str:
+    return os.path.join(output_dir, "thumbnails", f"thumb_{width}.{fmt}")
+
+
+def thumbnail_variants(output_dir: str) -> List[Dict[str, Any]]:
+    """已生成的各尺寸缩略图，按宽度从小到大排列"""
+    variants = []
+    for width, height in thumbnail_sizes():
+        for fmt in THUMBNAIL_FORMATS:
+            path = thumbnail_variant_path(output_dir, width, fmt)
+            if os.path.exists(path):
+                variants.append({"width": width, "height": height, "format": fmt, "path": path})
+    return variants
+
+
+def _largest_jpg(variants: List[Dict[str, Any]]) -> Optional[str]:
+    jpgs = [variant for variant in variants if variant["format"] == "jpg"]
+    return jpgs[-1]["path"] if jpgs else None
+
+
+def thumbnails_from_image(image_path: str, output_dir: str) -> List[Dict[str, Any]]:
+    """用已有的图片 (如下载器提供的缩略图) 生成各尺寸的 JPEG 和 WebP，不需要解码视频"""
+    os.makedirs(os.path.join(output_dir, "thumbnails"), exist_ok=True)
+    try:
+        image = Image.open(image_path).convert("RGB")
+        for width, height in thumbnail_sizes():
+            variant = ImageOps.fit(image, (width, height), Image.LANCZOS)
+            variant.save(thumbnail_variant_path(output_dir, width, "jpg"), "JPEG", quality=85)
+            variant.save(thumbnail_variant_path(output_dir, width, "webp"), "WEBP", quality=80)
+    except Exception as e:
+        logger.error(f"生成缩略图尺寸失败: {image_path}, {str(e)}")
+    return thumbnail_variants(output_dir)
+
+
+def audio_file_name() -> str:
+    """音频文件名，由 AUDIO_STORAGE_FORMAT 决定 (audio.flac / audio.opus / audio.wav)"""
+    return AUDIO_FORMATS[settings.AUDIO_STORAGE_FORMAT][0]
+
+
+def audio_output_args() -> List[str]:
+    """写入存储格式的 ffmpeg 输出参数 (编码和封装格式)，不含输出路径"""
+    _, muxer, codec_args = AUDIO_FORMATS[settings.AUDIO_STORAGE_FORMAT]
+    return codec_args + ["-f", muxer]
+
+
+def compress_audio(source: str, output_file: str) -> str:
+    """
+    把 WAV 转换为存储格式，保留原采样率和声道 (Opus 由 ffmpeg 转换为支持的采样率)
+
+    先写到临时文件，完成后原子替换 output_file。
+    """
+    tmp = f"{output_file}.tmp"
+    try:
+        run_command(["ffmpeg", "-y", "-i", source, "-map", "0:a:0"] + audio_output_args() + [tmp])
+        os.replace(tmp, output_file)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return output_file
+
+
+def wav_stream_command(path: str) -> List[str]:
+    """把音频解码为 16 位 PCM WAV 并写到标准输出的 ffmpeg 命令 (下载时即时转码)"""
+    return ["ffmpeg", "-v", "error", "-i", path, "-map", "0:a:0", "-c:a", "pcm_s16le", "-f", "wav", "pipe:1"]
+
+
+def prepare_media(source: str, output_dir: str, audio: bool = True, thumbnail: bool = True,
+                  info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    一次 ffmpeg 调用同时生成语音识别用的音频和各尺寸的缩略图
+
+    同一文件作为两个输入打开：一个从头解码音频；另一个在输入端 -ss 定位，
+    直接跳到截取位置前的关键帧开始解码，不需要从头解码视频。输出:
+    - audio.flac (文件名和编码由 AUDIO_STORAGE_FORMAT 决定): 16 kHz 单声道，转写时由 load_pcm_audio 解码为 PCM
+    - thumbnails/thumb_<宽>.jpg|webp: THUMBNAIL_OFFSET 处的一帧，居中裁剪为 16:9 的各个尺寸
+      (没有视频流时跳过)。ffmpeg 输出 JPEG，WebP 由同一张图片转换
+
+    Args:
+        source: 视频或音频文件
+        output_dir: 输出目录
+        audio: 是否生成音频
+        thumbnail: 是否生成缩略图
+        info: 已读取的媒体信息，为 None 时先用 ffprobe 读取
+
+    Returns:
+        {"audio_path", "thumbnail_path" (最大尺寸的 JPEG), "thumbnails" (各尺寸缩略图), "info"}，
+        未生成的文件为 None 或空列表
+    """
+    info = info or probe_media(source)
+    audio_path = os.path.join(output_dir, audio_file_name())
+    inputs: List[str] = []
+    outputs: List[str] = []
+
+    if audio:
+        if not info["audio"]:
+            raise Exception(f"媒体文件没有音频流: {source}")
+        inputs += ["-i", source]
+        outputs += (["-map", "0:a:0", "-ar", str(ASR_SAMPLE_RATE), "-ac", "1"]
+                    + audio_output_args() + [audio_path])
+    thumbnail = thumbnail and info["video"] is not None
+    if thumbnail:
+        os.makedirs(os.path.join(output_dir, "thumbnails"), exist_ok=True)
+        sizes = thumbnail_sizes()
+        video_input = 1 if audio else 0
+        inputs += ["-ss", f"{thumbnail_offset(info['duration']):.3f}", "-i", source]
+        graph = [f"[{video_input}:v:0]split={len(sizes)}" + "".join(f"[v{i}]" for i in range(len(sizes)))]
+        for i, (width, height) in enumerate(sizes):
+            graph.append(f"[v{i}]scale={width}:{height}:force_original_aspect_ratio=increase,"
+                         f"crop={width}:{height}[t{i}]")
+            outputs += ["-map", f"[t{i}]", "-frames:v", "1", "-q:v", "2",
+                        thumbnail_variant_path(output_dir, width, "jpg")]
+        outputs = ["-filter_complex", ";".join(graph)] + outputs
+
+    if audio or thumbnail:
+        run_ffmpeg(["ffmpeg", "-y"] + inputs + outputs, info["duration"])
+
+    variants: List[Dict[str, Any]] = []
+    if thumbnail:
+        for width, _ in thumbnail_sizes():
+            jpg_path = thumbnail_variant_path(output_dir, width, "jpg")
+            if os.path.exists(jpg_path):
+                try:
+                    Image.open(jpg_path).save(thumbnail_variant_path(output_dir, width, "webp"), "WEBP", quality=80)
+                except Exception as e:
+                    logger.error(f"生成 WebP 缩略图失败: {jpg_path}, {str(e)}")
+        variants = thumbnail_variants(output_dir)
+    return {
+        "audio_path": audio_path if audio and os.path.exists(audio_path) else None,
+        "thumbnail_path": _largest_jpg(variants),
+        "thumbnails": variants,
+        "info": info,
+    }
+
+
+def sprite_interval(duration: Optional[float]) -> float:
+    """预览帧间隔: SPRITE_INTERVAL 秒，长视频放宽间隔使帧数不超过 SPRITE_MAX_FRAMES"""
+    if not duration:
+        return settings.SPRITE_INTERVAL
+    return max(settings.SPRITE_INTERVAL, duration / settings.SPRITE_MAX_FRAMES)
+
+
+def _vtt_time(seconds: float) -> str:
+    ms = int(round(seconds * 1000))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}"
+
+
+def generate_sprites(source: str, output_dir: str, info: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    生成拖动进度条时的预览图: 按固定间隔截取帧，拼接为雪碧图，并生成 WebVTT 和 JSON 索引
+
+    一次 ffmpeg 调用完成：-skip_frame nokey 只解码关键帧，fps 滤镜按间隔取帧
+    (取间隔开始前最近的关键帧)，tile 滤镜拼接为 SPRITE_COLUMNS x SPRITE_ROWS 的图片。
+    前端每张雪碧图只需一次请求，即可覆盖其中所有时间点的预览。
+
+    输出到 output_dir/sprites:
+    - sprite_001.jpg ...: 雪碧图，每帧 SPRITE_WIDTH 宽，16:9 居中补边
+    - sprites.vtt: 每个时间段对应 sprite_NNN.jpg#xywh=x,y,w,h，可直接用于播放器的缩略图轨道
+    - sprites.json: 间隔、帧尺寸、行列数、帧数和雪碧图文件名，供自定义进度条计算位置
+
+    Returns:
+        sprites.json 的路径；没有视频流时返回 None
+    """
+    info = info or probe_media(source)
+    if info["video"] is None:
+        return None
+    duration = info["duration"] or 0.0
+    interval = sprite_interval(duration)
+    width = settings.SPRITE_WIDTH
+    height = width * 9 // 16 // 2 * 2
+    columns, rows = settings.SPRITE_COLUMNS, settings.SPRITE_ROWS
+
+    sprites_dir = os.path.join(output_dir, "sprites")
+    # 帧间隔或视频变化时雪碧图数量会不同，先清除旧文件
+    shutil.rmtree(sprites_dir, ignore_errors=True)
+    os.makedirs(sprites_dir, exist_ok=True)
+    vf = (f"fps=1/{interval:.3f},"
+          f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+          f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,"
+          f"tile={columns}x{rows}")
+    run_ffmpeg(["ffmpeg", "-y", "-skip_frame", "nokey", "-i", source, "-an", "-sn", "-dn",
+                "-vf", vf, "-q:v", "5", os.path.join(sprites_dir, "sprite_%03d.jpg")], duration)
+
+    sheets = sorted(name for name in os.listdir(sprites_dir) if name.startswith("sprite_") and name.endswith(".jpg"))
+    if not sheets:
+        raise Exception(f"预览图生成失败: {source}")
+    per_sheet = columns * rows
+    count = min(max(1, math.ceil(duration / interval)), len(sheets) * per_sheet)
+
+    cues = ["WEBVTT", ""]
+    for i in range(count):
+        sheet, cell = divmod(i, per_sheet)
+        x, y = cell % columns * width, cell // columns * height
+        start, end = i * interval, min((i + 1) * interval, duration) if duration else (i + 1) * interval
+        cues += [f"{_vtt_time(start)} --> {_vtt_time(end)}", f"{sheets[sheet]}#xywh={x},{y},{width},{height}", ""]
+    with open(os.path.join(sprites_dir, "sprites.vtt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(cues))
+
+    index_path = os.path.join(sprites_dir, "sprites.json")
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "interval": interval,
+            "duration": duration,
+            "width": width,
+            "height": height,
+            "columns": columns,
+            "rows": rows,
+            "count": count,
+            "sheets": sheets,
+        }, f, ensure_ascii=False)
+    logger.info(f"生成预览图: {source}, {count} 帧, {len(sheets)} 张雪碧图")
+    return index_path
+
+
+def load_pcm_wav(path: str):
+    """
+    直接读取 16 kHz 单声道 16 位 PCM 的 WAV，返回 float32 数组 (与 whisperx.load_audio 相同)
+
+    格式不同 (如旧版本生成的 44.1 kHz 双声道 WAV) 时返回 None，由调用方解码。
+    """
+    import numpy as np
+    try:
+        with wave.open(path, "rb") as f:
+            if f.getframerate() != ASR_SAMPLE_RATE or f.getnchannels() != 1 or f.getsampwidth() != 2:
+                return None
+            frames = f.readframes(f.getnframes())
+    except (wave.Error, EOFError) as e:
+        logger.warning(f"无法直接读取 WAV，改为解码: {path}, {str(e)}")
+        return None
+    return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def load_pcm_audio(path: str):
+    """
+    读取语音识别用的音频，返回 16 kHz 单声道 float32 数组
+
+    16 kHz 单声道 WAV 直接读取；FLAC、Opus 及其他格式用 ffmpeg 解码为 PCM (在任务中执行时可被取消)。
+    """
+    import numpy as np
+    if path.lower().endswith(".wav"):
+        audio = load_pcm_wav(path)
+        if audio is not None:
+            return audio
+    result = run_command(["ffmpeg", "-v", "error", "-nostdin", "-i", path, "-map", "0:a:0",
+                          "-f", "s16le", "-ac", "1", "-ar", str(ASR_SAMPLE_RATE), "pipe:1"])
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
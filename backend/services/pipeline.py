@@ -0,0 +1,263 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Sequence, Any
+from services.job_queue import JobContext
+from services.resource_limits import resource_slot
+from services.stage_store import StageStore
+from utils.cancellation import set_current_token, check_cancelled, JobCancelled
+from utils.progress import set_progress_callback
+from utils.logger import get_logger
+
+logger = get_logger("pipeline")
+
+
+class Stage:
+    """流水线中的一个阶段"""
+
+    def __init__(self, name: str, func: Callable[[], Any],
+                 deps: Sequence[str] = (), weight: float = 1.0,
+                 resource: Optional[str] = None,
+                 artifacts: Optional[Callable[[], List[str]]] = None,
+                 restore: Optional[Callable[[], Any]] = None):
+        """
+        Args:
+            name: 阶段名称
+            func: 阶段执行函数，无参数
+            deps: 依赖的阶段名称
+            weight: 阶段在整体进度中的权重
+            resource: 阶段占用的资源类别，受 resource_limits 中的并发上限约束
+            artifacts: 返回阶段产物路径的函数；提供时阶段可断点续跑
+            restore: 阶段因已完成而跳过时调用，用于恢复产物相关的状态
+        """
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.weight = weight
+        self.resource = resource
+        self.artifacts = artifacts
+        self.restore = restore
+
+
+class PipelineResult:
+    """流水线执行结果，包含各阶段耗时和关键路径"""
+
+    def __init__(self, timings: Dict[str, Dict[str, float]], critical_path: List[str]):
+        self.timings = timings
+        self.critical_path = critical_path
+
+    @property
+    def critical_seconds(self) -> float:
+        return sum(self.timings[name]["duration"] for name in self.critical_path)
+
+    @property
+    def total_seconds(self) -> float:
+        if not self.timings:
+            return 0.0
+        start = min(t["start"] for t in self.timings.values())
+        end = max(t["end"] for t in self.timings.values())
+        return end - start
+
+    def to_dict(self) -> dict:
+        return {
+            "critical_path": self.critical_path,
+            "critical_seconds": round(self.critical_seconds, 3),
+            "total_seconds": round(self.total_seconds, 3),
+            "stages": {
+                name: {k: round(v, 3) for k, v in t.items()}
+                for name, t in self.timings.items()
+            }
+        }
+
+
+class PipelineError(Exception):
+    """阶段执行失败，记录失败的阶段名称"""
+
+    def __init__(self, stage: str, error: Exception):
+        super().__init__(f"阶段 {stage} 失败: {str(error)}")
+        self.stage = stage
+        self.error = error
+
+
+class Pipeline:
+    """
+    阶段 DAG 执行器
+
+    所有依赖已完成的阶段会并行执行；任一阶段失败后不再启动新阶段，
+    等待已启动的阶段结束后抛出 PipelineError。
+
+    提供 store 时，已记录完成且产物校验和一致的阶段会被跳过；
+    阶段重新执行后会清除其所有下游阶段的完成记录。
+    """
+
+    def __init__(self, stages: List[Stage], max_workers: int = 4,
+                 store: Optional[StageStore] = None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max_workers
+        self.store = store
+        self._validate()
+
+    def descendants(self, name: str) -> List[str]:
+        """获取依赖于指定阶段的所有下游阶段"""
+        result = []
+        pending = [name]
+        while pending:
+            current = pending.pop()
+            for stage in self.stages.values():
+                if current in stage.deps and stage.name not in result:
+                    result.append(stage.name)
+                    pending.append(stage.name)
+        return result
+
+    def _resumable(self, stage: Stage) -> bool:
+        return self.store is not None and stage.artifacts is not None
+
+    def _skip_completed(self, stage: Stage) -> bool:
+        """阶段已完成时恢复其状态并返回 True"""
+        if not self._resumable(stage) or not self.store.is_complete(stage.name, stage.artifacts()):
+            return False
+        logger.info(f"阶段已完成，跳过: {stage.name}")
+        if stage.restore is not None:
+            stage.restore()
+        return True
+
+    def _execute(self, stage: Stage) -> None:
+        """执行阶段并记录完成状态"""
+        stage.func()
+        if self._resumable(stage):
+            self.store.mark_complete(stage.name, stage.artifacts())
+            self.store.invalidate(self.descendants(stage.name))
+
+    def _validate(self) -> None:
+        """检查依赖是否存在且无环"""
+        for stage in self.stages.values():
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"阶段 {stage.name} 依赖未知阶段: {dep}")
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"阶段依赖存在环: {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def run(self, context: Optional[JobContext] = None,
+            on_stage_done: Optional[Callable[[str], None]] = None) -> PipelineResult:
+        """
+        执行流水线
+
+        Args:
+            context: 任务上下文，用于上报进度
+            on_stage_done: 阶段完成回调，在调用线程中执行 (可安全使用调用方的数据库会话)
+        """
+        total_weight = sum(s.weight for s in self.stages.values()) or 1.0
+        done_weight = 0.0
+        done: set = set()
+        running: Dict[Any, str] = {}
+        timings: Dict[str, Dict[str, float]] = {}
+        error: Optional[PipelineError] = None
+        if context is not None:
+            context.plan({name: stage.deps for name, stage in self.stages.items()})
+
+        def timed(stage: Stage):
+            # 让阶段中的子进程、下载和转写能感知任务取消
+            set_current_token(context.cancellation if context is not None else None)
+            start = time.time()
+            if self._skip_completed(stage):
+                end = time.time()
+                timings[stage.name] = {"start": start, "end": end, "duration": end - start, "wait": 0.0, "skipped": 1.0}
+                if context is not None:
+                    context.stage_finished(stage.name)
+                return
+            # 等待资源槽位的时间单独记录，不计入阶段耗时
+            priority = context.priority if context is not None else 0
+            with resource_slot(stage.resource, priority) as waited:
+                # 等待槽位期间任务可能已取消，开始执行前再检查一次
+                check_cancelled()
+                if context is not None:
+                    context.stage_started(stage.name)
+                    set_progress_callback(lambda done, total, unit, rate: context.report_detail(stage.name, done, total, unit, rate))
+                start = time.time()
+                try:
+                    self._execute(stage)
+                finally:
+                    set_progress_callback(None)
+                    end = time.time()
+                    timings[stage.name] = {"start": start, "end": end, "duration": end - start, "wait": waited, "skipped": 0.0}
+            if context is not None:
+                context.stage_finished(stage.name, end - start)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as executor:
+            while True:
+                if error is None and context is not None and context.is_cancelled():
+                    error = PipelineError(",".join(sorted(running.values())) or "pending", JobCancelled("任务已取消"))
+                if error is None:
+                    for stage in self.stages.values():
+                        if (stage.name not in done and stage.name not in running.values()
+                                and all(dep in done for dep in stage.deps)):
+                            logger.info(f"启动阶段: {stage.name}")
+                            running[executor.submit(timed, stage)] = stage.name
+                    if context is not None and running:
+                        context.report(",".join(sorted(running.values())), done_weight / total_weight)
+
+                if not running:
+                    break
+
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logger.error(f"阶段失败: {name} - {str(e)}")
+                        if error is None:
+                            error = PipelineError(name, e)
+                        continue
+                    done.add(name)
+                    done_weight += self.stages[name].weight
+                    logger.info(f"阶段完成: {name} ({timings[name]['duration']:.1f}s)")
+                    if on_stage_done is not None:
+                        on_stage_done(name)
+
+        if error is not None:
+            raise error
+
+        result = PipelineResult(timings, self._critical_path(timings))
+        logger.info(f"关键路径: {' -> '.join(result.critical_path)} ({result.critical_seconds:.1f}s / 总耗时 {result.total_seconds:.1f}s)")
+        if context is not None:
+            context.record_pipeline(result.to_dict())
+        return result
+
+    def _critical_path(self, timings: Dict[str, Dict[str, float]]) -> List[str]:
+        """按实际耗时计算最长依赖链"""
+        longest: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+
+        def resolve(name: str) -> float:
+            if name in longest:
+                return longest[name]
+            best_dep, best = None, 0.0
+            for dep in self.stages[name].deps:
+                value = resolve(dep)
+                if value > best or best_dep is None:
+                    best_dep, best = dep, value
+            longest[name] = best + timings.get(name, {}).get("duration", 0.0)
+            previous[name] = best_dep
+            return longest[name]
+
+        if not self.stages:
+            return []
+        end = max(self.stages, key=resolve)
+        path = []
+        while end is not None:
+            path.append(end)
+            end = previous[end]
+        return list(reversed(path))
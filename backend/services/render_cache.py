@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from config import settings
+from models.database import SessionLocal, RenderOutput
+from services import blob_store
+from services.render_engine import RENDER_BURN
+from utils.disk_cache import DiskCache
+from utils.logger import get_logger
+
+logger = get_logger("render_cache")
+
+# 渲染流程变化 (如滤镜、封装方式) 时递增，使旧的缓存失效
+RENDER_VERSION = 1
+
+# 未纳入内容寻址存储的文件的 SHA-256，按 (路径, 大小, 修改时间) 缓存，避免每次请求读取整个视频
+_digests: Dict[Tuple[str, int, int], str] = {}
+_digests_lock = threading.Lock()
+
+# 字幕预览片段缓存，文件名以视频的 hash_name 开头
+preview_cache = DiskCache(
+    os.path.join(settings.BASE_DATA_PATH, settings.PREVIEW_CACHE_DIR),
+    settings.PREVIEW_CACHE_MAX_BYTES,
+    name="预览片段缓存"
+)
+
+
+def content_digest(path: str) -> str:
+    """文件内容的 SHA-256: 优先使用内容寻址存储中登记的值，否则读取文件计算"""
+    digest = blob_store.known_digest(path)
+    if digest:
+        return digest
+    stat = os.stat(path)
+    key = (os.path.normpath(path), stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        digest = _digests.get(key)
+    if digest is None:
+        digest = blob_store.file_digest(path)
+        with _digests_lock:
+            _digests[key] = digest
+    return digest
+
+
+def render_params(mode: str, container: str) -> Dict[str, Any]:
+    """影响输出内容的渲染参数"""
+    if mode == RENDER_BURN:
+        return {"mode": mode, "container": "mp4", "preset": settings.RENDER_PRESET,
+                "crf": settings.RENDER_CRF, "version": RENDER_VERSION}
+    return {"mode": mode, "container": container, "version": RENDER_VERSION}
+
+
+def render_key(source: str, subtitles: List[str], params: Dict[str, Any]) -> Tuple[str, str, str]:
+    """
+    计算渲染结果的缓存键
+
+    Args:
+        source: 原视频
+        subtitles: 渲染使用的字幕文件 (ASS、字幕 JSON)
+        params: render_params 返回的渲染参数
+
+    Returns:
+        (缓存键, 原视频 SHA-256, 字幕 SHA-256)
+    """
+    source_digest = content_digest(source)
+    subtitle_hash = hashlib.sha256()
+    for path in subtitles:
+        subtitle_hash.update(os.path.basename(path).encode())
+        subtitle_hash.update(blob_store.file_digest(path).encode())
+    subtitle_digest = subtitle_hash.hexdigest()
+    key = hashlib.sha256(json.dumps(
+        {"source": source_digest, "subtitles": subtitle_digest, "params": params}, sort_keys=True
+    ).encode()).hexdigest()
+    return key, source_digest, subtitle_digest
+
+
+def output_path(output_dir: str, hash_name: str, key: str, params: Dict[str, Any]) -> str:
+    """渲染结果的文件路径，每个缓存键一个文件，不覆盖原视频和其他参数的结果"""
+    return os.path.join(output_dir, f"{hash_name}_{params['mode']}_{key[:12]}.{params['container']}")
+
+
+def preview_key(hash_name: str, source: str, ass_file: str, start: float, end: float) -> str:
+    """
+    预览片段的缓存文件名: <hash_name>_<键>.mp4
+
+    键由原视频内容、ASS 内容、时间段 (精确到毫秒) 和编码参数计算，修改字幕样式后自动使用新的片段。
+    """
+    params = {"start": round(start, 3), "end": round(end, 3), "height": settings.PREVIEW_HEIGHT,
+              "preset": settings.PREVIEW_PRESET, "crf": settings.PREVIEW_CRF, "version": RENDER_VERSION}
+    key = hashlib.sha256(json.dumps(
+        {"source": content_digest(source), "subtitles": blob_store.file_digest(ass_file), "params": params},
+        sort_keys=True
+    ).encode()).hexdigest()
+    return f"{hash_name}_{key[:16]}.mp4"
+
+
+def lookup(key: str) -> Optional[RenderOutput]:
+    """查找已有的渲染结果；文件已不存在时删除记录并返回 None"""
+    db = SessionLocal()
+    try:
+        output = db.query(RenderOutput).filter(RenderOutput.cache_key == key).first()
+        if output is None:
+            return None
+        if not os.path.exists(output.path):
+            logger.info(f"渲染结果文件已不存在，删除缓存记录: {output.path}")
+            db.delete(output)
+            db.commit()
+            return None
+        output.last_used_at = datetime.utcnow()
+        db.commit()
+        db.refresh(output)
+        db.expunge(output)
+        return output
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def record(key: str, hash_name: str, params: Dict[str, Any], source_digest: str,
+           subtitle_digest: str, path: str) -> None:
+    """登记渲染结果"""
+    db = SessionLocal()
+    try:
+        db.query(RenderOutput).filter(RenderOutput.cache_key == key).delete(synchronize_session=False)
+        db.add(RenderOutput(
+            cache_key=key,
+            hash_name=hash_name,
+            mode=params["mode"],
+            params=json.dumps(params, ensure_ascii=False),
+            source_digest=source_digest,
+            subtitle_digest=subtitle_digest,
+            path=path,
+            size=os.path.getsize(path),
+        ))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def release_video(hash_name: str) -> None:
+    """删除视频的所有渲染记录 (文件随视频目录删除) 和预览片段"""
+    preview_cache.invalidate(f"{hash_name}_")
+    db = SessionLocal()
+    try:
+        db.query(RenderOutput).filter(RenderOutput.hash_name == hash_name).delete(synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
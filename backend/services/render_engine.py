@@ -0,0 +1,297 @@
+import csv
+import json
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from config import settings
+from services.media_prep import probe_media
+from utils.cancellation import current_token, set_current_token, check_cancelled
+from utils.progress import current_progress_callback, set_progress_callback, report_progress
+from utils.process_utils import run_command, run_ffmpeg
+from utils.logger import get_logger
+
+logger = get_logger("render_engine")
+
+# 渲染方式
+RENDER_BURN = "burn"  # 烧录硬字幕，重新编码视频
+RENDER_MUX = "mux"    # 添加可切换的软字幕轨道，视频和音频直接复制
+
+# MP4 可以直接复制的音频编码，其他编码转为 AAC
+MP4_AUDIO_CODECS = {"aac", "mp3", "ac3", "eac3", "alac", "opus"}
+
+# 软字幕轨道: (字幕 JSON 中的字段, ISO 639-2 语言代码, 轨道标题)
+SUBTITLE_TRACKS = [
+    ("text", "eng", "English"),
+    ("translated_text", "chi", "中文"),
+]
+
+
+def render_workers() -> int:
+    """并行编码的片段数: RENDER_WORKERS，为 0 时取 CPU 核心数的一半 (每个 x264 进程使用两个线程)"""
+    return settings.RENDER_WORKERS or max(1, (os.cpu_count() or 2) // 2)
+
+
+def _filter_path(path: str) -> str:
+    """转义滤镜参数中的路径 (ass=...)"""
+    return path.replace("\\", "/").replace(":", "\\:").replace("'", "\\'")
+
+
+def split_at_keyframes(source: str, work_dir: str, segment_seconds: float) -> List[Tuple[str, float, float]]:
+    """
+    按关键帧把视频流切分为片段 (不重新编码)
+
+    segment 复用器在达到 segment_seconds 后的第一个关键帧处切分，片段之间不重叠也不缺帧。
+    每个片段的时间戳从 0 开始，返回 [(片段路径, 在原视频中的开始时间, 结束时间)]。
+    """
+    list_path = os.path.join(work_dir, "segments.csv")
+    run_command([
+        "ffmpeg", "-y", "-i", source,
+        "-map", "0:v:0", "-c", "copy",
+        "-f", "segment", "-segment_time", f"{segment_seconds:.3f}",
+        "-reset_timestamps", "1",
+        "-segment_list", list_path, "-segment_list_type", "csv",
+        os.path.join(work_dir, "seg_%04d.mkv"),
+    ])
+    segments = []
+    with open(list_path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if len(row) >= 3:
+                segments.append((os.path.join(work_dir, row[0]), float(row[1]), float(row[2])))
+    if not segments:
+        raise Exception(f"视频切分失败: {source}")
+    return segments
+
+
+def encode_segment(segment: str, start: float, end: float, ass_file: str, output: str, threads: int) -> None:
+    """
+    把 ASS 字幕烧录到一个片段
+
+    片段的时间戳从 0 开始，先平移 start 秒使字幕按原视频时间显示，烧录后再平移回 0，
+    拼接时由 concat 按片段时长依次排列。
+    """
+    vf = f"setpts=PTS+{start:.6f}/TB,ass={_filter_path(ass_file)},setpts=PTS-STARTPTS"
+    run_ffmpeg([
+        "ffmpeg", "-y", "-i", segment,
+        "-vf", vf,
+        "-c:v", "libx264", "-preset", settings.RENDER_PRESET, "-crf", str(settings.RENDER_CRF),
+        "-pix_fmt", "yuv420p", "-threads", str(threads),
+        "-an", output,
+    ], end - start)
+
+
+def concat_segments(segments: List[str], source: str, output: str, audio: Optional[Dict[str, Any]]) -> None:
+    """
+    用 concat 拼接编码后的片段 (不重新编码)，并复用原视频的音频
+
+    音频不参与切分，避免片段边界处的音频编码延迟造成的间隙；原音频为 AAC 时直接复制。
+    """
+    list_path = os.path.join(os.path.dirname(segments[0]), "concat.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in segments:
+            f.write(f"file '{os.path.basename(path)}'\n")
+    cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_path]
+    if audio:
+        cmd += ["-i", source, "-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy"]
+        cmd += ["-c:a", "copy"] if audio.get("codec") == "aac" else ["-c:a", "aac", "-b:a", "192k"]
+    else:
+        cmd += ["-map", "0:v:0", "-c:v", "copy"]
+    run_command(cmd + ["-movflags", "+faststart", output])
+
+
+def _srt_time(seconds: float) -> str:
+    ms = int(round(max(0.0, seconds) * 1000))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+
+def write_srt(segments: List[Dict[str, Any]], field: str, path: str) -> bool:
+    """把字幕 JSON 的一个语言写为 SRT，没有该语言的文本时返回 False"""
+    cues = []
+    for segment in segments:
+        text = (segment.get(field) or "").strip()
+        if text:
+            cues.append(f"{len(cues) + 1}\n{_srt_time(segment['start'])} --> {_srt_time(segment['end'])}\n{text}\n")
+    if not cues:
+        return False
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(cues))
+    return True
+
+
+def mux_soft_subtitles(source: str, output_file: str, subtitle_json: Optional[str],
+                       ass_file: Optional[str] = None, container: str = "mp4",
+                       info: Optional[Dict[str, Any]] = None) -> str:
+    """
+    把字幕作为可切换的轨道封装进视频，视频和音频直接复制，不重新编码
+
+    - MKV: 双语 ASS (保留样式，默认轨道) 以及英文、中文两条 SRT 轨道
+    - MP4: 英文、中文两条 mov_text 轨道 (由字幕 JSON 转换)；音频编码不被 MP4 支持时转为 AAC
+
+    Args:
+        source: 原视频
+        output_file: 输出路径，完成后原子替换
+        subtitle_json: 含 text / translated_text 的字幕 JSON (翻译结果)
+        ass_file: 双语 ASS，仅 MKV 使用
+        container: mp4 或 mkv
+        info: 已读取的媒体信息，为 None 时先用 ffprobe 读取
+
+    Returns:
+        output_file
+    """
+    info = info or probe_media(source)
+    work_dir = os.path.join(os.path.dirname(output_file), f".mux_{uuid.uuid4().hex[:8]}")
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        segments = []
+        if subtitle_json and os.path.exists(subtitle_json):
+            with open(subtitle_json, "r", encoding="utf-8") as f:
+                segments = json.load(f).get("segments", [])
+
+        # 字幕输入: (路径, 语言代码, 标题)
+        tracks: List[Tuple[str, str, str]] = []
+        if container == "mkv" and ass_file and os.path.exists(ass_file):
+            tracks.append((ass_file, "chi", "双语"))
+        for field, language, title in SUBTITLE_TRACKS:
+            srt_path = os.path.join(work_dir, f"{language}.srt")
+            if write_srt(segments, field, srt_path):
+                tracks.append((srt_path, language, title))
+        if not tracks:
+            raise Exception(f"没有可封装的字幕: {subtitle_json}")
+
+        cmd = ["ffmpeg", "-y", "-i", source]
+        for path, _, _ in tracks:
+            cmd += ["-i", path]
+        cmd += ["-map", "0:v:0", "-map", "0:a:0?"]
+        for index in range(len(tracks)):
+            cmd += ["-map", f"{index + 1}:0"]
+        cmd += ["-c:v", "copy"]
+        audio = info["audio"] or {}
+        if container == "mp4" and audio and audio.get("codec") not in MP4_AUDIO_CODECS:
+            cmd += ["-c:a", "aac", "-b:a", "192k"]
+        else:
+            cmd += ["-c:a", "copy"]
+        cmd += ["-c:s", "mov_text" if container == "mp4" else "copy"]
+        for index, (path, language, title) in enumerate(tracks):
+            cmd += [f"-metadata:s:s:{index}", f"language={language}", f"-metadata:s:s:{index}", f"title={title}",
+                    f"-disposition:s:{index}", "default" if index == 0 else "0"]
+        tmp_output = os.path.join(work_dir, f"output.{container}")
+        if container == "mp4":
+            cmd += ["-movflags", "+faststart"]
+        run_ffmpeg(cmd + [tmp_output], info["duration"])
+        os.replace(tmp_output, output_file)
+        logger.info(f"软字幕封装完成: {output_file}, {len(tracks)} 条字幕轨道")
+        return output_file
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def render_preview_clip(source: str, ass_file: str, start: float, end: float, output_file: str) -> str:
+    """
+    渲染 [start, end) 时间段的烧录字幕预览片段 (MP4)
+
+    -ss 放在输入前，由解码器直接跳到 start 前的关键帧，不解码之前的内容；输出时间戳从 0 开始，
+    与 encode_segment 相同先平移 start 秒再烧录 ASS，字幕与原视频时间对齐。
+    字幕按原分辨率烧录后再缩小到 PREVIEW_HEIGHT，使用 PREVIEW_PRESET 快速编码。
+
+    Args:
+        source: 原视频
+        ass_file: ASS 字幕
+        start, end: 片段在原视频中的开始、结束时间 (秒)
+        output_file: 输出路径 (扩展名不限，格式固定为 MP4)
+
+    Returns:
+        output_file
+    """
+    vf = (f"setpts=PTS+{start:.6f}/TB,ass={_filter_path(ass_file)},setpts=PTS-STARTPTS,"
+          f"scale=-2:'min(ih,{settings.PREVIEW_HEIGHT})'")
+    run_command([
+        "ffmpeg", "-y", "-ss", f"{start:.3f}", "-i", source, "-t", f"{end - start:.3f}",
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-vf", vf,
+        "-c:v", "libx264", "-preset", settings.PREVIEW_PRESET, "-crf", str(settings.PREVIEW_CRF),
+        "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "128k",
+        "-movflags", "+faststart", "-f", "mp4", output_file,
+    ])
+    return output_file
+
+
+def render_burn_in(source: str, ass_file: str, output_file: str,
+                   info: Optional[Dict[str, Any]] = None) -> str:
+    """
+    把 ASS 字幕烧录到视频，生成 MP4
+
+    视频按关键帧切分为 RENDER_SEGMENT_SECONDS 左右的片段，多个 ffmpeg 进程并行编码
+    (每个进程分到 CPU 核心数 / 并行数个线程)，最后无损拼接并复用原音频。
+    进度按已编码的媒体时长汇总上报；任务取消时终止所有 ffmpeg 进程。
+
+    Args:
+        source: 原视频
+        ass_file: ASS 字幕
+        output_file: 输出路径，完成后原子替换
+        info: 已读取的媒体信息，为 None 时先用 ffprobe 读取
+
+    Returns:
+        output_file
+    """
+    info = info or probe_media(source)
+    if info["video"] is None:
+        raise Exception(f"没有视频流，无法烧录字幕: {source}")
+    duration = info["duration"]
+
+    work_dir = os.path.join(os.path.dirname(output_file), f".render_{uuid.uuid4().hex[:8]}")
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        segments = split_at_keyframes(source, work_dir, settings.RENDER_SEGMENT_SECONDS)
+        check_cancelled()
+        workers = min(render_workers(), len(segments))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        logger.info(f"开始烧录字幕: {source}, {len(segments)} 个片段, {workers} 个并行编码, 每个 {threads} 线程")
+
+        # 各片段已编码的时长，汇总后通过调用线程的进度回调上报
+        encoded = [0.0] * len(segments)
+        lock = threading.Lock()
+        parent_progress = current_progress_callback()
+        token = current_token()
+
+        def encode(index: int) -> str:
+            segment, start, end = segments[index]
+            output = os.path.join(work_dir, f"enc_{index:04d}.mp4")
+
+            def progress(done, total=None, unit=None, rate=None):
+                with lock:
+                    encoded[index] = min(done, end - start)
+                    total_done = sum(encoded)
+                if parent_progress is not None:
+                    parent_progress(total_done, duration, "seconds", None)
+
+            set_current_token(token)
+            set_progress_callback(progress)
+            try:
+                encode_segment(segment, start, end, ass_file, output, threads)
+            finally:
+                set_progress_callback(None)
+                set_current_token(None)
+            return output
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render") as executor:
+            futures = [executor.submit(encode, index) for index in range(len(segments))]
+            try:
+                outputs = [future.result() for future in futures]
+            except Exception:
+                # 一个片段失败后不再启动排队的片段
+                for future in futures:
+                    future.cancel()
+                raise
+
+        check_cancelled()
+        tmp_output = os.path.join(work_dir, "output.mp4")
+        concat_segments(outputs, source, tmp_output, info["audio"])
+        os.replace(tmp_output, output_file)
+        report_progress(duration or 0.0, duration, "seconds")
+        logger.info(f"字幕烧录完成: {output_file}")
+        return output_file
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
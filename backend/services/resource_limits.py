@@ -0,0 +1,96 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from config import settings
+from utils.cancellation import current_token
+
+# 资源类别
+RESOURCE_DOWNLOAD = "download"      # 网络密集
+RESOURCE_TRANSCRIBE = "transcribe"  # CPU 密集
+RESOURCE_TRANSLATE = "translate"    # 依赖翻译服务
+RESOURCE_RENDER = "render"          # 字幕烧录，每个渲染占用全部 CPU 核心
+
+# 等待槽位时检查任务取消的间隔 (秒)
+_CANCEL_POLL_SECONDS = 0.5
+
+
+class PrioritySemaphore:
+    """按优先级唤醒等待者的信号量，优先级相同时先到先得"""
+
+    def __init__(self, value: int):
+        self._value = value
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._counter = itertools.count()
+
+    def acquire(self, priority: int = 0) -> None:
+        """
+        等待并占用一个槽位
+
+        在任务中执行时定期检查取消标记，任务被取消时放弃等待并抛出 JobCancelled。
+        """
+        token = current_token()
+        with self._cond:
+            entry = (-priority, next(self._counter))
+            heapq.heappush(self._waiters, entry)
+            while not (self._value > 0 and self._waiters[0] == entry):
+                self._cond.wait(_CANCEL_POLL_SECONDS if token is not None else None)
+                if token is not None and token.is_cancelled():
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    # 排在后面的等待者可能因此获得槽位
+                    self._cond.notify_all()
+                    token.check()
+            heapq.heappop(self._waiters)
+            self._value -= 1
+            # 可能还有空闲槽位，让下一个等待者检查
+            self._cond.notify_all()
+
+    def release(self) -> None:
+        with self._cond:
+            self._value += 1
+            self._cond.notify_all()
+
+
+_semaphores: Dict[str, PrioritySemaphore] = {}
+_lock = threading.Lock()
+
+
+def _limit_for(resource: str) -> int:
+    limits = {
+        RESOURCE_DOWNLOAD: settings.DOWNLOAD_CONCURRENCY,
+        RESOURCE_TRANSCRIBE: settings.TRANSCRIBE_CONCURRENCY,
+        RESOURCE_TRANSLATE: settings.TRANSLATE_CONCURRENCY,
+        RESOURCE_RENDER: settings.RENDER_CONCURRENCY,
+    }
+    return max(1, limits.get(resource, 1))
+
+
+def get_semaphore(resource: str) -> PrioritySemaphore:
+    """获取资源类别对应的进程内信号量"""
+    with _lock:
+        if resource not in _semaphores:
+            _semaphores[resource] = PrioritySemaphore(_limit_for(resource))
+        return _semaphores[resource]
+
+
+@contextmanager
+def resource_slot(resource: Optional[str], priority: int = 0):
+    """
+    占用一个资源槽位，返回等待时长 (秒)
+
+    resource 为 None 时不做限制；槽位紧张时高优先级的任务先获得槽位。
+    """
+    if resource is None:
+        yield 0.0
+        return
+    semaphore = get_semaphore(resource)
+    started = time.time()
+    semaphore.acquire(priority)
+    try:
+        yield time.time() - started
+    finally:
+        semaphore.release()
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import List, Iterable
+from models.database import SessionLocal, VideoStage
+from utils.logger import get_logger
+
+logger = get_logger("stage_store")
+
+
+def artifacts_checksum(paths: List[str]) -> str:
+    """计算一组产物文件的 SHA-256，任一文件不存在时返回空字符串"""
+    digest = hashlib.sha256()
+    for path in paths:
+        if not path or not os.path.exists(path):
+            return ""
+        digest.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StageStore:
+    """记录和校验视频各处理阶段的完成状态"""
+
+    def __init__(self, hash_name: str):
+        self.hash_name = hash_name
+
+    def is_complete(self, stage: str, paths: List[str]) -> bool:
+        """阶段已记录完成，且产物仍然存在并与记录的校验和一致"""
+        db = SessionLocal()
+        try:
+            record = (
+                db.query(VideoStage)
+                .filter(VideoStage.hash_name == self.hash_name, VideoStage.stage == stage)
+                .first()
+            )
+            if not record:
+                return False
+            if json.loads(record.artifacts or "[]") != paths:
+                return False
+            return record.checksum == artifacts_checksum(paths)
+        finally:
+            db.close()
+
+    def mark_complete(self, stage: str, paths: List[str]) -> None:
+        """记录阶段完成及其产物校验和"""
+        checksum = artifacts_checksum(paths)
+        if not checksum:
+            raise Exception(f"阶段 {stage} 的产物不存在: {paths}")
+        db = SessionLocal()
+        try:
+            db.query(VideoStage).filter(
+                VideoStage.hash_name == self.hash_name, VideoStage.stage == stage
+            ).delete(synchronize_session=False)
+            db.add(VideoStage(
+                hash_name=self.hash_name,
+                stage=stage,
+                artifacts=json.dumps(paths, ensure_ascii=False),
+                checksum=checksum,
+                completed_at=datetime.utcnow()
+            ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def invalidate(self, stages: Iterable[str]) -> None:
+        """上游阶段重新执行后，清除下游阶段的完成记录"""
+        stages = list(stages)
+        if not stages:
+            return
+        db = SessionLocal()
+        try:
+            db.query(VideoStage).filter(
+                VideoStage.hash_name == self.hash_name, VideoStage.stage.in_(stages)
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def clear(self) -> None:
+        """删除该视频的所有阶段记录"""
+        db = SessionLocal()
+        try:
+            db.query(VideoStage).filter(VideoStage.hash_name == self.hash_name).delete(synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
@@ -0,0 +1,110 @@
+import hashlib
+import os
+from typing import Any, Dict, List, Optional
+from PIL import Image, ImageOps
+from config import settings
+from utils.disk_cache import DiskCache
+
+# 支持的输出格式及对应的 Pillow 格式和 Content-Type
+FORMATS = {
+    "jpg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+    "png": ("PNG", "image/png"),
+}
+
+
+def media_type(fmt: str) -> str:
+    return FORMATS[fmt][1]
+
+
+def pick_source(variants: List[Dict[str, Any]], fallback: Optional[str], width: Optional[int]) -> Optional[str]:
+    """
+    选择缩放的源图片: 宽度不小于 width 的最小 JPEG 尺寸，都不够大时取最大尺寸
+
+    没有多尺寸缩略图时使用 fallback (pic_thumb_path)。
+    """
+    jpgs = [v for v in variants if v.get("format") == "jpg" and os.path.exists(v.get("path", ""))]
+    if jpgs:
+        if width:
+            for variant in sorted(jpgs, key=lambda v: v["width"]):
+                if variant["width"] >= width:
+                    return variant["path"]
+        return max(jpgs, key=lambda v: v["width"])["path"]
+    return fallback if fallback and os.path.exists(fallback) else None
+
+
+def thumbnail_version(variants: List[Dict[str, Any]], fallback: Optional[str]) -> Optional[str]:
+    """
+    视频缩略图的版本: 各尺寸缩略图和 pic_thumb_path 的修改时间与大小的摘要，没有缩略图时返回 None
+
+    缩略图重新生成后版本改变，用于带版本的缩略图 URL。
+    """
+    digest = hashlib.md5()
+    found = False
+    for path in [v.get("path", "") for v in variants] + [fallback]:
+        if path and os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+            found = True
+    return digest.hexdigest()[:12] if found else None
+
+
+class ThumbnailCache(DiskCache):
+    """
+    按需缩放的缩略图磁盘缓存
+
+    缩放结果保存在 <BASE_DATA_PATH>/<THUMBNAIL_CACHE_DIR>，文件名由视频、尺寸、格式和源图片的
+    修改时间组成，源图片重新生成后自动使用新的缓存文件。总大小超过 THUMBNAIL_CACHE_MAX_BYTES 时
+    删除最久未使用的文件 (见 DiskCache)。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        super().__init__(
+            cache_dir or os.path.join(settings.BASE_DATA_PATH, settings.THUMBNAIL_CACHE_DIR),
+            max_bytes if max_bytes is not None else settings.THUMBNAIL_CACHE_MAX_BYTES,
+            name="缩略图缓存"
+        )
+
+    @staticmethod
+    def cache_key(hash_name: str, source: str, width: Optional[int], height: Optional[int], fmt: str) -> str:
+        """缓存文件名，包含源图片的修改时间和大小，同时用作 ETag"""
+        stat = os.stat(source)
+        version = hashlib.md5(f"{source}:{stat.st_mtime_ns}:{stat.st_size}".encode()).hexdigest()[:12]
+        return f"{hash_name}_{width or 0}x{height or 0}_{version}.{fmt}"
+
+    def get(self, hash_name: str, source: str, width: Optional[int], height: Optional[int],
+            fmt: str, key: Optional[str] = None) -> str:
+        """
+        返回缩放后的缩略图路径，缓存中没有时用 Pillow 缩放一次并写入缓存
+
+        Args:
+            hash_name: 视频
+            source: 源图片
+            width, height: 目标尺寸；同时指定时居中裁剪，只指定一个时保持宽高比
+            fmt: 输出格式 (jpg / webp / png)
+            key: 已计算的 cache_key
+        """
+        key = key or self.cache_key(hash_name, source, width, height, fmt)
+        return self.get_or_create(key, lambda tmp: self._render(source, tmp, width, height, fmt))
+
+    @staticmethod
+    def _render(source: str, dest: str, width: Optional[int], height: Optional[int], fmt: str) -> None:
+        with Image.open(source) as image:
+            image = image.convert("RGBA" if fmt == "png" else "RGB")
+            if width and height:
+                image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+            elif width or height:
+                if width:
+                    height = max(1, round(image.height * width / image.width))
+                else:
+                    width = max(1, round(image.width * height / image.height))
+                image = image.resize((width, height), Image.LANCZOS)
+            pil_format = FORMATS[fmt][0]
+            if pil_format == "PNG":
+                image.save(dest, pil_format, optimize=True)
+            else:
+                image.save(dest, pil_format, quality=settings.THUMBNAIL_CACHE_QUALITY)
+
+
+# 进程内共享的缩略图缓存
+thumbnail_cache = ThumbnailCache()
@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+from typing import Optional
+import yt_dlp
+from sqlalchemy.exc import IntegrityError
+from config import settings
+from models.database import SessionLocal, UrlProbe, Video
+from utils.hash_utils import generate_hash_name, legacy_hash_name
+from utils.url_utils import canonical_key, source_key, url_for_key
+from utils.logger import get_logger
+
+logger = get_logger("url_resolver")
+
+
+class ResolvedUrl:
+    """URL 解析结果"""
+
+    def __init__(self, url: str, hash_name: str, extractor: Optional[str] = None,
+                 video_id: Optional[str] = None, title: Optional[str] = None,
+                 duration: Optional[float] = None):
+        self.url = url  # 规范 URL
+        self.hash_name = hash_name
+        self.extractor = extractor
+        self.video_id = video_id
+        self.title = title
+        self.duration = duration
+
+
+def existing_hash_name(db, url: str, canonical: str) -> Optional[str]:
+    """
+    同一视频已有记录的 hash_name，没有记录时返回 None
+
+    URL 规范化之前的记录按提交的原始链接计算 hash (YouTube 以外的站点)，与规范 URL 的 hash 不同。
+    依次按规范 URL 的 hash、提交链接的旧 hash 和 (站点, 视频 ID) 的索引列 source_key 查找，已有记录沿用原来的 hash 和目录，
+    不会重新下载。
+    """
+    candidates = [generate_hash_name(canonical), legacy_hash_name(url)]
+    found = {row.hash_name for row in db.query(Video.hash_name).filter(Video.hash_name.in_(candidates))}
+    for hash_name in candidates:
+        if hash_name in found:
+            return hash_name
+
+    # YouTube 的 hash 只取视频 ID，规范化前后相同，不需要按视频 ID 查找
+    key = canonical_key(canonical)
+    if key is None or key[0] == "youtube":
+        return None
+    row = db.query(Video.hash_name).filter(Video.source_key == source_key(canonical)).order_by(Video.id).first()
+    return row.hash_name if row else None
+
+
+def _from_probe(db, url: str, probe: UrlProbe) -> ResolvedUrl:
+    return ResolvedUrl(
+        url=probe.canonical_url,
+        hash_name=existing_hash_name(db, url, probe.canonical_url) or generate_hash_name(probe.canonical_url),
+        extractor=probe.extractor,
+        video_id=probe.video_id,
+        title=probe.title,
+        duration=probe.duration
+    )
+
+
+def _cached(db, url: str) -> Optional[UrlProbe]:
+    deadline = datetime.utcnow() - timedelta(seconds=settings.URL_PROBE_TTL)
+    return db.query(UrlProbe).filter(UrlProbe.url == url, UrlProbe.probed_at >= deadline).first()
+
+
+def _probe(url: str) -> dict:
+    """使用 yt-dlp 获取元数据，不下载任何媒体数据"""
+    options = {
+        "quiet": True,
+        "no_warnings": True,
+        "skip_download": True,
+        "noplaylist": True,
+    }
+    with yt_dlp.YoutubeDL(options) as ydl:
+        return ydl.extract_info(url, download=False)
+
+
+def _save(db, url: str, info: dict, canonical: str) -> UrlProbe:
+    probe = db.query(UrlProbe).filter(UrlProbe.url == url).first() or UrlProbe(url=url)
+    probe.extractor = (info.get("extractor_key") or info.get("extractor") or "").lower() or None
+    probe.video_id = info.get("id")
+    probe.canonical_url = canonical
+    probe.title = info.get("title")
+    probe.duration = info.get("duration")
+    probe.probed_at = datetime.utcnow()
+    db.add(probe)
+    try:
+        db.commit()
+    except IntegrityError:
+        # 其他 worker 同时写入了同一个 URL
+        db.rollback()
+        probe = db.query(UrlProbe).filter(UrlProbe.url == url).first()
+    return probe
+
+
+def resolve(url: str, probe: bool = True) -> ResolvedUrl:
+    """
+    解析 URL 对应的规范 URL 和 hash_name
+
+    1. 缓存中有未过期的探测结果时直接使用
+    2. probe 为 True 时用 yt-dlp extract_info(download=False) 获取 (站点, 视频 ID) 和标题、时长并缓存
+    3. 不探测或探测失败时，按 URL 格式规范化 (不访问网络)
+
+    同一视频的不同链接形式得到相同的规范 URL 和 hash_name，用于在下载前去重。
+    已有同一视频的记录时 (包括 URL 规范化之前按原始链接计算 hash 的记录)，沿用记录的 hash_name。
+    """
+    url = url.strip()
+    key = canonical_key(url)
+    offline_url = url_for_key(*key) if key else url
+
+    db = SessionLocal()
+    try:
+        cached = _cached(db, url)
+        if cached is not None:
+            return _from_probe(db, url, cached)
+        offline = ResolvedUrl(
+            url=offline_url,
+            hash_name=existing_hash_name(db, url, offline_url) or generate_hash_name(offline_url),
+            extractor=key[0] if key else None,
+            video_id=key[1] if key else None
+        )
+        if not probe:
+            return offline
+
+        try:
+            info = _probe(url)
+        except Exception as e:
+            logger.warning(f"探测 URL 元数据失败，按格式规范化: {url}, {str(e)}")
+            return offline
+
+        # 已知站点使用固定格式的规范 URL，保持与已有记录的 hash_name 一致
+        extractor = (info.get("extractor_key") or "").lower()
+        canonical = offline_url if key else (
+            url_for_key(extractor, info.get("id")) or info.get("webpage_url") or url
+        )
+        return _from_probe(db, url, _save(db, url, info, canonical))
+    finally:
+        db.close()
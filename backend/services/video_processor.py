@@ -1,7 +1,6 @@
-from models.database import SessionLocal, Video
+from models.database import SessionLocal, Video, RenderOutput, Job
 from utils.hash_utils import generate_hash_name, create_hash_folder
-from video2wav import convert_video_to_wav
-from download import download_video
+from download import download_video, download_audio, find_audio_source
 import whisperx  # 用于语音识别
 from en2cn import translate_text, translate_json_file
 from json2ass import json_to_ass
@@ -11,16 +10,76 @@ from typing import Optional, List
 from datetime import datetime
 from config import settings
 import json  # 添加到文件顶部的导入部分
+from sqlalchemy import or_
 import shutil
-import threading
 from PIL import Image
-import subprocess
 from utils.logger import get_logger
+from services.job_queue import JobContext, JOB_FAILED
+from services.pipeline import Pipeline, Stage
+from services.resource_limits import RESOURCE_DOWNLOAD, RESOURCE_TRANSCRIBE, RESOURCE_TRANSLATE, RESOURCE_RENDER
+from services.stage_store import StageStore
+from services import blob_store
+from services import render_cache
+from services.thumbnail_cache import thumbnail_cache
+from services.render_engine import (
+    render_burn_in, mux_soft_subtitles, render_preview_clip, RENDER_BURN, RENDER_MUX
+)
+from services.hls_packager import package_hls
+from services.media_prep import (
+    prepare_media, load_pcm_audio, audio_file_name, thumbnails_from_image, thumbnail_variants, generate_sprites
+)
+from utils.cancellation import check_cancelled
+from utils.file_lock import video_lock
+from utils.progress import report_progress
+
+# WhisperX 加载音频的采样率
+SAMPLE_RATE = 16000
+
+# 处理模式
+PROCESS_FULL = "full"                # 下载视频后提取音频
+PROCESS_AUDIO_FIRST = "audio_first"  # 只下载音频先生成字幕，视频之后再补充下载
+
+# 生成字幕的任务类型，渲染、补充下载视频等任务失败不影响视频的处理状态
+PROCESSING_JOB_KINDS = ("process", "resume", "upload")
+
+# 处理流程会写入的视频记录字段
+PIPELINE_FIELDS = [
+    "title",
+    "file_path",
+    "pic_thumb_path",
+    "wav_path",
+    "subtitle_en_json_path",
+    "subtitle_zh_cn_json_path",
+    "subtitle_en_ass_path",
+    "subtitle_en_md_path",
+    "subtitle_zh_cn_md_path",
+    "duration",
+    "media_info",
+    "thumbnail_variants",
+    "sprite_index_path",
+    "hls_playlist_path",
+]
 
 class VideoProcessor:
+    """
+    视频处理器，每个实例持有一个数据库会话
+
+    Session 不是线程安全的，实例不能在线程之间共享：每个任务或每次请求创建一个实例，
+    用完后调用 close (或使用 with 语句)。
+    """
     def __init__(self):
         self.db = SessionLocal()
         self.logger = get_logger("video_processor")
+    
+    def close(self) -> None:
+        """关闭数据库会话，已读取的记录与会话分离，已加载的字段仍可读取"""
+        self.db.close()
+    
+    def __enter__(self) -> "VideoProcessor":
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
         
     def get_videos(self, skip: int = 0, limit: int = 10) -> List[Video]:
         """获取视频列表，支持分页"""
@@ -37,11 +96,17 @@ class VideoProcessor:
             if not video:
                 return False
                 
+            # 释放内容寻址存储中的引用，其他视频不再使用的媒体文件随之删除
+            blob_store.release_video(hash_name)
+            render_cache.release_video(hash_name)
+            thumbnail_cache.invalidate(f"{hash_name}_")
+            
             # 删除文件夹及其内容
             if os.path.exists(video.folder_hash_name_path):
                 shutil.rmtree(video.folder_hash_name_path)
                 
             # 从数据库中删除记录
+            StageStore(hash_name).clear()
             self.db.delete(video)
             self.db.commit()
             
@@ -60,12 +125,31 @@ class VideoProcessor:
             # 1. 加载模型并进行初始转写
             device = "cpu"
             compute_type = "int8"
+            # 加载模型耗时较长，等待转写槽位期间任务可能已取消
+            check_cancelled()
             model = whisperx.load_model("large-v3", device, compute_type=compute_type)
             
-            audio = whisperx.load_audio(audio_path)
-            result = model.transcribe(audio, batch_size=8)
+            # 16 kHz 单声道 WAV 直接读取，FLAC / Opus 等压缩格式由 ffmpeg 解码
+            audio = load_pcm_audio(audio_path)
+            
+            # 分块转写，块之间检查任务是否已取消；后续块沿用第一块检测到的语言
+            chunk_size = settings.TRANSCRIBE_CHUNK_SECONDS * SAMPLE_RATE
+            segments = []
+            language = None
+            for offset in range(0, len(audio), chunk_size):
+                check_cancelled()
+                chunk_result = model.transcribe(audio[offset:offset + chunk_size], batch_size=8, language=language)
+                language = language or chunk_result["language"]
+                shift = offset / SAMPLE_RATE
+                for segment in chunk_result["segments"]:
+                    segment["start"] += shift
+                    segment["end"] += shift
+                    segments.append(segment)
+                report_progress(min(offset + chunk_size, len(audio)) / SAMPLE_RATE, len(audio) / SAMPLE_RATE, "seconds")
+            result = {"segments": segments, "language": language}
             
             self.logger.info(f"初始转写完成，检测到语言: {result['language']}")
+            check_cancelled()
             
             # 2. 加载对齐模型并进行单词级别对齐
             try:
@@ -105,19 +189,39 @@ class VideoProcessor:
             self.logger.error(f"转写音频失败: {str(e)}")
             raise
         
-    def process_video(self, url: str) -> Optional[Video]:
-        """处理视频流程"""
+    def process_video(self, url: str, context: Optional[JobContext] = None,
+                      mode: str = PROCESS_FULL, title: Optional[str] = None,
+                      hash_name: Optional[str] = None) -> Optional[Video]:
+        """
+        处理视频流程
+
+        Args:
+            url: 规范化后的视频 URL
+            hash_name: 解析 URL 时得到的 hash_name (可能是已有记录的旧 hash)，默认由 url 计算
+            mode: 处理模式，PROCESS_AUDIO_FIRST 时只下载音频生成字幕，视频由 fetch_video 补充下载
+            title: 探测到的标题，下载完成前作为视频标题
+        """
         try:
             self.logger.info(f"开始处理视频: {url}")
             
-            # 检查URL是否已存在
-            existing_video = self.db.query(Video).filter(Video.url == url).first()
+            # 检查视频是否已存在 (同一视频的不同链接形式 hash 相同)
+            hash_name = hash_name or generate_hash_name(url)
+            existing_video = self.db.query(Video).filter(
+                or_(Video.url == url, Video.hash_name == hash_name)
+            ).first()
             if existing_video:
                 # 检查文件是否实际存在
                 if not os.path.exists(existing_video.folder_hash_name_path):
                     self.logger.info(f"数据库记录存在但文件丢失，删除记录: {existing_video.hash_name}")
+                    StageStore(existing_video.hash_name).clear()
                     self.db.delete(existing_video)
                     self.db.commit()
+                elif self.get_video_status(existing_video) != "completed":
+                    # 之前的处理中断，从未完成的阶段继续
+                    self.logger.info(f"视频未处理完成，继续处理: {existing_video.hash_name}")
+                    self._run_pipeline(existing_video, self.db, context)
+                    self.db.refresh(existing_video)
+                    return existing_video
                 else:
                     # 检查缩略图是否存在，如果不存在则尝试修复
                     if existing_video.pic_thumb_path and not os.path.exists(existing_video.pic_thumb_path):
@@ -127,166 +231,343 @@ class VideoProcessor:
                     self.logger.info(f"视频已存在: {existing_video.hash_name}")
                     return existing_video
             
-            # 生成hash和创建文件夹
-            hash_name = generate_hash_name(url)
+            # 创建文件夹
             folder_path = create_hash_folder(hash_name, settings.BASE_DATA_PATH)
             
-            # 创建子目录
-            original_dir = os.path.join(folder_path, "original")
-            subtitles_dir = os.path.join(folder_path, "subtitles")
-            docs_dir = os.path.join(folder_path, "docs")
-            
-            os.makedirs(original_dir, exist_ok=True)
-            os.makedirs(subtitles_dir, exist_ok=True)
-            os.makedirs(docs_dir, exist_ok=True)
-            
-            # 创建视频记录（但还不保存到数据库）
+            # 先保存视频记录，每个阶段完成后提交，失败时保留已完成的阶段
             video = Video(
+                title=title or url,
                 url=url,
                 hash_name=hash_name,
                 folder_hash_name_path=folder_path,
+                process_mode=mode,
                 created_at=datetime.utcnow()
             )
+            self.db.add(video)
+            self.db.commit()
             
-            # 下载视频
-            download_result = download_video(url, output_dir=original_dir)
-            if not download_result:
-                raise Exception("视频下载失败")
+            self._run_pipeline(video, self.db, context)
+            self.db.refresh(video)
             
-            video.file_path = download_result['video_path']
-            video.title = download_result['title']
+            self.logger.info(f"视频处理完成: {video.hash_name}")
+            return video
             
-            # 处理缩略图 - 统一使用JPG格式
-            thumbnail_path = os.path.join(original_dir, "thumbnail.jpg")
+        except Exception as e:
+            self.logger.error(f"处理失败: {str(e)}")
+            # 保留已下载和已生成的文件，重试时从失败的阶段继续
+            self.db.rollback()
+            raise e
+        finally:
+            self.db.close()
+    
+    def resume_video(self, hash_name: str, context: Optional[JobContext] = None) -> Optional[Video]:
+        """重试处理视频，跳过已完成的阶段，从失败的阶段继续"""
+        try:
+            video = self.get_video_by_hash(hash_name)
+            if not video:
+                raise Exception(f"视频不存在: {hash_name}")
             
-            # 如果下载器提供了缩略图，尝试转换为JPG格式
-            if 'thumbnail_path' in download_result and download_result['thumbnail_path']:
-                try:
-                    # 如果下载的缩略图存在，转换为JPG格式
-                    if os.path.exists(download_result['thumbnail_path']):
-                        img = Image.open(download_result['thumbnail_path'])
-                        img = img.convert('RGB')  # 确保可以保存为JPG
-                        img.save(thumbnail_path, "JPEG", quality=90)
-                        self.logger.info(f"缩略图转换为JPG成功: {thumbnail_path}")
-                except Exception as e:
-                    self.logger.error(f"缩略图转换失败: {str(e)}")
-            
-            # 如果缩略图不存在，从视频中提取
-            if not os.path.exists(thumbnail_path):
-                self.logger.info(f"尝试从视频中提取缩略图: {video.file_path}")
-                try:
-                    import cv2
-                    cap = cv2.VideoCapture(video.file_path)
-                    
-                    # 获取视频总帧数
-                    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                    # 选择10%位置的帧作为缩略图
-                    frame_position = min(int(total_frames * 0.1), 100)
-                    if frame_position <= 0:
-                        frame_position = 1
-                        
-                    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_position)
-                    success, frame = cap.read()
-                    
-                    if success:
-                        # 调整图像大小为16:9比例的缩略图
-                        height, width = frame.shape[:2]
-                        target_width = 480
-                        target_height = 270
-                        
-                        # 裁剪或缩放以适应目标尺寸
-                        if width/height > target_width/target_height:  # 原图更宽
-                            new_width = int(height * target_width / target_height)
-                            start_x = (width - new_width) // 2
-                            frame = frame[:, start_x:start_x+new_width]
-                        else:  # 原图更高
-                            new_height = int(width * target_height / target_width)
-                            start_y = (height - new_height) // 2
-                            frame = frame[start_y:start_y+new_height, :]
-                        
-                        # 缩放到目标尺寸
-                        frame = cv2.resize(frame, (target_width, target_height))
-                        
-                        # 保存为JPG格式
-                        cv2.imwrite(thumbnail_path, frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
-                        self.logger.info(f"从视频中提取缩略图成功: {thumbnail_path}")
-                    cap.release()
-                except Exception as e:
-                    self.logger.error(f"从视频中提取缩略图失败: {str(e)}")
-                    # 尝试使用FFmpeg作为备选方案
-                    try:
-                        import subprocess
-                        cmd = [
-                            "ffmpeg", "-i", video.file_path, 
-                            "-ss", "00:00:05", "-vframes", "1", 
-                            "-vf", "scale=480:270", 
-                            "-y", thumbnail_path
-                        ]
-                        subprocess.run(cmd, check=True)
-                        self.logger.info(f"使用FFmpeg生成缩略图成功: {thumbnail_path}")
-                    except Exception as ffmpeg_error:
-                        self.logger.error(f"FFmpeg生成缩略图失败: {str(ffmpeg_error)}")
-            
-            # 设置缩略图路径（如果文件存在）
-            if os.path.exists(thumbnail_path):
+            self.logger.info(f"重试处理视频: {hash_name}")
+            self._run_pipeline(video, self.db, context)
+            self.db.refresh(video)
+            return video
+        except Exception as e:
+            self.logger.error(f"重试处理失败: {str(e)}")
+            self.db.rollback()
+            raise
+        finally:
+            self.db.close()
+    
+    def fetch_video(self, hash_name: str, context: Optional[JobContext] = None) -> Optional[Video]:
+        """为只下载了音频的视频补充下载视频文件"""
+        try:
+            video = self.get_video_by_hash(hash_name)
+            if not video:
+                raise Exception(f"视频不存在: {hash_name}")
+            if self.check_file_exists(video.file_path):
+                return video
+            
+            self.logger.info(f"补充下载视频: {hash_name}")
+            original_dir = os.path.join(video.folder_hash_name_path, "original")
+            if context is not None:
+                context.report("fetch_video", 0.0)
+            priority = context.priority if context is not None else 0
+            download_result = download_video(video.url, output_dir=original_dir, priority=priority)
+            if not download_result or not os.path.exists(download_result['video_path']):
+                raise Exception("视频下载失败")
+            video.file_path = download_result['video_path']
+            blob_store.store(video.file_path, hash_name)
+            StageStore(hash_name).mark_complete("download", [video.file_path])
+            
+            # 记录视频的媒体信息；还没有缩略图且下载器没有提供时，同一次调用中从视频提取
+            thumbnail_path = None
+            if not self.check_file_exists(video.pic_thumb_path):
+                thumbnail_path = self._convert_downloaded_thumbnail(download_result.get('thumbnail_path'), original_dir)
+            prepared = prepare_media(video.file_path, original_dir, audio=False,
+                                     thumbnail=not self.check_file_exists(video.pic_thumb_path) and thumbnail_path is None)
+            variants = prepared['thumbnails'] or (thumbnails_from_image(thumbnail_path, original_dir) if thumbnail_path else [])
+            if variants:
+                video.thumbnail_variants = json.dumps(variants, ensure_ascii=False)
+            thumbnail_path = thumbnail_path or prepared['thumbnail_path']
+            if thumbnail_path:
                 video.pic_thumb_path = thumbnail_path
-            else:
-                self.logger.warning(f"无法生成缩略图，将使用默认图片")
+            video.duration = video.duration or prepared['info']['duration']
+            video.media_info = json.dumps(prepared['info'], ensure_ascii=False)
+            if context is not None:
+                context.report("sprites", 0.0)
+            video.sprite_index_path = generate_sprites(video.file_path, original_dir, info=prepared['info'])
+            if settings.HLS_ENABLED:
+                if context is not None:
+                    context.report("hls", 0.0)
+                video.hls_playlist_path = package_hls(video.file_path, original_dir, info=prepared['info'])
+            self.db.commit()
+            self.db.refresh(video)
+            return video
+        except Exception as e:
+            self.logger.error(f"补充下载视频失败: {str(e)}")
+            self.db.rollback()
+            raise
+        finally:
+            self.db.close()
+    
+    def _run_pipeline(self, video: Video, session, context: Optional[JobContext] = None) -> None:
+        """为已保存的视频记录执行处理流程，每个阶段完成后提交"""
+        folder_path = video.folder_hash_name_path
+        original_dir = os.path.join(folder_path, "original")
+        subtitles_dir = os.path.join(folder_path, "subtitles")
+        docs_dir = os.path.join(folder_path, "docs")
+        
+        os.makedirs(original_dir, exist_ok=True)
+        os.makedirs(subtitles_dir, exist_ok=True)
+        os.makedirs(docs_dir, exist_ok=True)
+        
+        # 持有视频目录的共享锁，音频压缩不会在处理过程中替换音频文件；
+        # 等待锁期间记录可能已被修改，获取锁后重新读取
+        with video_lock(folder_path):
+            session.refresh(video)
+            # 阶段在线程池中执行，只读写普通字典；由调用线程把结果写回记录并提交，
+            # 避免多个线程同时使用同一个数据库会话
+            fields = {column: getattr(video, column) for column in PIPELINE_FIELDS}
+        
+            def apply_fields(stage: str) -> None:
+                for column, value in list(fields.items()):
+                    setattr(video, column, value)
+                session.commit()
+        
+            # 本地上传的视频没有下载阶段
+            download_url = None if video.url == "local_upload" else video.url
+            pipeline = self._build_pipeline(video.hash_name, fields, original_dir, subtitles_dir, docs_dir,
+                                            download_url=download_url,
+                                            priority=context.priority if context is not None else 0,
+                                            mode=video.process_mode or PROCESS_FULL)
+            pipeline.run(context, on_stage_done=apply_fields)
+            apply_fields("completed")
+            
+    def _build_pipeline(self, hash_name: str, fields: dict, original_dir: str, subtitles_dir: str,
+                        docs_dir: str, download_url: Optional[str] = None, priority: int = 0,
+                        mode: str = PROCESS_FULL) -> Pipeline:
+        """
+        构建视频处理阶段 DAG:
+        
+            download -> media_prep -> transcribe -> translate -> ass
+                                 -> sprites                   -> md
+                                 -> hls
+        
+        media_prep 一次 ffmpeg 调用同时提取音频和缩略图，并记录媒体信息；
+        sprites 生成拖动预览的雪碧图，hls 把视频打包为 HLS 分片 (仅 HLS_ENABLED 时)，都与转写并行；
+        ASS 与 MD 生成并行。没有 download_url 时
+        (本地上传) 直接从已有的 file_path 开始。各阶段的结果写入 fields。
+        PROCESS_AUDIO_FIRST 模式下 download 替换为只下载音频的 download_audio，
+        音频提取的输入改为下载的音频文件。
+        
+        每个阶段都声明了固定的产物路径，完成后记录校验和，
+        重试时跳过已完成的阶段。
+        """
+        downloaded = {}
+        
+        # 各阶段的固定产物路径
+        video_path = os.path.join(original_dir, "video.mp4")
+        audio_path = os.path.join(original_dir, audio_file_name())
+        whisperx_json = os.path.join(subtitles_dir, "whisperx.json")
+        zh_json = os.path.join(subtitles_dir, "zh.json")
+        ass_path = os.path.join(subtitles_dir, "bilingual.ass")
+        en_md = os.path.join(docs_dir, "en.md")
+        zh_md = os.path.join(docs_dir, "zh.md")
+        sprites_json = os.path.join(original_dir, "sprites", "sprites.json")
+        
+        def download():
+            download_result = download_video(download_url, output_dir=original_dir, priority=priority)
+            if not download_result:
+                raise Exception("视频下载失败")
+            fields['file_path'] = download_result['video_path']
+            fields['title'] = download_result['title']
+            downloaded['thumbnail_path'] = download_result.get('thumbnail_path')
+            downloaded['duration'] = download_result.get('duration')
             
             # 确保视频文件已下载
-            if not os.path.exists(video.file_path):
+            if not os.path.exists(fields['file_path']):
                 raise Exception("视频文件未创建成功")
-            
-            # 生成WAV
-            wav_path = convert_video_to_wav(video.file_path, output_dir=original_dir)
-            if not wav_path or not os.path.exists(wav_path):
-                raise Exception("WAV文件生成失败")
-            video.wav_path = wav_path
-            
-            # 生成字幕
-            json_result = self.transcribe_audio(wav_path, subtitles_dir)
+            blob_store.store(fields['file_path'], hash_name)
+        
+        def restore_download():
+            fields['file_path'] = video_path
+            downloaded['thumbnail_path'] = os.path.join(original_dir, "thumbnail.webp")
+        
+        def download_audio_only():
+            download_result = download_audio(download_url, output_dir=original_dir, priority=priority)
+            if not download_result or not download_result['audio_path']:
+                raise Exception("音频下载失败")
+            fields['title'] = download_result['title']
+            downloaded['audio_path'] = download_result['audio_path']
+            downloaded['thumbnail_path'] = download_result.get('thumbnail_path')
+            downloaded['duration'] = download_result.get('duration')
+            blob_store.store(downloaded['audio_path'], hash_name)
+        
+        def restore_download_audio():
+            downloaded['audio_path'] = find_audio_source(original_dir)
+            downloaded['thumbnail_path'] = os.path.join(original_dir, "thumbnail.webp")
+        
+        def audio_source_artifacts():
+            audio_source = find_audio_source(original_dir)
+            return [audio_source] if audio_source else [os.path.join(original_dir, "audio_source")]
+        
+        def media_prep():
+            source = downloaded.get('audio_path') or fields['file_path']
+            # 已有的音频文件可能与其他视频共享数据，先解除链接再重新生成
+            blob_store.detach(audio_path)
+            # 优先使用下载器提供的缩略图 (各尺寸由图片缩放)，没有时在同一次 ffmpeg 调用中从视频截取
+            thumbnail_path = self._convert_downloaded_thumbnail(downloaded.get('thumbnail_path'), original_dir)
+            result = prepare_media(source, original_dir, thumbnail=thumbnail_path is None)
+            variants = result['thumbnails'] or (thumbnails_from_image(thumbnail_path, original_dir) if thumbnail_path else [])
+            fields['thumbnail_variants'] = json.dumps(variants, ensure_ascii=False) if variants else None
+            if not result['audio_path']:
+                raise Exception("音频文件生成失败")
+            blob_store.store(result['audio_path'], hash_name)
+            fields['wav_path'] = result['audio_path']
+            fields['duration'] = result['info']['duration'] or downloaded.get('duration')
+            fields['media_info'] = json.dumps(result['info'], ensure_ascii=False)
+            thumbnail_path = thumbnail_path or result['thumbnail_path']
+            if thumbnail_path:
+                fields['pic_thumb_path'] = thumbnail_path
+            else:
+                self.logger.warning(f"无法生成缩略图，将使用默认图片")
+        
+        def restore_media_prep():
+            fields['wav_path'] = audio_path
+            variants = thumbnail_variants(original_dir)
+            if variants:
+                fields['thumbnail_variants'] = json.dumps(variants, ensure_ascii=False)
+            thumbnail_path = os.path.join(original_dir, "thumbnail.jpg")
+            if os.path.exists(thumbnail_path):
+                fields['pic_thumb_path'] = thumbnail_path
+            elif variants:
+                fields['pic_thumb_path'] = [v for v in variants if v['format'] == 'jpg'][-1]['path']
+        
+        def sprites():
+            media_info = json.loads(fields['media_info'] or "null")
+            fields['sprite_index_path'] = generate_sprites(fields['file_path'], original_dir, info=media_info)
+            if fields['sprite_index_path'] is None:
+                self.logger.info(f"没有视频流，跳过预览图: {hash_name}")
+        
+        def restore_sprites():
+            fields['sprite_index_path'] = sprites_json if os.path.exists(sprites_json) else None
+        
+        def sprites_artifacts():
+            # 没有视频流 (如上传的音频文件) 时没有产物
+            media_info = json.loads(fields['media_info'] or "null") or {}
+            return [sprites_json] if media_info.get('video') else []
+        
+        def hls():
+            media_info = json.loads(fields['media_info'] or "null")
+            fields['hls_playlist_path'] = package_hls(fields['file_path'], original_dir, info=media_info)
+            if fields['hls_playlist_path'] is None:
+                self.logger.info(f"没有视频流，跳过 HLS 打包: {hash_name}")
+        
+        def hls_artifacts():
+            # 打包目录随视频内容变化，产物路径取自记录；没有视频流时没有产物
+            return [fields['hls_playlist_path']] if fields.get('hls_playlist_path') else []
+        
+        def transcribe():
+            json_result = self.transcribe_audio(fields['wav_path'], subtitles_dir)
             if not json_result or not os.path.exists(json_result):
                 raise Exception("字幕生成失败")
-            video.subtitle_en_json_path = json_result
-            
-            # 翻译字幕
-            zh_json = self.translate_json_file(json_result, subtitles_dir)
-            if not zh_json or not os.path.exists(zh_json):
+            fields['subtitle_en_json_path'] = json_result
+        
+        def restore_transcribe():
+            fields['subtitle_en_json_path'] = whisperx_json
+        
+        def translate():
+            result = self.translate_json_file(fields['subtitle_en_json_path'], subtitles_dir)
+            if not result or not os.path.exists(result):
                 raise Exception("字幕翻译失败")
-            video.subtitle_zh_cn_json_path = zh_json
-            
-            # 生成ASS字幕
-            ass_path = os.path.join(subtitles_dir, "bilingual.ass")
-            self.generate_ass_subtitle(zh_json, ass_path)
+            fields['subtitle_zh_cn_json_path'] = result
+        
+        def restore_translate():
+            fields['subtitle_zh_cn_json_path'] = zh_json
+        
+        def ass():
+            self.generate_ass_subtitle(fields['subtitle_zh_cn_json_path'], ass_path)
             if not os.path.exists(ass_path):
                 raise Exception("ASS字幕生成失败")
-            video.subtitle_en_ass_path = ass_path
-            
-            # 生成MD文件
+            fields['subtitle_en_ass_path'] = ass_path
+        
+        def restore_ass():
+            fields['subtitle_en_ass_path'] = ass_path
+        
+        def md():
             self.generate_md_files(hash_name, docs_dir)
-            en_md = os.path.join(docs_dir, "en.md")
-            zh_md = os.path.join(docs_dir, "zh.md")
             if not os.path.exists(en_md) or not os.path.exists(zh_md):
                 raise Exception("MD文件生成失败")
-            video.subtitle_en_md_path = en_md
-            video.subtitle_zh_cn_md_path = zh_md
-            
-            # 所有文件都成功生成后，才保存到数据库
-            self.db.add(video)
-            self.db.commit()
-            
-            self.logger.info(f"视频处理完成: {video.hash_name}")
-            return video
-            
+            fields['subtitle_en_md_path'] = en_md
+            fields['subtitle_zh_cn_md_path'] = zh_md
+        
+        def restore_md():
+            fields['subtitle_en_md_path'] = en_md
+            fields['subtitle_zh_cn_md_path'] = zh_md
+        
+        audio_first = download_url and mode == PROCESS_AUDIO_FIRST
+        root = (["download_audio"] if audio_first else ["download"]) if download_url else []
+        stages = [
+            Stage("media_prep", media_prep, deps=root, weight=0.05,
+                  artifacts=lambda: [audio_path], restore=restore_media_prep),
+            Stage("transcribe", transcribe, deps=["media_prep"], weight=0.35, resource=RESOURCE_TRANSCRIBE,
+                  artifacts=lambda: [whisperx_json], restore=restore_transcribe),
+            Stage("translate", translate, deps=["transcribe"], weight=0.25, resource=RESOURCE_TRANSLATE,
+                  artifacts=lambda: [zh_json], restore=restore_translate),
+            Stage("ass", ass, deps=["translate"], weight=0.05,
+                  artifacts=lambda: [ass_path], restore=restore_ass),
+            Stage("md", md, deps=["translate"], weight=0.05,
+                  artifacts=lambda: [en_md, zh_md], restore=restore_md),
+        ]
+        if not audio_first:
+            # 只下载音频时没有视频文件，预览图在补充下载视频后生成
+            stages.append(Stage("sprites", sprites, deps=["media_prep"], weight=0.03,
+                                artifacts=sprites_artifacts, restore=restore_sprites))
+            if settings.HLS_ENABLED:
+                stages.append(Stage("hls", hls, deps=["media_prep"], weight=0.03, artifacts=hls_artifacts))
+        if audio_first:
+            stages.insert(0, Stage("download_audio", download_audio_only, weight=0.1, resource=RESOURCE_DOWNLOAD,
+                                   artifacts=audio_source_artifacts, restore=restore_download_audio))
+        elif download_url:
+            stages.insert(0, Stage("download", download, weight=0.25, resource=RESOURCE_DOWNLOAD,
+                                   artifacts=lambda: [video_path], restore=restore_download))
+        return Pipeline(stages, store=StageStore(hash_name))
+    
+    def _convert_downloaded_thumbnail(self, downloaded_thumbnail: Optional[str],
+                                      original_dir: str) -> Optional[str]:
+        """把下载器提供的缩略图转换为统一的JPG缩略图，没有或转换失败时返回 None"""
+        if not downloaded_thumbnail or not os.path.exists(downloaded_thumbnail):
+            return None
+        thumbnail_path = os.path.join(original_dir, "thumbnail.jpg")
+        try:
+            img = Image.open(downloaded_thumbnail)
+            img = img.convert('RGB')  # 确保可以保存为JPG
+            img.save(thumbnail_path, "JPEG", quality=90)
+            self.logger.info(f"缩略图转换为JPG成功: {thumbnail_path}")
+            return thumbnail_path
         except Exception as e:
-            self.logger.error(f"处理失败: {str(e)}")
-            # 如果处理失败，清理已创建的文件
-            if 'folder_path' in locals() and os.path.exists(folder_path):
-                shutil.rmtree(folder_path)
-            self.db.rollback()
-            raise e
-        finally:
-            self.db.close()
+            self.logger.error(f"缩略图转换失败: {str(e)}")
+            return None
             
     def get_video_by_hash(self, hash_name: str) -> Optional[Video]:
         """通过hash获取视频信息"""
@@ -301,10 +582,13 @@ class VideoProcessor:
             with open(json_file, 'r', encoding='utf-8') as f:
                 json_data = json.load(f)
             
-            # 翻译每个片段
-            for segment in json_data['segments']:
+            # 翻译每个片段，片段之间检查任务是否已取消
+            segments = json_data['segments']
+            for index, segment in enumerate(segments):
+                check_cancelled()
                 translated_text = translate_text(segment['text'])
                 segment['translated_text'] = translated_text
+                report_progress(index + 1, len(segments), "segments")
             
             # 使用固定的输出文件名
             output_file = os.path.join(output_dir, "zh.json")
@@ -347,8 +631,30 @@ class VideoProcessor:
         return os.path.exists(file_path) if file_path else False
 
     def get_video_status(self, video: Video) -> str:
-        """获取视频处理状态"""
-        if not self.check_file_exists(video.file_path):
+        """
+        获取视频处理状态，先转写后补充视频的模式下视频文件不影响状态
+
+        未处理完成且最近一次处理任务失败时为 failed，错误信息由 get_processing_error 获取；
+        重试后任务重新排队，状态恢复为正在进行的阶段。
+        """
+        status = self._file_status(video)
+        if status != "completed" and self.get_processing_error(video.hash_name) is not None:
+            return "failed"
+        return status
+
+    def get_processing_error(self, hash_name: str) -> Optional[str]:
+        """最近一次处理任务失败时返回错误信息，否则返回 None"""
+        job = self.db.query(Job).filter(
+            Job.hash_name == hash_name,
+            Job.kind.in_(PROCESSING_JOB_KINDS)
+        ).order_by(Job.id.desc()).first()
+        if job is None or job.status != JOB_FAILED:
+            return None
+        return job.error or "处理失败"
+
+    def _file_status(self, video: Video) -> str:
+        """按已生成的文件判断进行到的阶段"""
+        if video.process_mode != PROCESS_AUDIO_FIRST and not self.check_file_exists(video.file_path):
             return "downloading"
         if not self.check_file_exists(video.wav_path):
             return "converting"
@@ -362,13 +668,14 @@ class VideoProcessor:
             return "generating_document"
         return "completed"
 
-    def process_local_video(self, file_path, title):
+    def process_local_video(self, file_path, title, digest=None):
         """
         处理本地视频文件
         
         Args:
-            file_path: 本地视频文件路径
+            file_path: 本地视频文件路径 (上传的临时文件，会被移动到视频目录)
             title: 视频标题
+            digest: 上传时计算的文件 SHA-256，相同内容的视频文件只保存一份
         
         Returns:
             Video: 处理后的视频数据库对象
@@ -381,10 +688,11 @@ class VideoProcessor:
             folder_hash_name_path = os.path.join("data", hash_name)
             os.makedirs(folder_hash_name_path, exist_ok=True)
             
-            # 复制视频文件到目标位置
+            # 移动视频文件到目标位置，纳入内容寻址存储
             video_filename = f"{hash_name}.mp4"
             target_video_path = os.path.join(folder_hash_name_path, video_filename)
-            shutil.copy(file_path, target_video_path)
+            shutil.move(file_path, target_video_path)
+            blob_store.store(target_video_path, hash_name, digest)
             
             # 创建数据库记录
             video = Video(
@@ -395,19 +703,12 @@ class VideoProcessor:
                 file_path=target_video_path
             )
             
-            # 保存到数据库
+            # 保存到数据库，后续处理（生成缩略图、提取音频、生成字幕等）由 upload 任务执行
             with self.get_db_session() as session:
                 session.add(video)
                 session.commit()
                 session.refresh(video)
             
-            # 异步处理视频（生成缩略图、提取音频、生成字幕等）
-            threading.Thread(
-                target=self._process_video_async,
-                args=(video.id, target_video_path),
-                daemon=True
-            ).start()
-            
             return video
         
         except Exception as e:
@@ -425,102 +726,6 @@ class VideoProcessor:
         # 使用时间戳和UUID组合生成唯一标识
         return f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
 
-    def _process_video_async(self, video_id, video_path):
-        """
-        异步处理上传的视频文件
-        
-        Args:
-            video_id: 视频数据库ID
-            video_path: 视频文件路径
-        """
-        try:
-            self.logger.info(f"开始异步处理视频: {video_id}")
-            
-            # 获取视频对象
-            with self.get_db_session() as session:
-                video = session.query(Video).filter(Video.id == video_id).first()
-                if not video:
-                    self.logger.error(f"找不到视频记录: {video_id}")
-                    return
-                    
-                # 创建子目录
-                folder_path = video.folder_hash_name_path
-                original_dir = os.path.join(folder_path, "original")
-                subtitles_dir = os.path.join(folder_path, "subtitles")
-                docs_dir = os.path.join(folder_path, "docs")
-                
-                os.makedirs(original_dir, exist_ok=True)
-                os.makedirs(subtitles_dir, exist_ok=True)
-                os.makedirs(docs_dir, exist_ok=True)
-                
-                # 生成缩略图 - 使用统一的JPG格式
-                thumbnail_path = os.path.join(original_dir, "thumbnail.jpg")
-                try:
-                    import cv2
-                    
-                    # 使用OpenCV提取视频帧作为缩略图
-                    cap = cv2.VideoCapture(video_path)
-                    cap.set(cv2.CAP_PROP_POS_FRAMES, 100)  # 获取第100帧作为缩略图
-                    success, frame = cap.read()
-                    if success:
-                        thumbnail_path = os.path.join(original_dir, "thumbnail.jpg")
-                        cv2.imwrite(thumbnail_path, frame)
-                        video.pic_thumb_path = thumbnail_path
-                        self.logger.info(f"缩略图生成成功: {thumbnail_path}")
-                    else:
-                        self.logger.error("无法从视频中提取帧")
-                    cap.release()
-                except Exception as e:
-                    self.logger.error(f"生成缩略图失败: {str(e)}")
-                    # 继续处理，不因缩略图失败而中断整个流程
-                
-                session.commit()
-                
-                # 生成WAV
-                wav_path = convert_video_to_wav(video_path, output_dir=original_dir)
-                if not wav_path or not os.path.exists(wav_path):
-                    raise Exception("WAV文件生成失败")
-                video.wav_path = wav_path
-                session.commit()
-                
-                # 生成字幕
-                json_result = self.transcribe_audio(wav_path, subtitles_dir)
-                if not json_result or not os.path.exists(json_result):
-                    raise Exception("字幕生成失败")
-                video.subtitle_en_json_path = json_result
-                session.commit()
-                
-                # 翻译字幕
-                zh_json = self.translate_json_file(json_result, subtitles_dir)
-                if not zh_json or not os.path.exists(zh_json):
-                    raise Exception("字幕翻译失败")
-                video.subtitle_zh_cn_json_path = zh_json
-                session.commit()
-                
-                # 生成ASS字幕
-                ass_path = os.path.join(subtitles_dir, "bilingual.ass")
-                self.generate_ass_subtitle(zh_json, ass_path)
-                if not os.path.exists(ass_path):
-                    raise Exception("ASS字幕生成失败")
-                video.subtitle_en_ass_path = ass_path
-                session.commit()
-                
-                # 生成MD文件
-                self.generate_md_files(video.hash_name, docs_dir)
-                en_md = os.path.join(docs_dir, "en.md")
-                zh_md = os.path.join(docs_dir, "zh.md")
-                if not os.path.exists(en_md) or not os.path.exists(zh_md):
-                    raise Exception("MD文件生成失败")
-                video.subtitle_en_md_path = en_md
-                video.subtitle_zh_cn_md_path = zh_md
-                session.commit()
-                
-                self.logger.info(f"视频异步处理完成: {video_id}")
-                
-        except Exception as e:
-            self.logger.error(f"视频异步处理失败: {str(e)}")
-            # 记录错误但不删除文件，保留已处理的部分 
-
     def _fix_thumbnail_path(self, video: Video) -> None:
         """尝试修复缩略图路径"""
         try:
@@ -544,86 +749,185 @@ class VideoProcessor:
         except Exception as e:
             self.logger.error(f"修复缩略图路径失败: {str(e)}")
 
-    def render_subtitle_to_video(self, hash_name: str) -> Optional[str]:
-        """将字幕渲染到视频中，生成带有硬编码字幕的新视频文件
+    def _source_video_path(self, video: Video) -> Optional[str]:
+        """原视频路径。旧版本渲染后会把 file_path 替换为 rendered/ 下的文件，此时回退到 original/video.mp4"""
+        rendered_dir = os.path.join(video.folder_hash_name_path, "rendered")
+        if video.file_path and os.path.dirname(os.path.normpath(video.file_path)) == os.path.normpath(rendered_dir):
+            original = os.path.join(video.folder_hash_name_path, "original", "video.mp4")
+            return original if os.path.exists(original) else None
+        return video.file_path if video.file_path and os.path.exists(video.file_path) else None
+    
+    def _find_ass_file(self, video: Video) -> Optional[str]:
+        """查找烧录使用的ASS字幕文件"""
+        if video.subtitle_en_ass_path and os.path.exists(video.subtitle_en_ass_path):
+            return video.subtitle_en_ass_path
+        # 尝试在字幕目录中查找
+        subtitles_dir = os.path.join(video.folder_hash_name_path, "subtitles")
+        for name in ["bilingual.ass", "en.ass", "zh.ass"]:
+            path = os.path.join(subtitles_dir, name)
+            if os.path.exists(path):
+                return path
+        return None
+    
+    def _render_plan(self, video: Video, mode: str, container: str) -> dict:
+        """确定渲染的输入文件、参数、缓存键和输出路径，缺少文件时抛出异常"""
+        source = self._source_video_path(video)
+        if not source:
+            raise Exception(f"视频文件不存在: {video.file_path}")
+            
+        ass_file = self._find_ass_file(video)
+        subtitle_json = next((path for path in (video.subtitle_zh_cn_json_path, video.subtitle_en_json_path)
+                              if path and os.path.exists(path)), None)
+        
+        if mode == RENDER_BURN:
+            if not ass_file:
+                raise Exception(f"未找到ASS字幕文件: {video.hash_name}")
+            subtitles = [ass_file]
+        else:
+            if not subtitle_json:
+                raise Exception(f"未找到字幕文件: {video.hash_name}")
+            subtitles = [subtitle_json] + ([ass_file] if container == "mkv" and ass_file else [])
+        
+        params = render_cache.render_params(mode, container)
+        key, source_digest, subtitle_digest = render_cache.render_key(source, subtitles, params)
+        output_dir = os.path.join(video.folder_hash_name_path, "rendered")
+        return {
+            "source": source,
+            "ass_file": ass_file,
+            "subtitle_json": subtitle_json,
+            "params": params,
+            "key": key,
+            "source_digest": source_digest,
+            "subtitle_digest": subtitle_digest,
+            "output_file": render_cache.output_path(output_dir, video.hash_name, key, params),
+        }
+    
+    def find_cached_render(self, hash_name: str, mode: str = RENDER_BURN,
+                           container: str = "mp4") -> Optional[RenderOutput]:
+        """原视频、字幕和渲染参数都没有变化时返回已有的渲染结果"""
+        video = self.get_video_by_hash(hash_name)
+        if not video:
+            return None
+        try:
+            plan = self._render_plan(video, mode, container)
+        except Exception:
+            return None
+        return render_cache.lookup(plan["key"])
+    
+    def preview_plan(self, hash_name: str, start: float, end: float) -> Optional[dict]:
+        """
+        确定预览片段的输入文件和缓存文件名，视频不存在时返回 None
+
+        Raises:
+            ValueError: 时间段超出视频时长
+            Exception: 缺少视频文件或ASS字幕
+        """
+        video = self.get_video_by_hash(hash_name)
+        if not video:
+            return None
+        source = self._source_video_path(video)
+        if not source:
+            raise Exception(f"视频文件不存在: {video.file_path}")
+        ass_file = self._find_ass_file(video)
+        if not ass_file:
+            raise Exception(f"未找到ASS字幕文件: {hash_name}")
+        info = json.loads(video.media_info) if video.media_info else None
+        if info and info.get("duration"):
+            if start >= info["duration"]:
+                raise ValueError(f"开始时间超出视频时长 ({info['duration']:.3f} 秒)")
+            end = min(end, info["duration"])
+        return {
+            "source": source,
+            "ass_file": ass_file,
+            "start": start,
+            "end": end,
+            "key": render_cache.preview_key(hash_name, source, ass_file, start, end),
+        }
+    
+    def render_preview(self, plan: dict) -> str:
+        """
+        返回预览片段路径: 已缓存时直接返回，否则渲染 plan 指定的时间段 (几秒内完成)
+
+        片段保存在独立的预览缓存中，不写入视频记录，也不占用渲染任务的槽位。
+        """
+        def render(tmp: str) -> None:
+            self.logger.info(f"渲染预览片段: {plan['source']} [{plan['start']:.3f}, {plan['end']:.3f})")
+            render_preview_clip(plan["source"], plan["ass_file"], plan["start"], plan["end"], tmp)
+        
+        return render_cache.preview_cache.get_or_create(plan["key"], render)
+    
+    def render_subtitle_to_video(self, hash_name: str, context: Optional[JobContext] = None,
+                                 mode: str = RENDER_BURN, container: str = "mp4") -> RenderOutput:
+        """将字幕渲染到视频中
+        
+        由后台 render 任务执行:
+        - RENDER_BURN: 烧录硬字幕，视频按关键帧切分后并行编码，再无损拼接 (见 render_engine)。
+          占用 RESOURCE_RENDER 槽位，同时进行的渲染数受 RENDER_CONCURRENCY 限制
+        - RENDER_MUX: 视频和音频直接复制，添加中英文软字幕轨道，几秒内完成，不占用渲染槽位
+        
+        渲染结果按 (原视频内容, 字幕内容, 渲染参数) 缓存在 rendered/ 下，输入和参数都没有变化时
+        直接返回已有结果。file_path 始终保留原视频，最近一次的结果记录在 rendered_path / soft_subtitle_path。
         
         Args:
             hash_name: 视频的哈希名称
+            context: 任务上下文，用于上报进度和响应取消
+            mode: 渲染方式，RENDER_BURN 或 RENDER_MUX
+            container: 软字幕封装的容器格式，mp4 或 mkv
             
         Returns:
-            Optional[str]: 成功时返回新视频的路径，失败时返回None
+            RenderOutput: 渲染结果记录
         """
         try:
             # 获取视频信息
             video = self.get_video_by_hash(hash_name)
             if not video:
-                self.logger.error(f"视频不存在: {hash_name}")
-                return None
-                
-            # 检查必要的文件是否存在
-            if not video.file_path or not os.path.exists(video.file_path):
-                self.logger.error(f"视频文件不存在: {video.file_path}")
-                return None
-                
-            # 检查字幕文件
-            subtitles_dir = os.path.join(video.folder_hash_name_path, "subtitles")
-            if not os.path.exists(subtitles_dir):
-                self.logger.error(f"字幕目录不存在: {subtitles_dir}")
-                return None
-                
-            # 查找ASS字幕文件
-            ass_file = None
-            if video.subtitle_en_ass_path and os.path.exists(video.subtitle_en_ass_path):
-                ass_file = video.subtitle_en_ass_path
+                raise Exception(f"视频不存在: {hash_name}")
+            
+            plan = self._render_plan(video, mode, container)
+            if video.file_path != plan["source"]:
+                # 修复旧版本渲染后被替换的 file_path
+                self.logger.info(f"恢复原视频路径: {video.file_path} -> {plan['source']}")
+                video.file_path = plan["source"]
+            
+            output = render_cache.lookup(plan["key"])
+            if output is not None:
+                self.logger.info(f"使用已有的渲染结果: {output.path}")
             else:
-                # 尝试在字幕目录中查找
-                possible_names = ["bilingual.ass", "en.ass", "zh.ass"]
-                for name in possible_names:
-                    path = os.path.join(subtitles_dir, name)
-                    if os.path.exists(path):
-                        ass_file = path
-                        break
-                        
-            if not ass_file:
-                self.logger.error(f"未找到ASS字幕文件: {hash_name}")
-                return None
+                output_file = plan["output_file"]
+                os.makedirs(os.path.dirname(output_file), exist_ok=True)
+                info = json.loads(video.media_info) if video.media_info else None
+                
+                def render():
+                    # 同名文件可能与其他视频共享数据，先解除链接
+                    blob_store.detach(output_file)
+                    if mode == RENDER_MUX:
+                        mux_soft_subtitles(plan["source"], output_file, plan["subtitle_json"],
+                                           ass_file=plan["ass_file"], container=container, info=info)
+                    else:
+                        render_burn_in(plan["source"], plan["ass_file"], output_file, info=info)
+                    blob_store.store(output_file, hash_name)
                 
-            # 创建输出目录
-            output_dir = os.path.join(video.folder_hash_name_path, "rendered")
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # 设置输出文件路径
-            output_file = os.path.join(output_dir, f"{hash_name}_with_subtitles.mp4")
-            
-            # 使用FFmpeg渲染字幕到视频
-            cmd = [
-                "ffmpeg",
-                "-i", video.file_path,
-                "-vf", f"ass={ass_file}",
-                "-c:v", "libx264",
-                "-crf", "18",  # 视频质量，值越小质量越高
-                "-c:a", "aac",
-                "-b:a", "192k",
-                "-y",  # 覆盖已存在的文件
-                output_file
-            ]
-            
-            self.logger.info(f"开始渲染字幕到视频: {hash_name}")
-            self.logger.info(f"命令: {' '.join(cmd)}")
-            
-            # 执行命令
-            subprocess.run(cmd, check=True, capture_output=True)
-            
-            if os.path.exists(output_file):
+                if mode == RENDER_MUX:
+                    self.logger.info(f"开始封装软字幕: {hash_name} ({container})")
+                    Pipeline([Stage("mux", render)]).run(context)
+                else:
+                    self.logger.info(f"开始渲染字幕到视频: {hash_name}")
+                    Pipeline([Stage("render", render, resource=RESOURCE_RENDER)]).run(context)
+                render_cache.record(plan["key"], hash_name, plan["params"], plan["source_digest"],
+                                    plan["subtitle_digest"], output_file)
+                output = render_cache.lookup(plan["key"])
                 self.logger.info(f"字幕渲染成功: {output_file}")
-                return output_file
+            
+            if mode == RENDER_MUX:
+                video.soft_subtitle_path = output.path
             else:
-                self.logger.error(f"字幕渲染失败，输出文件不存在: {output_file}")
-                return None
+                video.rendered_path = output.path
+            self.db.commit()
+            return output
                 
-        except subprocess.CalledProcessError as e:
-            self.logger.error(f"字幕渲染失败 (FFmpeg错误): {e.stderr.decode() if e.stderr else str(e)}")
-            return None
         except Exception as e:
             self.logger.error(f"字幕渲染失败: {str(e)}")
-            return None 
\ No newline at end of file
+            self.db.rollback()
+            raise
+        finally:
+            self.db.close() 
\ No newline at end of file
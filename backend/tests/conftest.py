@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+
+# 测试使用临时 SQLite 数据库，需在导入 config 之前设置
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """每个测试使用空的数据库"""
+    from models.database import Base, SessionLocal, engine
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,71 @@
+import os
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+from config import settings
+from models.database import Video
+from services import audio_compaction
+from services.job_queue import JobQueue
+from utils.file_lock import LockBusy, video_lock
+
+
+@pytest.fixture
+def video(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "BLOB_STORE_ENABLED", False)
+    monkeypatch.setattr(settings, "AUDIO_STORAGE_FORMAT", "flac")
+    wav_path = tmp_path / "original" / "audio.wav"
+    wav_path.parent.mkdir()
+    wav_path.write_bytes(b"R" * 1000)
+    db.add(Video(title="t", url="https://example.com/v/1", hash_name="h1",
+                 folder_hash_name_path=str(tmp_path), wav_path=str(wav_path)))
+    db.commit()
+    return str(tmp_path), str(wav_path)
+
+
+def _wav_path(db):
+    db.expire_all()
+    return db.query(Video.wav_path).filter(Video.hash_name == "h1").scalar()
+
+
+def test_shared_locks_exclude_exclusive(tmp_path):
+    with video_lock(str(tmp_path)), video_lock(str(tmp_path)):
+        with pytest.raises(LockBusy):
+            with video_lock(str(tmp_path), exclusive=True, wait=False):
+                pass
+    with video_lock(str(tmp_path), exclusive=True, wait=False):
+        pass
+
+
+def test_compaction_skipped_while_pipeline_holds_lock(db, video, monkeypatch):
+    folder, wav_path = video
+    monkeypatch.setattr(audio_compaction, "compress_audio", lambda src, dest: open(dest, "wb").write(b"F"))
+    with video_lock(folder):
+        result = audio_compaction.compact_video("h1")
+    assert result["status"] == "skipped"
+    assert _wav_path(db) == wav_path and os.path.exists(wav_path)
+
+
+def test_compaction_keeps_wav_when_job_appears(db, video, monkeypatch):
+    """转换期间有新任务时不切换 wav_path，也不删除 WAV"""
+    folder, wav_path = video
+    queue = JobQueue()
+
+    def compress(src, dest):
+        open(dest, "wb").write(b"F")
+        queue.submit("process", url="https://example.com/v/1", hash_name="h1")
+
+    monkeypatch.setattr(audio_compaction, "compress_audio", compress)
+    result = audio_compaction.compact_video("h1", queue)
+    assert result["status"] == "skipped"
+    assert _wav_path(db) == wav_path and os.path.exists(wav_path)
+    assert not os.path.exists(os.path.join(folder, "original", "audio.flac"))
+
+
+def test_compaction_replaces_wav(db, video, monkeypatch):
+    folder, wav_path = video
+    monkeypatch.setattr(audio_compaction, "compress_audio", lambda src, dest: open(dest, "wb").write(b"F"))
+    result = audio_compaction.compact_video("h1")
+    assert result["status"] == "compacted"
+    assert _wav_path(db) == os.path.join(folder, "original", "audio.flac")
+    assert not os.path.exists(wav_path)
@@ -0,0 +1,52 @@
+import threading
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+from download import _ProgressHook
+from services.download_scheduler import download_metrics
+from utils.cancellation import CancellationToken, JobCancelled, set_current_token
+from utils.progress import set_progress_callback
+
+
+def _call_in_thread(hook, event):
+    """在没有取消标记和进度回调的线程中调用，模拟 yt-dlp 的分片下载线程"""
+    errors = []
+
+    def run():
+        try:
+            hook(event)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    return errors
+
+
+@pytest.fixture
+def task_context():
+    token = CancellationToken()
+    reports = []
+    set_current_token(token)
+    set_progress_callback(lambda done, total=None, unit=None, rate=None: reports.append((done, total, unit, rate)))
+    yield token, reports
+    set_progress_callback(None)
+    set_current_token(None)
+
+
+def test_hook_reports_progress_from_fragment_thread(task_context):
+    _, reports = task_context
+    hook = _ProgressHook(download_metrics.start("https://example.com/v.m3u8"))
+    event = {"status": "downloading", "downloaded_bytes": 100, "total_bytes_estimate": 400, "speed": 50.0}
+    assert _call_in_thread(hook, event) == []
+    assert reports == [(100, 400, "bytes", 50.0)]
+
+
+def test_hook_cancels_from_fragment_thread(task_context):
+    token, _ = task_context
+    hook = _ProgressHook(download_metrics.start("https://example.com/v.m3u8"))
+    token.cancel()
+    errors = _call_in_thread(hook, {"status": "downloading", "downloaded_bytes": 1})
+    assert len(errors) == 1 and isinstance(errors[0], JobCancelled)
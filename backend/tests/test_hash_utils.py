@@ -0,0 +1,35 @@
+import hashlib
+from utils.hash_utils import generate_hash_name, legacy_hash_name
+
+# URL 规范化之前创建的记录使用的 hash，修改会导致已有视频找不到并被重新下载
+LEGACY_TWITTER_URL = "https://twitter.com/NASA/status/1700000000000000000"
+LEGACY_TWITTER_HASH = "63e57c19530074c9f484c6de7ded0092"
+LEGACY_XIAOYUZHOU_URL = "https://xiaoyuzhoufm.com/episode/64a1b2c3d4e5f6a7b8c9d0e1"
+LEGACY_XIAOYUZHOU_HASH = "4b7d629c3c60624fbdbccac01bba714c"
+YOUTUBE_HASH = "1b4237f476826986da63022a76c35bb1"  # md5("dQw4w9WgXcQ")
+
+
+def test_legacy_hash_of_existing_twitter_url_is_pinned():
+    assert legacy_hash_name(LEGACY_TWITTER_URL) == LEGACY_TWITTER_HASH
+    assert legacy_hash_name(LEGACY_XIAOYUZHOU_URL) == LEGACY_XIAOYUZHOU_HASH
+
+
+def test_twitter_links_share_canonical_hash():
+    canonical = hashlib.md5(b"https://x.com/i/status/1700000000000000000").hexdigest()
+    for url in (
+        LEGACY_TWITTER_URL,
+        "https://x.com/NASA/status/1700000000000000000?s=20",
+        "https://mobile.twitter.com/i/web/status/1700000000000000000",
+    ):
+        assert generate_hash_name(url) == canonical
+
+
+def test_youtube_hash_unchanged_by_canonicalization():
+    for url in (
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PL123&t=42",
+        "https://youtu.be/dQw4w9WgXcQ?si=abc",
+        "https://www.youtube.com/shorts/dQw4w9WgXcQ",
+    ):
+        assert legacy_hash_name(url) == YOUTUBE_HASH
+        assert generate_hash_name(url) == YOUTUBE_HASH
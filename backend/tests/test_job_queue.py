@@ -0,0 +1,65 @@
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+from config import settings
+from services.job_queue import JobQueue, JOB_KIND_IMPORT, PRIORITY_BULK
+
+
+def _claim_all(queue, worker_id="w"):
+    jobs = []
+    while True:
+        job = queue.claim(worker_id)
+        if job is None:
+            return jobs
+        jobs.append(job)
+
+
+def test_import_jobs_do_not_block_their_own_batch(db, monkeypatch):
+    """一个提交者同时发起多个导入时，导入任务不能占满其执行名额，导入提交的任务仍能被认领"""
+    monkeypatch.setattr(settings, "MAX_RUNNING_PER_SUBMITTER", 4)
+    monkeypatch.setattr(settings, "BULK_MAX_RUNNING", 4)
+    monkeypatch.setattr(settings, "IMPORT_MAX_RUNNING", 2)
+    queue = JobQueue()
+    for index in range(4):
+        queue.submit(JOB_KIND_IMPORT, payload={"batch_id": f"b{index}"}, submitter="alice")
+    queue.submit_many("process", [f"https://example.com/v/{index}" for index in range(6)],
+                      batch_id="b0", priority=PRIORITY_BULK, submitter="alice")
+
+    claimed = _claim_all(queue)
+    kinds = [job.kind for job in claimed]
+    assert kinds.count(JOB_KIND_IMPORT) == 2
+    assert kinds.count("process") == 4
+
+
+def test_running_imports_are_limited(db, monkeypatch):
+    monkeypatch.setattr(settings, "IMPORT_MAX_RUNNING", 1)
+    queue = JobQueue()
+    for index in range(3):
+        queue.submit(JOB_KIND_IMPORT, payload={"batch_id": f"b{index}"}, submitter=f"user{index}")
+    assert len(_claim_all(queue)) == 1
+
+
+def test_submit_many_uses_resolved_hash_names(db, monkeypatch):
+    """调用方传入已解析的 hash_name 时不再重复解析 URL"""
+    import services.job_queue as job_queue
+
+    def fail(*args, **kwargs):
+        raise AssertionError("URL 不应重复解析")
+
+    monkeypatch.setattr(job_queue, "resolve", fail)
+    hash_names = {"https://example.com/v/1": "h1", "https://example.com/v/2": "h2"}
+    jobs = JobQueue().submit_many("process", list(hash_names), batch_id="b", hash_names=hash_names)
+    assert [job.hash_name for job in jobs] == ["h1", "h2"]
+
+
+def test_cancelling_jobs_count_toward_admission(db, monkeypatch):
+    """取消中的任务停止前仍占用执行名额"""
+    monkeypatch.setattr(settings, "MAX_RUNNING_PER_SUBMITTER", 1)
+    queue = JobQueue()
+    first = queue.submit("process", url="https://example.com/v/1", submitter="alice")
+    queue.submit("process", url="https://example.com/v/2", submitter="alice")
+    assert queue.claim("w").id == first.id
+    queue.cancel(first.id)
+    assert queue.get(first.id).status == "cancelling"
+    assert queue.claim("w") is None
@@ -0,0 +1,46 @@
+import threading
+import time
+import pytest
+
+from services.resource_limits import PrioritySemaphore
+from utils.cancellation import CancellationToken, JobCancelled, set_current_token
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    semaphore = PrioritySemaphore(1)
+    semaphore.acquire()
+    token = CancellationToken()
+    result = {}
+
+    def wait_for_slot():
+        set_current_token(token)
+        try:
+            semaphore.acquire(priority=10)
+            result["acquired"] = True
+        except JobCancelled:
+            result["cancelled"] = True
+        finally:
+            set_current_token(None)
+
+    thread = threading.Thread(target=wait_for_slot)
+    thread.start()
+    time.sleep(0.1)
+    token.cancel()
+    thread.join(timeout=2)
+    assert not thread.is_alive()
+    assert result == {"cancelled": True}
+
+    # 被取消的等待者已移出队列，释放后其他等待者可以获得槽位
+    semaphore.release()
+    acquired = threading.Event()
+    threading.Thread(target=lambda: (semaphore.acquire(), acquired.set())).start()
+    assert acquired.wait(timeout=2)
+
+
+def test_acquire_outside_task_waits_without_token():
+    semaphore = PrioritySemaphore(1)
+    semaphore.acquire()
+    threading.Timer(0.1, semaphore.release).start()
+    started = time.time()
+    semaphore.acquire()
+    assert time.time() - started >= 0.05
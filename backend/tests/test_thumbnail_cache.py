@@ -0,0 +1,16 @@
+from services.thumbnail_cache import thumbnail_version
+
+
+def test_thumbnail_version_changes_when_regenerated(tmp_path):
+    path = tmp_path / "thumb_480.jpg"
+    path.write_bytes(b"a")
+    variants = [{"width": 480, "height": 270, "format": "jpg", "path": str(path)}]
+    version = thumbnail_version(variants, None)
+    assert version and version == thumbnail_version(variants, None)
+    path.write_bytes(b"bb")
+    assert thumbnail_version(variants, None) != version
+
+
+def test_thumbnail_version_without_thumbnails(tmp_path):
+    assert thumbnail_version([], None) is None
+    assert thumbnail_version([], str(tmp_path / "missing.jpg")) is None
@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+from models.database import Video
+from services.url_resolver import resolve
+from utils.hash_utils import generate_hash_name
+from test_hash_utils import LEGACY_TWITTER_URL, LEGACY_TWITTER_HASH
+
+
+def _add_video(db, url, hash_name):
+    db.add(Video(title="t", url=url, hash_name=hash_name, folder_hash_name_path=f"data/{hash_name}"))
+    db.commit()
+
+
+def test_existing_twitter_video_keeps_legacy_hash(db):
+    _add_video(db, LEGACY_TWITTER_URL, LEGACY_TWITTER_HASH)
+    assert db.query(Video.source_key).scalar() == "twitter:1700000000000000000"
+    assert resolve(LEGACY_TWITTER_URL, probe=False).hash_name == LEGACY_TWITTER_HASH
+    # 同一视频的其他链接形式按 (站点, 视频 ID) 找到旧记录
+    assert resolve("https://x.com/i/status/1700000000000000000?s=20", probe=False).hash_name == LEGACY_TWITTER_HASH
+
+
+def test_new_twitter_video_uses_canonical_hash(db):
+    resolved = resolve(LEGACY_TWITTER_URL, probe=False)
+    assert resolved.url == "https://x.com/i/status/1700000000000000000"
+    assert resolved.hash_name == generate_hash_name(resolved.url)
+
+
+def test_canonical_record_preferred_over_legacy(db):
+    canonical_hash = generate_hash_name(LEGACY_TWITTER_URL)
+    _add_video(db, "https://x.com/i/status/1700000000000000000", canonical_hash)
+    assert resolve("https://twitter.com/someone/status/1700000000000000000", probe=False).hash_name == canonical_hash
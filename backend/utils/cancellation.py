@@ -0,0 +1,81 @@
+import subprocess
+import threading
+import time
+from typing import Optional, Set
+
+
+class JobCancelled(Exception):
+    """任务已被取消"""
+
+
+class CancellationToken:
+    """任务取消标记，同时记录任务启动的子进程以便取消时终止"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._processes: Set[subprocess.Popen] = set()
+
+    def cancel(self) -> None:
+        """标记取消并终止所有登记的子进程"""
+        self._event.set()
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            try:
+                process.kill()
+            except Exception:
+                pass
+
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        """等待至多 timeout 秒，期间取消时立即返回 True"""
+        return self._event.wait(timeout)
+
+    def check(self) -> None:
+        """已取消时抛出 JobCancelled，供长流程在检查点调用"""
+        if self._event.is_set():
+            raise JobCancelled("任务已取消")
+
+    def register_process(self, process: subprocess.Popen) -> None:
+        with self._lock:
+            self._processes.add(process)
+        # 登记前已经取消的情况
+        if self._event.is_set():
+            process.kill()
+
+    def unregister_process(self, process: subprocess.Popen) -> None:
+        with self._lock:
+            self._processes.discard(process)
+
+
+_local = threading.local()
+
+
+def set_current_token(token: Optional[CancellationToken]) -> None:
+    """设置当前线程所属任务的取消标记"""
+    _local.token = token
+
+
+def current_token() -> Optional[CancellationToken]:
+    """获取当前线程所属任务的取消标记，不在任务中执行时返回 None"""
+    return getattr(_local, "token", None)
+
+
+def check_cancelled() -> None:
+    """当前线程所属任务已取消时抛出 JobCancelled"""
+    token = current_token()
+    if token is not None:
+        token.check()
+
+
+def sleep_cancellable(seconds: float) -> None:
+    """等待指定秒数，期间当前任务被取消时立即抛出 JobCancelled"""
+    token = current_token()
+    if token is None:
+        time.sleep(seconds)
+        return
+    token.wait(seconds)
+    token.check()
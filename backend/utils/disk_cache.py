@@ -0,0 +1,124 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Callable, Optional
+from utils.logger import get_logger
+
+logger = get_logger("disk_cache")
+
+
+class DiskCache:
+    """
+    有大小上限的磁盘缓存
+
+    每个缓存项是 cache_dir 下以缓存键命名的一个文件。内存中按最近使用顺序维护索引，
+    总大小超过 max_bytes 时删除最久未使用的文件。第一次使用时扫描目录重建索引 (按修改时间排序)。
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, name: str = "cache"):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.name = name
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evicted = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        """扫描缓存目录重建索引，调用时已持有锁"""
+        if self._loaded:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(".tmp"):
+                # 上次退出时未写完的文件
+                os.remove(entry.path)
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._index[name] = size
+            self._size += size
+        self._loaded = True
+        self._evict()
+        logger.info(f"{self.name}: {len(self._index)} 个文件, {self._size} 字节")
+
+    def _evict(self) -> None:
+        """删除最久未使用的文件直到总大小不超过上限，调用时已持有锁"""
+        while self._size > self.max_bytes and self._index:
+            name, size = self._index.popitem(last=False)
+            self._size -= size
+            self._evicted += 1
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def lookup(self, key: str) -> Optional[str]:
+        """返回缓存文件路径并标记为最近使用，不存在时返回 None"""
+        path = os.path.join(self.cache_dir, key)
+        with self._lock:
+            self._load()
+            if key in self._index and os.path.exists(path):
+                self._index.move_to_end(key)
+                self._hits += 1
+                return path
+            self._misses += 1
+            return None
+
+    def get_or_create(self, key: str, create: Callable[[str], None]) -> str:
+        """
+        返回缓存文件路径，不存在时调用 create(临时路径) 生成文件后原子移入缓存
+
+        create 在锁外执行，相同的键同时未命中时可能生成两次，后写入的覆盖先写入的。
+        """
+        path = self.lookup(key)
+        if path is not None:
+            return path
+        path = os.path.join(self.cache_dir, key)
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            create(tmp)
+            os.replace(tmp, path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        size = os.path.getsize(path)
+        with self._lock:
+            self._size += size - self._index.pop(key, 0)
+            self._index[key] = size
+            self._evict()
+        return path
+
+    def invalidate(self, prefix: str) -> int:
+        """删除键以 prefix 开头的所有缓存文件，返回删除的数量"""
+        with self._lock:
+            self._load()
+            names = [name for name in self._index if name.startswith(prefix)]
+            for name in names:
+                self._size -= self._index.pop(name)
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+        return len(names)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load()
+            return {
+                "files": len(self._index),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evicted": self._evicted,
+            }
@@ -0,0 +1,50 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from config import settings
+
+# 线程池类别
+POOL_IO = "io"          # 数据库查询、文件读写、目录删除
+POOL_RENDER = "render"  # 字幕渲染等长时间占用 CPU 的 ffmpeg 调用
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_lock = threading.Lock()
+
+
+def _pool_size(pool: str) -> int:
+    if pool == POOL_RENDER:
+        return settings.RENDER_EXECUTOR_WORKERS
+    return settings.IO_EXECUTOR_WORKERS
+
+
+def get_executor(pool: str = POOL_IO) -> ThreadPoolExecutor:
+    """获取指定类别的有界线程池"""
+    with _lock:
+        executor = _executors.get(pool)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=_pool_size(pool), thread_name_prefix=f"blocking-{pool}")
+            _executors[pool] = executor
+        return executor
+
+
+async def run_blocking(func: Callable[..., Any], *args, pool: str = POOL_IO, **kwargs) -> Any:
+    """
+    在有界线程池中执行阻塞函数，避免阻塞事件循环
+
+    Args:
+        func: 阻塞函数
+        pool: 线程池类别，POOL_IO 或 POOL_RENDER
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(pool), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executors() -> None:
+    """关闭所有线程池，不等待执行中的任务"""
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=False)
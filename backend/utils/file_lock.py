@@ -0,0 +1,40 @@
+import fcntl
+import os
+from contextlib import contextmanager
+from typing import Iterator
+from utils.cancellation import sleep_cancellable
+
+# 视频目录下的锁文件
+VIDEO_LOCK_NAME = ".video.lock"
+
+# 等待锁时检查取消的间隔 (秒)
+_POLL_SECONDS = 0.5
+
+
+class LockBusy(Exception):
+    """不等待时锁已被其他进程或线程持有"""
+
+
+@contextmanager
+def video_lock(folder_path: str, exclusive: bool = False, wait: bool = True) -> Iterator[None]:
+    """
+    视频目录级的读写锁 (flock)，同一台机器上的进程和线程之间都有效
+
+    处理流程持共享锁；替换或删除处理流程会读取的文件 (如音频压缩) 时持独占锁。
+    wait 为 False 时锁被占用直接抛出 LockBusy；等待期间当前任务被取消时抛出 JobCancelled。
+    """
+    os.makedirs(folder_path, exist_ok=True)
+    operation = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB
+    with open(os.path.join(folder_path, VIDEO_LOCK_NAME), "a") as lock_file:
+        while True:
+            try:
+                fcntl.flock(lock_file.fileno(), operation)
+                break
+            except BlockingIOError:
+                if not wait:
+                    raise LockBusy(folder_path)
+                sleep_cancellable(_POLL_SECONDS)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
@@ -1,9 +1,19 @@
 import hashlib
 import os
 from urllib.parse import urlparse
+from utils.url_utils import canonical_url
 
 def generate_hash_name(url: str) -> str:
-    """从URL生成唯一hash值"""
+    """从URL生成唯一hash值，同一视频的不同链接形式 (短链接、shorts、带分享参数等) 得到相同的hash"""
+    return legacy_hash_name(canonical_url(url))
+
+def legacy_hash_name(url: str) -> str:
+    """
+    不经规范化，直接从提交的URL生成hash值
+
+    URL 规范化之前创建的视频记录使用这个hash: YouTube 只取视频 ID，结果与 generate_hash_name 相同；
+    其他站点对原始链接计算，与规范 URL 的hash不同，查找已有记录时需要兼容。
+    """
     parsed = urlparse(url)
     # 对于YouTube URL，使用视频ID部分
     if 'youtube.com' in parsed.netloc or 'youtu.be' in parsed.netloc:
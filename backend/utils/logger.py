@@ -58,6 +58,9 @@ api_logger.addHandler(console_handler)
 def get_logger(name):
     """获取指定名称的日志记录器"""
     logger = logging.getLogger(name)
+    # 已经配置过的记录器直接返回，避免重复添加处理器导致日志重复输出
+    if logger.handlers:
+        return logger
     logger.setLevel(logging.INFO)
     
     # 防止日志重复
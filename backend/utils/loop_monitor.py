@@ -0,0 +1,62 @@
+import asyncio
+import time
+from typing import Optional, Dict, Any
+from utils.logger import get_logger
+
+logger = get_logger("loop_monitor")
+
+
+class LoopLagMonitor:
+    """
+    事件循环延迟监控
+
+    定期休眠固定间隔，实际唤醒时间与预期的差值即为事件循环被阻塞的时长，
+    超过阈值时记录告警日志。
+    """
+
+    def __init__(self, interval: float = 0.5, threshold: float = 0.2):
+        """
+        Args:
+            interval: 采样间隔 (秒)
+            threshold: 延迟超过该值 (秒) 时记为一次卡顿
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.samples = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - expected)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.samples += 1
+            if lag >= self.threshold:
+                self.stalls += 1
+                logger.warning(f"事件循环阻塞 {lag * 1000:.0f}ms")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "last_lag_ms": round(self.last_lag * 1000, 1),
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "stalls": self.stalls,
+            "samples": self.samples
+        }
@@ -0,0 +1,73 @@
+import subprocess
+import threading
+from typing import List, Optional
+from utils.cancellation import current_token, JobCancelled
+from utils.progress import report_progress
+
+
+def run_command(cmd: List[str], **kwargs) -> subprocess.CompletedProcess:
+    """
+    执行外部命令，行为与 subprocess.run(cmd, check=True, capture_output=True) 一致
+
+    在任务中执行时会登记子进程，任务取消时子进程被立即终止并抛出 JobCancelled。
+    """
+    token = current_token()
+    if token is not None:
+        token.check()
+
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+    if token is not None:
+        token.register_process(process)
+    try:
+        stdout, stderr = process.communicate()
+    finally:
+        if token is not None:
+            token.unregister_process(process)
+
+    if token is not None and token.is_cancelled():
+        raise JobCancelled(f"任务已取消，终止命令: {cmd[0]}")
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+def run_ffmpeg(cmd: List[str], duration: Optional[float] = None) -> subprocess.CompletedProcess:
+    """
+    执行 ffmpeg 命令，行为同 run_command，并通过 -progress 上报已处理的媒体时长
+
+    Args:
+        cmd: 以 ffmpeg 开头的命令
+        duration: 输入媒体总时长 (秒)，用于计算进度，未知时为 None
+    """
+    token = current_token()
+    if token is not None:
+        token.check()
+
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats"] + list(cmd[1:])
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if token is not None:
+        token.register_process(process)
+
+    # stderr 在单独的线程中读取，避免管道写满导致 ffmpeg 阻塞
+    stderr_chunks: List[str] = []
+    reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+    reader.start()
+    stdout_lines: List[str] = []
+    try:
+        for line in process.stdout:
+            stdout_lines.append(line)
+            key, _, value = line.strip().partition("=")
+            if key == "out_time_us" and value.isdigit():
+                report_progress(int(value) / 1_000_000, duration, "seconds")
+        process.wait()
+        reader.join()
+    finally:
+        if token is not None:
+            token.unregister_process(process)
+
+    stdout, stderr = "".join(stdout_lines), "".join(stderr_chunks)
+    if token is not None and token.is_cancelled():
+        raise JobCancelled(f"任务已取消，终止命令: {cmd[0]}")
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
@@ -0,0 +1,38 @@
+import threading
+from typing import Callable, Optional
+
+# 进度回调: (已完成工作量, 总工作量, 单位, 当前速率)
+ProgressCallback = Callable[[float, Optional[float], Optional[str], Optional[float]], None]
+
+_local = threading.local()
+
+
+def set_progress_callback(callback: Optional[ProgressCallback]) -> None:
+    """设置当前线程所执行阶段的进度回调"""
+    _local.callback = callback
+
+
+def current_progress_callback() -> Optional[ProgressCallback]:
+    """获取当前线程的进度回调，用于把进度转交给阶段内部启动的线程"""
+    return getattr(_local, "callback", None)
+
+
+def report_progress(done: float, total: Optional[float] = None, unit: Optional[str] = None,
+                    rate: Optional[float] = None) -> None:
+    """
+    上报当前阶段的细粒度进度，不在任务阶段中执行时忽略
+
+    Args:
+        done: 已完成的工作量
+        total: 总工作量，未知时为 None
+        unit: 工作量单位，如 bytes / seconds / segments
+        rate: 当前速率 (单位/秒)，如下载速度；未知时为 None
+    """
+    callback = getattr(_local, "callback", None)
+    if callback is None:
+        return
+    try:
+        callback(done, total, unit, rate)
+    except Exception:
+        # 进度上报失败不应中断处理流程
+        pass
@@ -0,0 +1,75 @@
+import re
+from typing import Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+# YouTube 视频 ID 为 11 位
+_YOUTUBE_ID = r"[\w-]{11}"
+_YOUTUBE_HOSTS = ("youtube.com", "youtube-nocookie.com")
+_YOUTUBE_PATH = re.compile(rf"^/(?:shorts|embed|live|v|e)/({_YOUTUBE_ID})(?:[/?#]|$)")
+_TWITTER_PATH = re.compile(r"^/(?:[\w]+|i(?:/web)?)/status(?:es)?/(\d+)")
+_XIAOYUZHOU_PATH = re.compile(r"^/episode/([\w-]+)")
+
+
+def _host(url: str) -> str:
+    host = (urlparse(url).hostname or "").lower()
+    for prefix in ("www.", "m.", "music.", "mobile."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    return host
+
+
+def canonical_key(url: str) -> Optional[Tuple[str, str]]:
+    """
+    不访问网络，按 URL 格式识别 (站点, 视频 ID)
+
+    支持 YouTube 的 watch / youtu.be / shorts / embed / live 链接 (忽略 si、t、list 等参数)、
+    X/Twitter 的 status 链接和小宇宙的 episode 链接；无法识别时返回 None。
+    """
+    parsed = urlparse(url.strip())
+    host = _host(url)
+
+    if host in _YOUTUBE_HOSTS:
+        video_id = parse_qs(parsed.query).get("v", [None])[0]
+        if video_id and re.fullmatch(_YOUTUBE_ID, video_id):
+            return "youtube", video_id
+        match = _YOUTUBE_PATH.match(parsed.path)
+        if match:
+            return "youtube", match.group(1)
+    elif host == "youtu.be":
+        video_id = parsed.path.strip("/").split("/")[0]
+        if re.fullmatch(_YOUTUBE_ID, video_id):
+            return "youtube", video_id
+    elif host in ("twitter.com", "x.com"):
+        match = _TWITTER_PATH.match(parsed.path)
+        if match:
+            return "twitter", match.group(1)
+    elif host == "xiaoyuzhoufm.com":
+        match = _XIAOYUZHOU_PATH.match(parsed.path)
+        if match:
+            return "xiaoyuzhou", match.group(1)
+    return None
+
+
+def url_for_key(extractor: str, video_id: str) -> Optional[str]:
+    """(站点, 视频 ID) 对应的规范 URL，未知站点返回 None"""
+    if extractor == "youtube":
+        return f"https://www.youtube.com/watch?v={video_id}"
+    if extractor == "twitter":
+        return f"https://x.com/i/status/{video_id}"
+    if extractor == "xiaoyuzhou":
+        return f"https://www.xiaoyuzhoufm.com/episode/{video_id}"
+    return None
+
+
+def source_key(url: Optional[str]) -> Optional[str]:
+    """(站点, 视频 ID) 拼成的查找键 "站点:视频 ID"，无法识别时返回 None"""
+    key = canonical_key(url) if url else None
+    return f"{key[0]}:{key[1]}" if key else None
+
+
+def canonical_url(url: str) -> str:
+    """将 URL 规范化为站点的标准形式，无法识别时原样返回"""
+    key = canonical_key(url)
+    if key is None:
+        return url.strip()
+    return url_for_key(*key) or url.strip()
@@ -4,9 +4,10 @@ import shutil
 from pathlib import Path
 from tkinter import filedialog, Tk
 from typing import Optional, Union, List
+from utils.process_utils import run_ffmpeg
 
-def convert_video_to_wav(video_path: str, output_dir: str) -> str:
-    """将视频转换为WAV音频"""
+def convert_video_to_wav(video_path: str, output_dir: str, duration: Optional[float] = None) -> str:
+    """将视频转换为WAV音频，duration 为视频时长 (秒)，用于上报转换进度"""
     try:
         # 使用固定的输出文件名
         output_path = os.path.join(output_dir, "audio.wav")
@@ -21,12 +22,12 @@ def convert_video_to_wav(video_path: str, output_dir: str) -> str:
             output_path
         ]
         
-        subprocess.run(cmd, check=True, capture_output=True)
+        run_ffmpeg(cmd, duration)
         print(f'已转换: {os.path.basename(video_path)} -> audio.wav')
         return output_path
         
     except subprocess.CalledProcessError as e:
-        print(f"转换失败: {e.stderr.decode()}")
+        print(f"转换失败: {e.stderr}")
         return None
 
 if __name__ == "__main__":
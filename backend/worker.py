@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+独立任务 worker
+
+与 API 服务共享同一个数据库 (DATABASE_URL) 和数据目录 (BASE_DATA_PATH)，
+可以在任意多台机器上运行，通过 SELECT ... FOR UPDATE SKIP LOCKED 认领任务。
+执行中的任务定期写入心跳，worker 退出或失联后任务由其他节点回收重新排队。
+
+用法:
+    python worker.py --concurrency 2
+
+API 服务设置 WORKER_CONCURRENCY=0 时只负责入队，全部任务由独立 worker 执行。
+"""
+
+import argparse
+import signal
+import socket
+import os
+import sys
+import threading
+from config import settings
+from utils.logger import init_logging, app_logger
+from models.database import init_db
+from services.job_queue import JobQueue, JobReaper, start_workers
+from services.job_handlers import JOB_HANDLERS
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Auto AI Subtitle 任务 worker")
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY,
+                        help="本节点同时执行的任务数 (默认 WORKER_CONCURRENCY)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    init_logging()
+    init_db()
+
+    queue = JobQueue()
+    workers = start_workers(queue, JOB_HANDLERS, args.concurrency)
+    reaper = JobReaper(queue)
+    reaper.start()
+    app_logger.info(f"worker 节点启动: {socket.gethostname()}:{os.getpid()}, 并发 {len(workers)}")
+
+    stopping = threading.Event()
+
+    def handle_signal(signum, frame):
+        if stopping.is_set():
+            # 再次收到信号时立即退出，未完成的任务在心跳超时后由其他节点回收
+            app_logger.warning("强制退出 worker 节点")
+            os._exit(1)
+        app_logger.info("停止认领新任务，等待执行中的任务完成...")
+        stopping.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    stopping.wait()
+    reaper.stop()
+    for worker in workers:
+        worker.stop()
+    for worker in workers:
+        worker.join()
+    app_logger.info("worker 节点已退出")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -23,6 +23,7 @@ interface VideoData {
   folder_hash_name_path: string;
   created_at: string;
   status: string;
+  error?: string | null;                     // status 为 failed 时的错误信息
   last_synced_at?: string;
 
   // 文件路径字段（与本地文件夹结构对应）
@@ -192,6 +193,7 @@ const VideoDataPage: React.FC = () => {
           folder_hash_name_path: item.folder_hash_name_path || '',
           created_at: item.created_at || new Date().toISOString(),
           status: item.status || 'pending',
+          error: item.error || null,
           file_path: item.file_path || '',
           pic_thumb_path: item.pic_thumb_path || '',
           wav_path: item.wav_path || '',
@@ -420,14 +422,16 @@ const VideoDataPage: React.FC = () => {
       dataIndex: 'status',
       key: 'status',
       width: 100,
-      render: (text: string) => {
+      render: (text: string, record: VideoData) => {
         const statusMap: Record<string, { color: string; text: string }> = {
           pending: { color: 'orange', text: '处理中' },
           completed: { color: 'green', text: '已完成' },
+          failed: { color: 'red', text: '失败' },
           error: { color: 'red', text: '错误' },
         };
         const status = statusMap[text] || { color: 'default', text: text || '未知' };
-        return <Tag color={status.color}>{status.text}</Tag>;
+        const tag = <Tag color={status.color}>{status.text}</Tag>;
+        return record.error ? <Tooltip title={record.error}>{tag}</Tooltip> : tag;
       },
     },
     {
@@ -74,6 +74,16 @@ const getFileUrl = (path: string | undefined): string => {
   return result;
 };
 
+// 浏览器原生支持 HLS 且视频已打包时播放 HLS (只加载播放到的分片)，否则播放完整文件
+const getVideoSource = (videoData: any): string => {
+  const canPlayHls = typeof document !== 'undefined'
+    && document.createElement('video').canPlayType('application/vnd.apple.mpegurl') !== '';
+  if (videoData?.hls && canPlayHls) {
+    return `/api${videoData.hls}`;
+  }
+  return getFileUrl(videoData?.files?.video);
+};
+
 // 视频播放器页面组件
 const VideoPlayerPage: React.FC = () => {
   const { hash_name } = useParams<{ hash_name: string }>();
@@ -333,7 +343,7 @@ const VideoPlayerPage: React.FC = () => {
                 <video
                   ref={videoRef}
                   className={styles.videoPlayer}
-                  src={getFileUrl(videoData.files.video)}
+                  src={getVideoSource(videoData)}
                   controls
                   autoPlay
                   onTimeUpdate={handleTimeUpdate}
@@ -441,7 +451,7 @@ const VideoPlayerPage: React.FC = () => {
                     <video
                       ref={videoRef}
                       className={styles.videoPlayer}
-                      src={getFileUrl(videoData.files.video)}
+                      src={getVideoSource(videoData)}
                       controls
                       autoPlay
                       onTimeUpdate={handleTimeUpdate}
@@ -7,6 +7,9 @@ import logger from '@/utils/logger';
 // API基础URL
 export const API_BASE_URL = 'http://localhost:8000';
 
+// 首页列表缩略图的宽度 (像素)
+const GRID_THUMBNAIL_WIDTH = 320;
+
 // 检查后端服务是否可用
 async function checkBackendStatus(): Promise<boolean> {
   try {
@@ -52,7 +55,26 @@ export interface Video {
   hash_name: string;
   folder_hash_name_path: string;
   created_at: string;
+  // 处理状态: downloading / converting / transcribing / ... / completed，处理任务失败时为 failed
   status: string;
+  // status 为 failed 时的错误信息
+  error?: string | null;
+  // 媒体时长 (秒) 和媒体信息 (容器格式、编码、分辨率)
+  duration?: number | null;
+  media_info?: {
+    duration: number | null;
+    format: string | null;
+    video: { codec: string | null; width: number | null; height: number | null; fps: number | null } | null;
+    audio: { codec: string | null; sample_rate: number | null; channels: number | null } | null;
+  } | null;
+  // 各尺寸缩略图，列表页按显示宽度选择
+  thumbnails?: { width: number; height: number; format: 'jpg' | 'webp'; url: string }[];
+  // 带版本的缩略图接口地址 (可追加 w/h/fmt)，浏览器长期缓存
+  thumbnail_url?: string | null;
+  // 拖动预览雪碧图: JSON 索引和 WebVTT 缩略图轨道 (sprite_NNN.jpg#xywh=x,y,w,h)
+  sprites?: { index: string; vtt: string } | null;
+  // HLS 主播放列表 (分片按需加载，含 WebVTT 字幕轨道)，未打包时为 null
+  hls?: string | null;
   // 添加可能存在的缩略图路径字段
   pic_thumb_path?: string;
   // 添加其他可能的缩略图字段
@@ -66,6 +88,10 @@ export interface Video {
     video: string | null;
     thumbnail: string | null;
     wav: string | null;
+    // 封装了中英文软字幕轨道的视频 (不重新编码)
+    soft_subtitle?: string | null;
+    // 烧录了硬字幕的视频
+    rendered?: string | null;
     subtitles: {
       en_json: string | null;
       zh_json: string | null;
@@ -132,17 +158,18 @@ function generateMockVideos(): VideoDisplay[] {
 /**
  * 处理新视频
  */
-export async function processVideo(url: string): Promise<any> {
+export async function processVideo(url: string, mode: 'full' | 'audio_first' = 'full'): Promise<any> {
   try {
-    logger.info('开始处理视频', { url });
+    logger.info('开始处理视频', { url, mode });
     
     const response = await axios.post(`${API_BASE_URL}/process`, {
-      url
+      url,
+      mode
     }, {
       headers: { 'Content-Type': 'application/json' }
     });
     
-    logger.info('视频处理成功', { hash_name: response.data.hash_name });
+    logger.info('视频处理任务已提交', { job_id: response.data.id, hash_name: response.data.hash_name });
     return response.data;
   } catch (error) {
     logger.error('处理视频失败', { error, url });
@@ -360,24 +387,77 @@ function getVideoSource(url: string): string {
   }
 }
 
+// 后台任务接口，/process 返回 202 和任务信息
+export interface Job {
+  id: number;
+  kind: string;
+  url: string | null;
+  hash_name: string | null;
+  status: string;
+  stage: string | null;
+  progress: number;
+  error: string | null;
+  attempts: number;
+  created_at: string;
+  started_at: string | null;
+  finished_at: string | null;
+  // 执行中阶段的细粒度进度，如 { download: { done, total, unit, rate, started_at } }，rate 为当前速率 (如下载字节/秒)
+  stages?: Record<string, { done: number | null; total: number | null; unit: string | null; rate?: number | null; started_at: number }> | null;
+  eta_seconds?: number | null;
+}
+
+/**
+ * 获取任务状态
+ */
+export async function getJob(jobId: number): Promise<Job> {
+  const response = await axios.get(`${API_BASE_URL}/jobs/${jobId}`);
+  return response.data;
+}
+
+/**
+ * 补充下载视频文件 (先转写后补充视频的模式下，首次播放时调用)
+ */
+export async function fetchVideo(hash_name: string): Promise<Job> {
+  const response = await axios.post(`${API_BASE_URL}/video/${hash_name}/fetch-video`);
+  return response.data;
+}
+
+/**
+ * 订阅任务进度 (Server-Sent Events)，任务结束后自动关闭连接
+ * 返回取消订阅的函数
+ */
+export function watchJob(jobId: number, onUpdate: (job: Job) => void, onEnd?: (job: Job) => void): () => void {
+  const source = new EventSource(`${API_BASE_URL}/jobs/${jobId}/events`);
+  const handle = (event: MessageEvent) => onUpdate(JSON.parse(event.data));
+  source.addEventListener('stage', handle);
+  source.addEventListener('progress', handle);
+  source.addEventListener('end', (event) => {
+    const job: Job = JSON.parse((event as MessageEvent).data);
+    onUpdate(job);
+    onEnd?.(job);
+    source.close();
+  });
+  return () => source.close();
+}
+
 /**
  * 添加新视频
  */
 export async function addVideo(url: string): Promise<VideoDisplay | null> {
   try {
     const response = await axios.post(`${API_BASE_URL}/process`, { url });
-    const video: Video = response.data;
+    const job: Job = response.data;
     
-    // 转换为前端展示格式
+    // 视频在后台处理，先以任务信息展示
     return {
-      id: String(video.id),
-      title: video.title,
-      description: `处理状态: ${video.status}`,
-      time: formatRelativeTime(new Date(video.created_at)),
-      timestamp: format(new Date(video.created_at), 'HH:mm'),
-      source: getVideoSource(video.url),
-      thumbnail: video.files.thumbnail || undefined,
-      hash_name: video.hash_name
+      id: `job-${job.id}`,
+      title: job.url || url,
+      description: `处理状态: ${job.status}`,
+      time: formatRelativeTime(new Date(job.created_at)),
+      timestamp: format(new Date(job.created_at), 'HH:mm'),
+      source: getVideoSource(job.url || url),
+      thumbnail: undefined,
+      hash_name: job.hash_name || ''
     };
   } catch (error) {
     console.error('添加视频失败:', error);
@@ -421,11 +501,14 @@ export const getVideoDataForHome = async (): Promise<VideoDisplay[]> => {
           // 处理缩略图URL
           let thumbnailUrl = '';
           
-          // 首先检查是否有pic_thumb_path
-          if (video.pic_thumb_path) {
-            thumbnailUrl = `/api${video.pic_thumb_path}`;
-            console.log('使用pic_thumb_path作为缩略图:', thumbnailUrl);
-          } 
+          // 列表使用按需缩放的缩略图 (后端缓存缩放结果)，避免下载原始尺寸的图片；
+          // 带版本的地址可长期缓存，缩略图重新生成后版本改变
+          if (video.thumbnail_url) {
+            thumbnailUrl = `/api${video.thumbnail_url}&w=${GRID_THUMBNAIL_WIDTH}&fmt=webp`;
+          }
+          else if (video.hash_name && (video.pic_thumb_path || (video.thumbnails && video.thumbnails.length))) {
+            thumbnailUrl = `/api/video/${video.hash_name}/thumbnail?w=${GRID_THUMBNAIL_WIDTH}&fmt=webp`;
+          }
           // 然后检查是否有files.thumbnail
           else if (video.files && video.files.thumbnail) {
             thumbnailUrl = `/api${video.files.thumbnail}`;
@@ -0,0 +1,45 @@
+"""create video
+
+Revision ID: 001
+Revises:
+Create Date: 2024-03-10 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'video',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('url', sa.String(), nullable=True),
+        sa.Column('hash_name', sa.String(), nullable=True),
+        sa.Column('folder_hash_name_path', sa.String(), nullable=True),
+        sa.Column('pic_thumb_path', sa.String(), nullable=True),
+        sa.Column('file_path', sa.String(), nullable=True),
+        sa.Column('wav_path', sa.String(), nullable=True),
+        sa.Column('subtitle_en_json_path', sa.String(), nullable=True),
+        sa.Column('subtitle_zh_cn_json_path', sa.String(), nullable=True),
+        sa.Column('subtitle_en_ass_path', sa.String(), nullable=True),
+        sa.Column('subtitle_zh_cn_ass_path', sa.String(), nullable=True),
+        sa.Column('subtitle_en_md_path', sa.String(), nullable=True),
+        sa.Column('subtitle_zh_cn_md_path', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_video_id'), 'video', ['id'], unique=False)
+    op.create_index(op.f('ix_video_url'), 'video', ['url'], unique=True)
+    op.create_index(op.f('ix_video_hash_name'), 'video', ['hash_name'], unique=True)
+
+def downgrade():
+    op.drop_index(op.f('ix_video_hash_name'), table_name='video')
+    op.drop_index(op.f('ix_video_url'), table_name='video')
+    op.drop_index(op.f('ix_video_id'), table_name='video')
+    op.drop_table('video')
@@ -5,8 +5,9 @@ Revises: 001
 Create Date: 2024-03-17 10:00:00.000000
 
 """
-from alembic import op
+from alembic import context, op
 import sqlalchemy as sa
+from sqlalchemy import inspect
 
 # revision identifiers, used by Alembic.
 revision = '002'
@@ -14,12 +15,23 @@ down_revision = '001'
 branch_labels = None
 depends_on = None
 
+# 早期部署中视频表名为 videos，只修改已存在的表
+TABLES = ('video', 'videos')
+
+def _existing_tables():
+    # 生成 SQL 脚本 (--sql) 时无法检查数据库，只修改 video 表
+    if context.is_offline_mode():
+        return ['video']
+    inspector = inspect(op.get_bind())
+    return [table for table in TABLES if inspector.has_table(table)]
+
 def upgrade():
     # 添加新列
-    op.add_column('video', sa.Column('subtitle_en_with_words_json_path', sa.String(), nullable=True))
-    op.add_column('videos', sa.Column('subtitle_en_with_words_json_path', sa.String(), nullable=True))
+    for table in _existing_tables():
+        op.add_column(table, sa.Column('subtitle_en_with_words_json_path', sa.String(), nullable=True))
 
 def downgrade():
     # 删除新列
-    op.drop_column('video', 'subtitle_en_with_words_json_path')
-    op.drop_column('videos', 'subtitle_en_with_words_json_path') 
\ No newline at end of file
+    for table in _existing_tables():
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('subtitle_en_with_words_json_path') 
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""add job queue, stage records and stage statistics
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # 后台任务队列
+    op.create_table(
+        'job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=True),
+        sa.Column('url', sa.String(), nullable=True),
+        sa.Column('hash_name', sa.String(), nullable=True),
+        sa.Column('batch_id', sa.String(), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('priority', sa.Integer(), nullable=True),
+        sa.Column('submitter', sa.String(), nullable=True),
+        sa.Column('stage', sa.String(), nullable=True),
+        sa.Column('progress', sa.Float(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('critical_path', sa.Text(), nullable=True),
+        sa.Column('detail', sa.Text(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('worker_id', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    for column in ('id', 'kind', 'hash_name', 'batch_id', 'status', 'priority', 'submitter',
+                   'created_at', 'heartbeat_at'):
+        op.create_index(op.f(f'ix_job_{column}'), 'job', [column], unique=False)
+
+    # 阶段完成记录，用于从失败的阶段继续
+    op.create_table(
+        'video_stage',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('hash_name', sa.String(), nullable=True),
+        sa.Column('stage', sa.String(), nullable=True),
+        sa.Column('artifacts', sa.Text(), nullable=True),
+        sa.Column('checksum', sa.String(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_video_stage_id'), 'video_stage', ['id'], unique=False)
+    op.create_index(op.f('ix_video_stage_hash_name'), 'video_stage', ['hash_name'], unique=False)
+
+    # 阶段历史吞吐量，用于估算剩余时间
+    op.create_table(
+        'stage_stat',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('stage', sa.String(), nullable=True),
+        sa.Column('unit', sa.String(), nullable=True),
+        sa.Column('work', sa.Float(), nullable=True),
+        sa.Column('seconds', sa.Float(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    for column in ('id', 'stage', 'created_at'):
+        op.create_index(op.f(f'ix_stage_stat_{column}'), 'stage_stat', [column], unique=False)
+
+def downgrade():
+    op.drop_table('stage_stat')
+    op.drop_table('video_stage')
+    op.drop_table('job')
@@ -0,0 +1,38 @@
+"""add video processing mode and media columns
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19 10:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    ('process_mode', sa.String()),
+    ('duration', sa.Float()),
+    ('media_info', sa.Text()),
+    ('thumbnail_variants', sa.Text()),
+    ('soft_subtitle_path', sa.String()),
+    ('rendered_path', sa.String()),
+    ('sprite_index_path', sa.String()),
+    ('hls_playlist_path', sa.String()),
+]
+
+def upgrade():
+    with op.batch_alter_table('video') as batch_op:
+        for name, column_type in COLUMNS:
+            batch_op.add_column(sa.Column(name, column_type, nullable=True))
+    # 已有的视频都是下载视频后提取音频的完整模式
+    op.execute("UPDATE video SET process_mode = 'full' WHERE process_mode IS NULL")
+
+def downgrade():
+    with op.batch_alter_table('video') as batch_op:
+        for name, _ in reversed(COLUMNS):
+            batch_op.drop_column(name)
@@ -0,0 +1,66 @@
+"""add url probe cache and bulk import runs
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 10:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # URL 元数据探测缓存
+    op.create_table(
+        'url_probe',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('url', sa.String(), nullable=True),
+        sa.Column('extractor', sa.String(), nullable=True),
+        sa.Column('video_id', sa.String(), nullable=True),
+        sa.Column('canonical_url', sa.String(), nullable=True),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('duration', sa.Float(), nullable=True),
+        sa.Column('probed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_url_probe_id'), 'url_probe', ['id'], unique=False)
+    op.create_index(op.f('ix_url_probe_url'), 'url_probe', ['url'], unique=True)
+    for column in ('extractor', 'video_id', 'canonical_url'):
+        op.create_index(op.f(f'ix_url_probe_{column}'), 'url_probe', [column], unique=False)
+
+    # URL 列表批量导入的进度和检查点
+    op.create_table(
+        'import_run',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('batch_id', sa.String(), nullable=True),
+        sa.Column('source', sa.String(), nullable=True),
+        sa.Column('job_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=True),
+        sa.Column('submitter', sa.String(), nullable=True),
+        sa.Column('offset', sa.BigInteger(), nullable=True),
+        sa.Column('checkpoint_at', sa.DateTime(), nullable=True),
+        sa.Column('lines', sa.Integer(), nullable=True),
+        sa.Column('invalid', sa.Integer(), nullable=True),
+        sa.Column('duplicates', sa.Integer(), nullable=True),
+        sa.Column('existing', sa.Integer(), nullable=True),
+        sa.Column('reused', sa.Integer(), nullable=True),
+        sa.Column('enqueued', sa.Integer(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_import_run_id'), 'import_run', ['id'], unique=False)
+    op.create_index(op.f('ix_import_run_batch_id'), 'import_run', ['batch_id'], unique=True)
+    op.create_index(op.f('ix_import_run_status'), 'import_run', ['status'], unique=False)
+
+def downgrade():
+    op.drop_table('import_run')
+    op.drop_table('url_probe')
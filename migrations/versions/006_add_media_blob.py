@@ -0,0 +1,44 @@
+"""add content-addressed media store
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # 按 SHA-256 去重的媒体文件
+    op.create_table(
+        'media_blob',
+        sa.Column('digest', sa.String(), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('digest')
+    )
+
+    # 视频目录中指向 media_blob 的硬链接
+    op.create_table(
+        'media_blob_ref',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('digest', sa.String(), nullable=True),
+        sa.Column('path', sa.String(), nullable=True),
+        sa.Column('hash_name', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_media_blob_ref_id'), 'media_blob_ref', ['id'], unique=False)
+    op.create_index(op.f('ix_media_blob_ref_digest'), 'media_blob_ref', ['digest'], unique=False)
+    op.create_index(op.f('ix_media_blob_ref_path'), 'media_blob_ref', ['path'], unique=True)
+    op.create_index(op.f('ix_media_blob_ref_hash_name'), 'media_blob_ref', ['hash_name'], unique=False)
+
+def downgrade():
+    op.drop_table('media_blob_ref')
+    op.drop_table('media_blob')
@@ -0,0 +1,39 @@
+"""add render output cache
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19 10:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # 按 (原视频内容, 字幕内容, 渲染参数) 缓存的渲染结果
+    op.create_table(
+        'render_output',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cache_key', sa.String(), nullable=True),
+        sa.Column('hash_name', sa.String(), nullable=True),
+        sa.Column('mode', sa.String(), nullable=True),
+        sa.Column('params', sa.Text(), nullable=True),
+        sa.Column('source_digest', sa.String(), nullable=True),
+        sa.Column('subtitle_digest', sa.String(), nullable=True),
+        sa.Column('path', sa.String(), nullable=True),
+        sa.Column('size', sa.BigInteger(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('last_used_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_render_output_id'), 'render_output', ['id'], unique=False)
+    op.create_index(op.f('ix_render_output_cache_key'), 'render_output', ['cache_key'], unique=True)
+    op.create_index(op.f('ix_render_output_hash_name'), 'render_output', ['hash_name'], unique=False)
+
+def downgrade():
+    op.drop_table('render_output')
@@ -0,0 +1,39 @@
+"""add video source key
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 12:20:00.000000
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+from utils.url_utils import source_key
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # "站点:视频 ID"，按索引查找同一视频的已有记录，不再按 URL 模糊匹配
+    with op.batch_alter_table('video') as batch_op:
+        batch_op.add_column(sa.Column('source_key', sa.String(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_video_source_key'), ['source_key'], unique=False)
+
+    # 按已有记录的 url 回填；生成 SQL 脚本 (--sql) 时无法读取记录，不回填
+    if context.is_offline_mode():
+        return
+    video = sa.table('video', sa.column('id', sa.Integer()), sa.column('url', sa.String()),
+                     sa.column('source_key', sa.String()))
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(video.c.id, video.c.url)).fetchall()
+    for row in rows:
+        key = source_key(row.url)
+        if key:
+            connection.execute(video.update().where(video.c.id == row.id).values(source_key=key))
+
+def downgrade():
+    with op.batch_alter_table('video') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_video_source_key'))
+        batch_op.drop_column('source_key')